@@ -10,74 +10,145 @@ Implements a PID controller for line-following. The controller adjusts
 motor efforts based on line sensor error to maintain alignment.
 
 Functionality:
-- Uses a proportional-integral-derivative (PID) algorithm to correct the robot's trajectory.
-- Reads the latest line sensor error from a queue and computes the required adjustments.
+- PID is a reusable controller: step(error, dt) returns the clamped output.
+  The derivative goes through a first-order low-pass filter (time constant
+  tau), and the integrator uses back-calculation anti-windup: while the
+  output is clamped, kaw times the clamped-off amount bleeds out of the
+  integral. State lives in the instance and step() builds no objects other
+  than the float results themselves.
+- PID_value uses one PID instance to correct the robot's trajectory.
+- Reads the latest line sensor error from the init.line_error mailbox and computes
+  the required adjustments. When no new error has arrived the efforts are left as
+  they are.
 - Adjusts motor effort while ensuring effort values remain within valid bounds.
 - If override mode is active, the robot drives straight.
 - If grid mode is active, PID corrections are skipped.
+- While the motion executor runs segments, PID corrections are skipped.
+- Every skip resets the PID, and the first error after it (or the first ever)
+  is stepped with dt = 0, so the gap is neither integrated nor differentiated.
+- Each run packs the error and the P, I and D terms into telemetry for the
+  flight recorder.
 """
 
 import init
-import pyb
-from time import ticks_us, ticks_diff
+import state
+from struct import pack_into
+from time import ticks_diff
+
+class PID:
+    def __init__(self, kp, ki=0.0, kd=0.0, out_min=-100.0, out_max=100.0, tau=0.0, kaw=None):
+        # kp, ki, kd: gains (output per error, per error*s, per error/s)
+        # out_min, out_max: output clamp
+        # tau: derivative filter time constant (s), 0 for the raw derivative
+        # kaw: back-calculation gain (1/s); None uses ki/kp, 0 disables anti-windup
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.out_min = out_min
+        self.out_max = out_max
+        self.tau = tau
+        if kaw is None:
+            kaw = ki / kp if kp else 0.0
+        self.kaw = kaw
+        self.reset()
+
+    def reset(self):
+        # Clears the integrator, the derivative filter and the last output.
+        self.integral = 0.0     # Integral term, in output units
+        self.derivative = 0.0   # Filtered error derivative (error/s)
+        self.prev_error = 0.0
+        self.primed = False     # False until the first step, which has no derivative
+        self.p = 0.0
+        self.d = 0.0
+        self.output = 0.0
+
+    def step(self, error, dt):
+        # Advances the controller by dt seconds and returns the clamped output.
+        # With dt <= 0 only the proportional term follows the new error.
+        if dt > 0 and self.primed:
+            rate = (error - self.prev_error) / dt
+            if self.tau > 0:
+                self.derivative += dt / (self.tau + dt) * (rate - self.derivative)
+            else:
+                self.derivative = rate
+        self.primed = True
+        self.prev_error = error
+
+        self.p = self.kp * error
+        self.d = self.kd * self.derivative
+        raw = self.p + self.integral + self.d
+        output = raw
+        if output > self.out_max:
+            output = self.out_max
+        elif output < self.out_min:
+            output = self.out_min
+        if dt > 0:
+            self.integral += (self.ki * error + self.kaw * (output - raw)) * dt
+        self.output = output
+        return output
 
 # PID Gains
 Kp = 10  # Proportional gain
 Ki = 0   # Integral gain
 Kd = 0.9 # Derivative gain
+Tf = 0.02 # Derivative filter time constant (s)
 init.kp_value.put(Kp)
 
+base_speed = 18  # Motor base speed (PWM %)
+
+# Latest error, P, I and D terms as little-endian floats, for the flight recorder
+telemetry = bytearray(16)
+
 def PID_value():
     # Executes the PID control loop for adjusting motor effort.
 
-    integral = 0.0
-    prev_error = 0.0
-    prev_time = ticks_us()
-    base_speed = 18  # Motor base speed (PWM %)
+    # Keep the correction inside what both wheels can add to the base speed,
+    # so the clamp that triggers anti-windup is the one the motors see
+    limit = 100 - base_speed
+    pid = PID(Kp, Ki, Kd, -limit, limit, tau=Tf)
+    prev_time = None  # Stamp of the last error stepped, None after a skip
+    flags = state.ints
 
     while True:
         # Skip PID processing if grid mode is active
-        if init.state_input.get() == 1:
+        if flags[state.STATE_INPUT] == 1:
+            pid.reset()
+            prev_time = None
+            yield 0
+            continue
+
+        # Skip PID processing while motion segments own the motor efforts
+        if flags[state.MOTION_ACTIVE] == 1:
+            pid.reset()
+            prev_time = None
+            yield 0
+            continue
+
+        # Override mode forces straight driving
+        if flags[state.OVERRIDE_MODE] == 1:
+            pid.reset()
+            prev_time = None
+            pack_into('<4f', telemetry, 0, 0.0, 0.0, 0.0, 0.0)
+            init.left_effort.put(base_speed)
+            init.right_effort.put(base_speed)
+            yield 0
+            continue
+
+        # Without a new line error the last efforts stand
+        if not init.line_error.any():
             yield 0
             continue
+        error = init.line_error.get()
+
+        # Time the derivative with the stamp of the sensor frame behind the error
+        now = init.line_error.stamp
+        dt = ticks_diff(now, prev_time) / 1_000_000.0 if prev_time is not None else 0.0
+        prev_time = now
 
-        # Retrieve error value or set default if queue is empty
-        error = 0.0
-        if not init.collection_data_queue.empty():
-            error = init.collection_data_queue.get()
-
-        # Override mode forces straight driving by setting error to zero
-        if init.override_mode.get() == 1:
-            error = 0.0
-
-        if error == 0:
-            integral = 0.0
-            prev_error = 0.0
-            left_out = base_speed
-            right_out = base_speed
-        else:
-            now = ticks_us()
-            dt = ticks_diff(now, prev_time) / 1_000_000.0
-            prev_time = now
-
-            p_term = Kp * error
-            integral += error * dt
-            i_term = Ki * integral
-            d_term = 0.0
-            if dt > 0:
-                d_term = Kd * (error - prev_error) / dt
-            prev_error = error
-
-            pid_output = p_term + i_term + d_term
-
-            left_out = base_speed - pid_output
-            right_out = base_speed + pid_output
-
-        # Clamp motor efforts to valid range (-100 to 100)
-        left_out = max(-100, min(100, left_out))
-        right_out = max(-100, min(100, right_out))
+        pid_output = pid.step(error, dt)
+        pack_into('<4f', telemetry, 0, error, pid.p, pid.integral, pid.d)
 
         # Update motor effort shares
-        init.left_effort.put(int(left_out))
-        init.right_effort.put(int(right_out))
+        init.left_effort.put(int(base_speed - pid_output))
+        init.right_effort.put(int(base_speed + pid_output))
         yield 0
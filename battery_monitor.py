@@ -0,0 +1,146 @@
+"""
+battery_monitor.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Continuous battery monitoring. The pack voltage is read through the PC4
+divider (69k / 22k) by a low-rate task instead of once before the run, so
+the motor compensation follows the NiMH pack as it sags under load and
+runs down over a course.
+
+Functionality:
+- Every run takes oversample ADC readings (summed as integers), converts
+  the mean to pack volts and low-pass filters it with time constant tau
+  seconds. The filtered voltage is published in init.battery_voltage.
+- The compensation multiplier (V_nominal / voltage) moves toward its
+  target by at most max_rate per second, so a load dip or a noisy reading
+  never steps the motor efforts. It is published in
+  init.constant_multiplier and handed to the attached motors, which cache
+  it for their updates and the wheel speed feedforward.
+- Low-voltage event: once the filtered voltage stays below low_volts for
+  low_ms, init.battery_low is set to 1 and the event is counted with the
+  voltage it latched at. The task never prints; stats() is reported once the
+  scheduler has stopped. It clears when the voltage recovers above
+  low_volts + hysteresis.
+- start() takes the first reading and sets the voltage and multiplier at
+  once, replacing the single reading main.py took before the run.
+"""
+
+import init
+from time import ticks_ms, ticks_diff
+
+V_NOMINAL = 7.2          # Pack voltage the efforts were tuned at
+DIVIDER = 69.0 / 22.0    # PC4 divider ratio
+ADC_VREF = 3.3
+ADC_FULL = 4095
+MIN_VOLTS = 0.1          # Below this there is no pack (USB power): multiplier 1
+
+class BatteryMonitor:
+    def __init__(self, adc, oversample=16, tau=1.0, max_rate=0.05, low_volts=6.3, low_ms=2000,
+                 hysteresis=0.2, v_nominal=V_NOMINAL):
+        # adc: pyb.ADC on the divider
+        # oversample: ADC readings per run
+        # tau: voltage filter time constant (s)
+        # max_rate: largest multiplier change per second
+        # low_volts, low_ms: the low-voltage event threshold and how long it must hold
+        self.adc = adc
+        self.oversample = oversample
+        self.scale = ADC_VREF / ADC_FULL * DIVIDER / oversample
+        self.tau = tau
+        self.max_rate = max_rate
+        self.low_volts = low_volts
+        self.low_ms = low_ms
+        self.hysteresis = hysteresis
+        self.v_nominal = v_nominal
+
+        self.voltage = 0.0      # Filtered pack voltage (V)
+        self.multiplier = 1.0   # Published compensation multiplier
+        self.low = False        # Low-voltage event active
+        self.low_events = 0     # Low-voltage events raised
+        self.low_voltage = 0.0  # Filtered voltage when the last event latched
+        self._low_since = None  # ticks_ms() the voltage first read low
+        self._last_ms = ticks_ms()
+        self.motors = ()
+
+    def attach(self, *motors):
+        # Motors whose cached multiplier follows every published value.
+        self.motors = motors
+
+    def read(self):
+        # Mean of oversample ADC readings, in pack volts.
+        total = 0
+        adc = self.adc
+        for _ in range(self.oversample):
+            total += adc.read()
+        return total * self.scale
+
+    def target(self, voltage):
+        # Multiplier that scales efforts back to the nominal voltage.
+        if voltage < MIN_VOLTS:
+            return 1.0
+        return self.v_nominal / voltage
+
+    def start(self):
+        # Sets the voltage and multiplier from one reading, with no filtering.
+        self.voltage = self.read()
+        self.multiplier = self.target(self.voltage)
+        self._last_ms = ticks_ms()
+        self.publish()
+        return self.voltage
+
+    def update(self):
+        # Takes a reading and moves the filtered voltage and multiplier once.
+        now = ticks_ms()
+        dt = ticks_diff(now, self._last_ms) / 1000
+        self._last_ms = now
+        if dt <= 0:
+            return
+        self.voltage += dt / (self.tau + dt) * (self.read() - self.voltage)
+
+        change = self.target(self.voltage) - self.multiplier
+        limit = self.max_rate * dt
+        if change > limit:
+            change = limit
+        elif change < -limit:
+            change = -limit
+        self.multiplier += change
+        self.publish()
+        self._check_low(now)
+
+    def publish(self):
+        init.battery_voltage.put(self.voltage)
+        init.constant_multiplier.put(self.multiplier)
+        for motor in self.motors:
+            motor.set_multiplier(self.multiplier)
+
+    def _check_low(self, now):
+        if self.voltage < MIN_VOLTS:
+            return
+        if self.low:
+            if self.voltage > self.low_volts + self.hysteresis:
+                self.low = False
+                init.battery_low.put(0)
+        elif self.voltage < self.low_volts:
+            if self._low_since is None:
+                self._low_since = now
+            elif ticks_diff(now, self._low_since) >= self.low_ms:
+                self.low = True
+                self._low_since = None
+                self.low_events += 1
+                self.low_voltage = self.voltage
+                init.battery_low.put(1)
+        else:
+            self._low_since = None
+
+    def stats(self):
+        # (low events, voltage at the last event, filtered voltage now)
+        return self.low_events, self.low_voltage, self.voltage
+
+    def task(self):
+        # Cooperative task: one update per run.
+        while True:
+            self.update()
+            yield 0
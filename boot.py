@@ -1,6 +1,9 @@
 import pyb
 from pyb import UART
 from time import sleep_ms
+import boot_timeline
+
+boot_timeline.mark("boot.py")
 
 # Initialize UART (Make sure this matches your Bluetooth module's default settings)
 ser = UART(5, 38400, timeout=1000)
@@ -0,0 +1,60 @@
+"""
+boot_timeline.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Records labelled timestamps from boot.py up to the first pri_sched() call
+and prints where the startup time went. boot.py and main.py run in the same
+interpreter, so marks from both end up in this module's lists.
+
+Usage:
+    import boot_timeline
+    boot_timeline.mark("imports")
+    ...
+    boot_timeline.report()
+
+Each line of the report shows the time since reset and the time spent
+since the previous mark, i.e. in the step the label names, then the heap
+in use at the mark (gc.mem_alloc(), so including garbage not yet
+collected) and its change over the step. Comparing a report from the
+source files with one from the precompiled bundle (host/build_mpy.py)
+shows what compiling on the board costs in time and RAM. ticks_ms()
+starts at zero on reset, so the first mark also shows how long the board
+took to reach boot.py. Steps that wait for the user (calibration, the
+start prompt) should be labelled as such so they are not mistaken for
+setup cost.
+"""
+
+import gc
+from time import ticks_ms, ticks_us, ticks_diff
+
+_labels = []
+_stamps = []
+_heap = []
+_reset_ms = 0
+
+def mark(label):
+    # Records the current time under label.
+    global _reset_ms
+    if not _stamps:
+        _reset_ms = ticks_ms()
+    _labels.append(label)
+    _stamps.append(ticks_us())
+    _heap.append(gc.mem_alloc())
+
+def report():
+    # Prints time since reset and the duration of each step.
+    if not _stamps:
+        print("Boot timeline: no marks")
+        return
+    print("Boot timeline (ms)     since reset        step   heap (B)    step (B)")
+    for i in range(len(_stamps)):
+        since = _reset_ms + ticks_diff(_stamps[i], _stamps[0]) / 1000
+        step = ticks_diff(_stamps[i], _stamps[i - 1]) / 1000 if i else _reset_ms
+        grown = _heap[i] - _heap[i - 1] if i else _heap[i]
+        print("  %-24s %10.1f  %10.1f  %9d  %+10d" % (_labels[i], since, step, _heap[i], grown))
+    print("  %-24s %10.1f" % ("total boot.py to here", ticks_diff(_stamps[-1], _stamps[0]) / 1000))
+    print("  %-24s %10d" % ("heap free now (B)", gc.mem_free()))
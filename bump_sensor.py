@@ -7,30 +7,43 @@ Authors: Sam Sakaguchi, Timothy Chu
 
 Summary:
 Sets up external interrupts for four bump sensors (pull-up, falling edge)
-and provides a cooperative task to react to bump_flag. 
+that raise the bump flag. Reacting to it is the mission's job (mission.py).
 
 Functionality:
 - Initializes bump sensors as external interrupts.
-- Uses a minimal ISR to set a bump_flag when a sensor is triggered.
-- Implements a cooperative task to handle bump events and execute navigation maneuvers.
-- Provides a wall navigation function to move and turn the robot based on pre-set timing.
+- Uses a minimal ISR to set the BUMP field of the state block (init.bump_flag)
+  when a sensor is triggered: one array store, no allocation. While an input
+  capture (input_capture.py) runs, the edge is also logged for replay.
+- WALL_MANEUVER holds the timed moves after hitting the wall; the mission
+  plan (mission.COURSE) runs them on the motion executor once the flag is set.
 """
 
 from pyb import Pin, ExtInt
 import micropython
-import init
-from left_motor import left_motor
-from right_motor import right_motor
-from time import ticks_ms, ticks_diff
+import state
+from state import BUMP
 
 micropython.alloc_emergency_exception_buf(100)  # Helps avoid MemoryError in ISR
 
+capture = None  # input_capture.InputCapture logging bump edges, set by its attach()
+
+# Wall maneuver: (left effort, right effort, ms) after hitting the wall
+WALL_MANEUVER = (
+    (-20, -20, 400),  # Reverse
+    (20, -20, 600),   # Turn 90 degrees right
+    (20, 20, 600),    # Move forward
+    (-20, 20, 400),   # Turn 90 degrees left
+    (20, 20, 300),    # Move forward
+)
+
 # ---------------------------------------------------------------------
 # 1) Interrupt Callback for Bump Sensors
 # ---------------------------------------------------------------------
 def bump_callback(line):
     # Sets the bump flag when any bump sensor is triggered.
-    init.bump_flag = True
+    state.ints[BUMP] = 1
+    if capture is not None:
+        capture.bump(line)
 
 # ---------------------------------------------------------------------
 # 2) Initialize Bump Sensors (Interrupts)
@@ -50,41 +63,3 @@ def init_bump_sensors():
         ExtInt(pin_obj, ExtInt.IRQ_FALLING, Pin.PULL_UP, bump_callback)
 
     print("Bump sensors initialized with pull-up & falling-edge interrupts.")
-
-# ---------------------------------------------------------------------
-# 3) Wall Navigation Function
-# ---------------------------------------------------------------------
-def wall_nav(left_pwm, right_pwm, duration):
-    # Moves the robot for a set duration using specified PWM values.
-
-    left_motor.update(left_pwm)
-    right_motor.update(right_pwm)
-    start_time = ticks_ms()
-    
-    while ticks_diff(ticks_ms(), start_time) < duration:
-        pass  # Wait for the specified duration
-    
-    left_motor.update(0)
-    right_motor.update(0)
-
-# ---------------------------------------------------------------------
-# 4) Task to Handle Bump Events
-# ---------------------------------------------------------------------
-def task_bump_handling():
-    """
-    Cooperative task that checks for bump events.
-    If a bump is detected, executes a navigation sequence to maneuver the robot.
-    """
-    while True:
-        if init.bump_flag:
-            # Reverse
-            wall_nav(-20, -20, 400)  # Reverse for 400ms
-            # Turn 90 degrees right
-            wall_nav(20, -20, 600)  # Turn right
-            # Move forward
-            wall_nav(20, 20, 600)  # Move forward
-            # Turn -90 degrees left
-            wall_nav(-20, 20, 400)  # Turn left
-            # Move forward
-            wall_nav(20, 20, 300)  # Move forward
-            # Turn -90 degre
@@ -0,0 +1,121 @@
+"""
+calib_profile.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Stores the results of the interactive calibration in a small binary file on
+flash so the next boot can skip it. A profile holds the line sensor black
+and white tables, the BNO055 calibration offsets and the start heading.
+
+Functionality:
+- save() writes the profile with a version header and a Fletcher-16 checksum.
+- load() returns a Profile, or None if the file is missing, truncated,
+  corrupt, from another format version, for a different number of line
+  sensors, or has implausible tables.
+- check_live() compares a few fresh line sensor samples (and optionally the
+  heading) against the profile to catch stale data: a reading well outside
+  the stored black/white range means the sensor or lighting has changed.
+
+File layout (little-endian):
+    '4sBB'  magic b'RMCP', version, number of line sensors n
+    'nf'    black calibration
+    'nf'    white calibration
+    '22s'   BNO055 offsets and radii (registers 0x55-0x6A)
+    'f'     start heading (degrees)
+    'H'     Fletcher-16 checksum of everything above
+"""
+
+import struct
+
+MAGIC = b'RMCP'
+VERSION = 1
+IMU_DATA_LEN = 22
+MIN_SPAN = 200      # Smallest believable white - black difference (ADC counts)
+
+class Profile:
+    def __init__(self, black, white, imu_data, heading):
+        self.black = black
+        self.white = white
+        self.imu_data = imu_data
+        self.heading = heading
+
+def _layout(n):
+    return '<4sBB%df%df%dsf' % (n, n, IMU_DATA_LEN)
+
+def _checksum(data):
+    # Fletcher-16
+    a = 0
+    b = 0
+    for byte in data:
+        a = (a + byte) % 255
+        b = (b + a) % 255
+    return (b << 8) | a
+
+def save(path, black, white, imu_data, heading):
+    # Writes a profile; returns True on success.
+    n = len(black)
+    fields = [MAGIC, VERSION, n] + list(black) + list(white) + [bytes(imu_data), heading]
+    body = struct.pack(_layout(n), *fields)
+    try:
+        with open(path, 'wb') as f:
+            f.write(body)
+            f.write(struct.pack('<H', _checksum(body)))
+    except OSError as e:
+        print("Calibration profile not saved:", e)
+        return False
+    return True
+
+def load(path, num_channels):
+    # Reads and validates a profile; returns None if it cannot be used.
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        print("No calibration profile found.")
+        return None
+
+    layout = _layout(num_channels)
+    size = struct.calcsize(layout)
+    if len(data) != size + 2:
+        print("Calibration profile rejected: wrong size.")
+        return None
+    body = data[:size]
+    if struct.unpack_from('<H', data, size)[0] != _checksum(body):
+        print("Calibration profile rejected: checksum mismatch.")
+        return None
+
+    fields = struct.unpack(layout, body)
+    magic, version, n = fields[0], fields[1], fields[2]
+    if magic != MAGIC or version != VERSION or n != num_channels:
+        print("Calibration profile rejected: format or sensor count mismatch.")
+        return None
+
+    black = list(fields[3:3 + n])
+    white = list(fields[3 + n:3 + 2 * n])
+    for i in range(n):
+        if white[i] - black[i] < MIN_SPAN:
+            print("Calibration profile rejected: channel", i, "span too small.")
+            return None
+
+    return Profile(black, white, fields[3 + 2 * n], fields[4 + 2 * n])
+
+def check_live(driver, profile, imu=None, margin=300, heading_tolerance=None):
+    # Samples the line sensors (and the heading when a tolerance is given)
+    # and returns True when they are consistent with the profile.
+
+    readings = driver.sample_inverted(num_samples=5, delay_ms=2)
+    for i in range(len(readings)):
+        if readings[i] < profile.black[i] - margin or readings[i] > profile.white[i] + margin:
+            print("Calibration profile stale: channel", i, "reads", readings[i])
+            return False
+
+    if imu is not None and heading_tolerance is not None:
+        error = (imu.read_heading() - profile.heading + 180) % 360 - 180
+        if abs(error) > heading_tolerance:
+            print("Calibration profile stale: heading off by", error)
+            return False
+
+    return True
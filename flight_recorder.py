@@ -0,0 +1,167 @@
+"""
+flight_recorder.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Binary flight recorder for control-loop telemetry. Each control tick is
+packed into one fixed-size record in a preallocated circular bytearray;
+when it is full the oldest records are overwritten. Recording does not
+allocate: every field is an integer packed with struct.pack_into, and the
+PID float terms are copied byte by byte from PID_controller.telemetry, where
+the controller packs them.
+
+Record layout (little-endian, RECORD_FMT then one byte per line channel):
+    t_us                 I   ticks_us() of the record
+    error, p, i, d       4f  line error and PID terms (PID_controller.telemetry)
+    left, right effort   2h  commanded efforts (%)
+    left, right counts   2i  encoder positions (counts)
+    heading              h   IMU heading, 1/16 degree
+    channels             nB  normalized line readings, 0..255 (white = 255)
+
+A dump is a header (HEADER_FMT: magic, version, channels, record size)
+followed by records oldest first. dump() writes the ring to any stream
+(a flash file or a pyb.UART). With a stream given to flush(), a
+low-priority task can append new records as the run goes, for runs longer
+than the ring. host/decode_flight.py turns a dump into CSV or NumPy arrays.
+"""
+
+from struct import pack_into, calcsize
+from time import ticks_us
+import init
+from linesensor import NORM_BITS
+
+MAGIC = b'RMFR'
+VERSION = 1
+HEADER_FMT = '<4sBBH'
+RECORD_FMT = '<I4fhhiih'
+FIELDS = ('t_us', 'error', 'p', 'i', 'd', 'left_effort', 'right_effort',
+          'left_counts', 'right_counts', 'heading_raw')
+
+CONTROL_OFFSET = const(4)   # Offset of the PID float bytes in a record
+CONTROL_SIZE = const(16)
+INT_OFFSET = const(20)      # Offset of efforts, counts and heading
+CHANNEL_SHIFT = NORM_BITS - 8
+
+class FlightRecorder:
+    def __init__(self, capacity=600, num_channels=7, control=None):
+        # capacity: records kept in RAM
+        # control: bytearray holding the packed error and PID terms (PID_controller.telemetry)
+        self.capacity = capacity
+        self.num_channels = num_channels
+        self.channel_offset = calcsize(RECORD_FMT)
+        self.record_size = self.channel_offset + num_channels
+        self.ring = bytearray(capacity * self.record_size)
+        self.control = control if control is not None else bytearray(CONTROL_SIZE)
+
+        self.index = 0      # Next slot to write
+        self.count = 0      # Valid records in the ring
+        self.total = 0      # Records written since start
+        self.flushed = 0    # Records written out by flush()
+        self.lost = 0       # Records overwritten before flush() reached them
+
+        # Sources, set with attach()
+        self.driver = None
+        self.left_enc = None
+        self.right_enc = None
+        self.imu = None
+
+    def attach(self, driver=None, left_enc=None, right_enc=None, imu=None):
+        # driver: LineSensorDriver, left/right_enc: Encoder, imu: IMUService
+        self.driver = driver
+        self.left_enc = left_enc
+        self.right_enc = right_enc
+        self.imu = imu
+
+    def record(self):
+        # Packs the current values into the next slot.
+        ring = self.ring
+        off = self.index * self.record_size
+        pack_into('<I', ring, off, ticks_us())
+
+        control = self.control
+        for k in range(CONTROL_SIZE):
+            ring[off + CONTROL_OFFSET + k] = control[k]
+
+        left = self.left_enc.position if self.left_enc is not None else 0
+        right = self.right_enc.position if self.right_enc is not None else 0
+        heading = self.imu.heading_raw if self.imu is not None else 0
+        pack_into('<hhiih', ring, off + INT_OFFSET, init.left_effort.peek(), init.right_effort.peek(),
+                  left, right, heading)
+
+        off += self.channel_offset
+        if self.driver is not None:
+            norm = self.driver.normalized_q
+            for k in range(self.num_channels):
+                value = norm[k] >> CHANNEL_SHIFT
+                ring[off + k] = value if value < 256 else 255
+
+        self.index += 1
+        if self.index == self.capacity:
+            self.index = 0
+        if self.count < self.capacity:
+            self.count += 1
+        self.total += 1
+
+    def task(self):
+        # Cooperative task: one record per run.
+        while True:
+            self.record()
+            yield 0
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+        self.total = 0
+        self.flushed = 0
+        self.lost = 0
+
+    def write_header(self, stream):
+        header = bytearray(calcsize(HEADER_FMT))
+        pack_into(HEADER_FMT, header, 0, MAGIC, VERSION, self.num_channels, self.record_size)
+        stream.write(header)
+
+    def _write_records(self, stream, first, n):
+        # Writes n records starting at ring slot first, wrapping around.
+        view = memoryview(self.ring)
+        size = self.record_size
+        while n > 0:
+            chunk = min(n, self.capacity - first)
+            stream.write(view[first * size:(first + chunk) * size])
+            n -= chunk
+            first = 0
+
+    def dump(self, stream):
+        # Writes the header and every record in the ring, oldest first.
+        self.write_header(stream)
+        first = (self.index - self.count) % self.capacity
+        self._write_records(stream, first, self.count)
+
+    def save(self, path):
+        # Dumps the ring to a file on flash.
+        with open(path, 'wb') as f:
+            self.dump(f)
+        print("Flight recorder: %d records (%d bytes each) saved to %s" % (self.count, self.record_size, path))
+
+    def flush(self, stream):
+        # Appends records written since the last flush; returns the number written.
+        # Start the stream with write_header().
+        pending = self.total - self.flushed
+        if pending > self.capacity:
+            self.lost += pending - self.capacity
+            pending = self.capacity
+        if pending:
+            first = (self.index - pending) % self.capacity
+            self._write_records(stream, first, pending)
+        self.flushed = self.total
+        return pending
+
+    def flush_task(self, stream, min_records=64):
+        # Cooperative task: flushes once min_records are pending. Flash writes
+        # can stall, so run it at the lowest priority.
+        while True:
+            if self.total - self.flushed >= min_records:
+                self.flush(stream)
+            yield 0
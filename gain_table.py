@@ -0,0 +1,88 @@
+"""
+gain_table.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Line-following gains by battery voltage, kept in a small text file on
+flash. The gains in PID_controller.py were tuned by hand at one charge;
+a table lets the run start with the gains that suit the pack voltage it
+starts at. host/tune_line.py writes the table from a simulated sweep.
+
+Functionality:
+- The file has one row per pack voltage:
+      volts  Kp  Ki  Kd  base_speed  window_size
+  separated by spaces. Blank lines and lines starting with '#' are skipped.
+- load() returns the rows sorted by voltage as tuples of those six values,
+  or None if the file is missing or any row is malformed or out of range,
+  so a bad table never half-applies.
+- select() returns the row for a pack voltage: the row with the nearest
+  voltage (window_size is a buffer length, so rows are not interpolated).
+- save() writes a table with a header naming the columns.
+"""
+
+COLUMNS = ("volts", "Kp", "Ki", "Kd", "base_speed", "window_size")
+MAX_WINDOW = 64  # Largest believable moving average window (samples)
+
+def _parse(line):
+    # Returns a row tuple, or None if the line is not a valid row.
+    fields = line.split()
+    if len(fields) != len(COLUMNS):
+        return None
+    try:
+        volts, kp, ki, kd = (float(f) for f in fields[:4])
+        base_speed = int(fields[4])
+        window = int(fields[5])
+    except ValueError:
+        return None
+    if volts < 0 or kp < 0 or ki < 0 or kd < 0 or not 0 < base_speed < 100 or not 0 < window <= MAX_WINDOW:
+        return None
+    return (volts, kp, ki, kd, base_speed, window)
+
+def load(path):
+    # Reads and validates a table; returns None if it cannot be used.
+    try:
+        with open(path) as f:
+            lines = f.read().split('\n')
+    except OSError:
+        return None
+
+    rows = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+        row = _parse(line)
+        if row is None:
+            print("Gain table rejected: bad row on line", number)
+            return None
+        rows.append(row)
+    if not rows:
+        print("Gain table rejected: no rows.")
+        return None
+    rows.sort()
+    return rows
+
+def select(rows, volts):
+    # Row whose voltage is nearest volts.
+    best = rows[0]
+    for row in rows:
+        if abs(row[0] - volts) < abs(best[0] - volts):
+            best = row
+    return best
+
+def save(path, rows, comment=None):
+    # Writes a table; returns True on success.
+    try:
+        with open(path, 'w') as f:
+            if comment:
+                f.write("# %s\n" % comment)
+            f.write("# %s\n" % "  ".join(COLUMNS))
+            for volts, kp, ki, kd, base_speed, window in sorted(rows):
+                f.write("%.2f  %g  %g  %g  %d  %d\n" % (volts, kp, ki, kd, base_speed, window))
+    except OSError as e:
+        print("Gain table not saved:", e)
+        return False
+    return True
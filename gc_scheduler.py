@@ -0,0 +1,82 @@
+"""
+gc_scheduler.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Scheduled garbage collection. MicroPython collects whenever an allocation
+finds the heap short, which can be in the middle of the line sensor or
+speed loop run and stall it for milliseconds. Here a low-priority task
+collects once the heap has grown by a set number of bytes, so the
+collections fall in the scheduler's idle slots instead.
+
+Functionality:
+- start() collects once (in place of main.py's single gc.collect() before
+  scheduling) and sets gc.threshold() to backstop bytes, larger than the
+  scheduled threshold, so the automatic collector only runs if the
+  scheduled one falls behind.
+- task() is a priority 0 task: every run it reads gc.mem_alloc() and
+  collects when the heap has grown threshold bytes since the last
+  collection. It runs only when no higher priority task is ready.
+- A heap that shrank between two runs without a scheduled collection was
+  collected automatically; those collections are counted, so a threshold
+  set too high shows up in stats().
+- stats() returns (scheduled collections, automatic collections, worst
+  collection us, mean collection us, heap bytes after the last collection).
+"""
+
+import gc
+from time import ticks_us, ticks_diff
+
+THRESHOLD = 8192     # Heap growth (bytes) that triggers a scheduled collection
+BACKSTOP = 3         # Automatic collector threshold, in multiples of THRESHOLD
+
+class GCScheduler:
+    def __init__(self, threshold=THRESHOLD, backstop=None):
+        # threshold: bytes allocated since the last collection that trigger one
+        # backstop: gc.threshold() for the automatic collector, None for BACKSTOP * threshold
+        self.threshold = threshold
+        self.backstop = backstop if backstop is not None else BACKSTOP * threshold
+        self.collections = 0
+        self.automatic = 0
+        self.worst_us = 0
+        self.total_us = 0
+        self.base = 0      # Heap bytes after the last collection
+        self.last = 0      # Heap bytes at the last run
+
+    def collect(self):
+        # Collects now and times it.
+        start = ticks_us()
+        gc.collect()
+        elapsed = ticks_diff(ticks_us(), start)
+        self.collections += 1
+        self.total_us += elapsed
+        if elapsed > self.worst_us:
+            self.worst_us = elapsed
+        self.base = self.last = gc.mem_alloc()
+
+    def start(self):
+        # Collects once and raises the automatic collector's threshold.
+        gc.threshold(self.backstop)
+        self.collect()
+        self.collections = 0
+        self.total_us = 0
+        self.worst_us = 0
+
+    def task(self):
+        # Cooperative task: one heap check per run, collecting past the threshold.
+        while True:
+            used = gc.mem_alloc()
+            if used < self.last:
+                self.automatic += 1
+                self.base = used
+            self.last = used
+            if used - self.base >= self.threshold:
+                self.collect()
+            yield 0
+
+    def stats(self):
+        collections = self.collections if self.collections else 1
+        return (self.collections, self.automatic, self.worst_us, self.total_us // collections, self.base)
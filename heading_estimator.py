@@ -0,0 +1,127 @@
+"""
+heading_estimator.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Heading estimate for turn control, faster than the BNO055 fused heading.
+The fused Euler heading comes out at the sensor's fusion rate and is
+already some milliseconds old when it is read, so a turn controller
+working on it alone sees the robot late and overshoots or has to turn
+slowly. Here the gyro yaw rate is integrated at every IMU read, and the
+fused heading only corrects the integral in a complementary filter: the
+gyro supplies the fast changes, the fused heading the absolute value and
+the gyro bias.
+
+Functionality:
+- update(rate, heading, stamp) is called with every IMU sample (the IMU
+  service does it from refresh()): rate is the heading rate (deg/s,
+  IMUService.yaw_rate()), heading the fused heading (degrees) and stamp
+  the ticks_us() of the read.
+- The estimate integrates rate minus the bias estimate. The fused heading
+  is compared with the estimate latency_us before the read, kept in a
+  short ring, so its delay is not mistaken for an error. The difference
+  corrects the heading by 2 / tau per second and the bias by 1 / tau**2
+  (a critically damped second-order filter with time constant tau).
+- heading() is the estimate in degrees (0 to 360, clockwise like the
+  BNO055); yaw_rate() the bias-corrected rate (deg/s); bias() the gyro
+  bias estimate. The estimate is continuous across 0/360 internally.
+- The first update (or reset()) starts from the fused heading with the
+  last bias estimate.
+"""
+
+from array import array
+from time import ticks_diff, ticks_add
+
+TAU = 0.5              # Filter time constant (s)
+LATENCY_US = 20_000    # Age of the fused heading when it is read (us)
+HISTORY = 16           # Past estimates kept for the latency (samples)
+
+def _wrap(degrees):
+    # Angle wrapped to -180..180 degrees.
+    return (degrees + 180) % 360 - 180
+
+class HeadingEstimator:
+    def __init__(self, tau=TAU, latency_us=LATENCY_US, history=HISTORY):
+        # tau: time constant (s); the gyro dominates faster changes, the fused heading slower ones
+        # latency_us: delay of the fused heading, at most history IMU periods
+        self.k_heading = 2 / tau
+        self.k_bias = 1 / (tau * tau)
+        self.latency_us = latency_us
+
+        # Ring of past (stamp, estimate - correction) pairs
+        self.stamps = array('l', [0] * history)
+        self.angles = array('f', [0.0] * history)
+        self.count = 0
+        self.index = 0
+
+        self.angle = 0.0       # Estimate, not wrapped (degrees)
+        self.correction = 0.0  # Sum of the heading corrections applied (degrees)
+        self.rate = 0.0        # Bias-corrected heading rate (deg/s)
+        self.gyro_bias = 0.0   # Gyro bias estimate (deg/s)
+        self.stamp = 0
+        self.started = False
+
+    def reset(self, heading=None, stamp=None):
+        # Restarts from a fused heading; None waits for the next update.
+        self.count = 0
+        self.correction = 0.0
+        self.started = heading is not None
+        if heading is not None:
+            self.angle = heading
+            self.stamp = stamp
+            self._push(stamp)
+
+    def _push(self, stamp):
+        # Records the estimate without the corrections applied so far, so later
+        # corrections shift the recorded past along with the present.
+        index = self.index
+        self.stamps[index] = stamp
+        self.angles[index] = self.angle - self.correction
+        index += 1
+        self.index = index if index < len(self.stamps) else 0
+        if self.count < len(self.stamps):
+            self.count += 1
+
+    def _past(self, stamp):
+        # Estimate at ticks_us() stamp, from the newest recorded sample not after it.
+        size = len(self.stamps)
+        index = self.index
+        for _ in range(self.count):
+            index = index - 1 if index else size - 1
+            if ticks_diff(stamp, self.stamps[index]) >= 0:
+                break
+        return self.angles[index] + self.correction
+
+    def update(self, rate, heading, stamp):
+        # Adds one IMU sample: heading rate (deg/s), fused heading (degrees), ticks_us() stamp.
+        if not self.started:
+            self.reset(heading, stamp)
+            return
+        dt = ticks_diff(stamp, self.stamp) / 1_000_000
+        if dt <= 0:
+            return
+        self.stamp = stamp
+        self.rate = rate - self.gyro_bias
+        self.angle += self.rate * dt
+        self._push(stamp)
+
+        error = _wrap(heading - self._past(ticks_add(stamp, -self.latency_us)))
+        step = self.k_heading * error * dt
+        self.angle += step
+        self.correction += step
+        self.gyro_bias -= self.k_bias * error * dt
+
+    def heading(self):
+        # Estimated heading in degrees (0 to 360).
+        return self.angle % 360
+
+    def yaw_rate(self):
+        # Bias-corrected heading rate in degrees per second.
+        return self.rate
+
+    def bias(self):
+        # Gyro bias estimate in degrees per second.
+        return self.gyro_bias
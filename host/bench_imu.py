@@ -0,0 +1,147 @@
+"""
+bench_imu.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host benchmark for the BNO055 driver against a fake I2C device. First
+checks that every read decodes the values set on the fake sensor, then
+compares the original bytearray/struct reads with the preallocated-buffer
+reads (time and bytes allocated per call), and separate accel, gyro and
+Euler reads with one burst read (I2C transactions and time on the wire).
+Allocation figures exclude what the fake bus itself allocates, measured
+with a bare mem_read into a preallocated buffer. Exits non-zero if
+decoding is wrong.
+
+Usage:
+    python host/bench_imu.py [calls]
+"""
+
+import sys
+import struct
+import tracemalloc
+from time import perf_counter
+from struct import unpack_from, calcsize
+
+import hostenv
+hostenv.install()
+hostenv.clock.use_virtual()
+
+from imu import BNO055
+from fake_bno055 import FakeBNO055
+
+def legacy_read_reg(imu, reg):
+    length = calcsize(reg[1])
+    buf = bytearray(length)
+    imu.i2c.mem_read(buf, imu.DEV_ADDR, reg[0])
+    return unpack_from(reg[1], buf)
+
+def legacy_read_heading(imu):
+    heading_struct = bytearray(2)
+    imu.i2c.mem_read(heading_struct, imu.DEV_ADDR, imu.reg.EUL_DATA_ALL[0])
+    return struct.unpack("<h", heading_struct)[0] / 16
+
+def legacy_read_euler(imu):
+    data_euler = bytearray(6)
+    imu.i2c.mem_read(data_euler, imu.DEV_ADDR, imu.reg.EUL_DATA_ALL[0])
+    head, roll, pitch = struct.unpack("<hhh", data_euler)
+    return head / 16, roll / 16, pitch / 16
+
+def legacy_read_gyro(imu):
+    return legacy_read_reg(imu, imu.reg.GYR_DATA)
+
+def check_decoding(imu, bno):
+    failures = 0
+    for heading, roll, pitch in ((0, 0, 0), (359.9375, -12.5, 45.25), (181.0, 90.0, -90.0)):
+        bno.set_euler(heading, roll, pitch)
+        bno.set_gyro(-250.5, 0.0625, 1000.0)
+        bno.set_accel(-9.81, 0.5, 19.6)
+        bno.set_mag(-40.0, 25.5, 60.0)
+        expect_gyro = (round(-250.5 * 16), 1, 16000)
+        expect_acc = (-981, 50, 1960)
+        expect_mag = (-640, 408, 960)
+        checks = (
+            (imu.read_heading(), legacy_read_heading(imu)),
+            (imu.read_euler(), legacy_read_euler(imu)),
+            (tuple(imu.read_angular_velocity()), expect_gyro),
+            (tuple(imu.read_acceleration()), expect_acc),
+            (tuple(imu.read_magnetic_field()), expect_mag),
+            (tuple(imu.read_burst()), expect_acc + expect_mag + expect_gyro
+             + (round(heading * 16), round(roll * 16), round(pitch * 16))),
+        )
+        for got, expect in checks:
+            if got != expect:
+                print("decode mismatch:", got, "!=", expect)
+                failures += 1
+    bno.set_calib_status(3, 3, 2, 1)
+    if imu.get_calibrate_status() != {"sys": 3, "gyro": 3, "accel": 2, "mag": 1}:
+        print("calibration status mismatch")
+        failures += 1
+    return failures
+
+def bytes_per_call(fun, calls=200):
+    fun()
+    tracemalloc.start()
+    total = 0
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fun()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / calls
+
+def per_call(fun, calls, bus_bytes):
+    start = perf_counter()
+    for _ in range(calls):
+        fun()
+    elapsed = (perf_counter() - start) / calls * 1e6
+    return elapsed, max(0.0, bytes_per_call(fun) - bus_bytes)
+
+def bus_cost(imu, fun, calls=100):
+    imu.i2c.transactions = 0
+    imu.i2c.bytes = 0
+    for _ in range(calls):
+        fun()
+    return imu.i2c.transactions / calls, imu.i2c.bus_time_us() / calls
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    bno = FakeBNO055.attach(bus=1)
+    imu = BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1)
+
+    failures = check_decoding(imu, bno)
+    print("decoding:", "OK" if not failures else "%d failures" % failures)
+
+    bno.set_euler(123.4, 1.0, -2.0)
+    scratch = bytearray(6)
+    bus_bytes = bytes_per_call(lambda: imu.i2c.mem_read(scratch, imu.DEV_ADDR, 0x1A))
+    print("\n%-22s %10s %10s %10s %10s" % ("read", "old us", "new us", "old B", "new B"))
+    pairs = (
+        ("read_heading", lambda: legacy_read_heading(imu), imu.read_heading),
+        ("read_heading_raw", lambda: legacy_read_heading(imu), imu.read_heading_raw),
+        ("read_euler", lambda: legacy_read_euler(imu), imu.read_euler),
+        ("read_angular_velocity", lambda: legacy_read_gyro(imu), imu.read_angular_velocity),
+    )
+    for name, old, new in pairs:
+        t_old, b_old = per_call(old, calls, bus_bytes)
+        t_new, b_new = per_call(new, calls, bus_bytes)
+        print("%-22s %10.2f %10.2f %10.0f %10.0f" % (name, t_old, t_new, b_old, b_new))
+
+    def separate():
+        imu.read_acceleration()
+        imu.read_angular_velocity()
+        imu.read_euler_raw()
+
+    n_sep, t_sep = bus_cost(imu, separate)
+    n_burst, t_burst = bus_cost(imu, imu.read_burst)
+    print("\naccel + gyro + euler: %d transactions, ~%.0f us on the bus (separate reads)" % (n_sep, t_sep))
+    print("                      %d transaction,  ~%.0f us on the bus (read_burst, includes mag)" % (n_burst, t_burst))
+
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
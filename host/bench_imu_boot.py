@@ -0,0 +1,110 @@
+"""
+bench_imu_boot.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host measurement of BNO055 bring-up time on the virtual clock, against a
+fake sensor with the datasheet boot (650 ms) and mode switching times
+(19 ms to CONFIG, 7 ms from CONFIG). Compares:
+- the original fixed delays (reset, delay(1000), initialize() with its
+  change_mode() and delay(50) calls),
+- readiness polling (BNO055() then initialize()),
+- bring_up() stepped as a task while other setup work runs, where only
+  the time after that work counts against startup.
+Also checks that bring-up ends in NDOF mode and that a sensor that never
+answers raises instead of hanging. Exits non-zero on a failed check.
+
+Usage:
+    python host/bench_imu_boot.py [other setup ms]
+"""
+
+import sys
+
+import hostenv
+hostenv.install()
+hostenv.clock.use_virtual()
+
+from pyb import delay, I2C
+from imu import BNO055
+from fake_bno055 import FakeBNO055
+
+clock = hostenv.clock
+
+def legacy_bring_up(imu_cls):
+    # The original sequence, reproduced with the same register writes.
+    imu = imu_cls(SDA='PB9', SCL='PB8', RST='PA15', bus=1, wait=False)
+    delay(10 + 1000)
+    for mode in (BNO055.CONFIG_MODE, BNO055.NDOF_MODE):
+        imu._write_reg(imu.reg.OPR_MODE, BNO055.CONFIG_MODE)
+        delay(10)
+        imu._write_reg(imu.reg.OPR_MODE, mode)
+        delay(20)
+        delay(50)
+        if mode == BNO055.CONFIG_MODE:
+            imu._write_reg(imu.reg.PWR_MODE, 0x00)
+            imu._write_reg(imu.reg.UNIT_SEL, 0x00)
+    return imu
+
+def timed(fun):
+    start = clock.us()
+    result = fun()
+    return result, (clock.us() - start) / 1000
+
+def polled():
+    imu = BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1)
+    imu.initialize()
+    return imu
+
+def overlapped(setup_ms):
+    # Reset, then step bring_up() once per millisecond of other setup work.
+    imu = BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1, wait=False)
+    steps = imu.bring_up()
+    for _ in range(setup_ms):
+        delay(1)
+        if not imu.ready:
+            next(steps, None)
+    start = clock.us()
+    BNO055.run(steps)
+    return imu, (clock.us() - start) / 1000
+
+def main():
+    setup_ms = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    failures = 0
+
+    bno = FakeBNO055.datasheet()
+    _, t_legacy = timed(lambda: legacy_bring_up(BNO055))
+    print("fixed delays:                 %7.1f ms (final mode 0x%02X)" % (t_legacy, bno.mode))
+
+    bno = FakeBNO055.datasheet()
+    imu, t_polled = timed(polled)
+    print("readiness polling:            %7.1f ms (final mode 0x%02X, %d NACKed polls)"
+          % (t_polled, bno.mode, bno.nacks))
+    if bno.mode != BNO055.NDOF_MODE or not imu.ready:
+        print("polled bring-up did not reach NDOF mode")
+        failures += 1
+
+    bno = FakeBNO055.datasheet()
+    (imu, t_left), t_total = timed(lambda: overlapped(setup_ms))
+    print("bring_up() beside %4d ms of setup: %5.1f ms total, %.1f ms after the setup"
+          % (setup_ms, t_total, t_left))
+    if bno.mode != BNO055.NDOF_MODE or not imu.ready:
+        print("stepped bring-up did not reach NDOF mode")
+        failures += 1
+
+    FakeBNO055.attach(boot_us=5_000_000)
+    try:
+        BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1)
+        print("silent sensor: no timeout")
+        failures += 1
+    except OSError as e:
+        print("silent sensor: %s" % e)
+
+    I2C.devices.clear()
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
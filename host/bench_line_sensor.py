@@ -0,0 +1,148 @@
+"""
+bench_line_sensor.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host benchmark for LineSensorDriver.line_reading. Compares the ring-buffer
+moving average against the original list-based implementation for several
+window sizes, reporting time per call and bytes allocated per call. The
+fixed-point path (line_reading_fixed) is measured alongside. CPython boxes
+every float and every int above 256, so host byte counts overstate what the
+board allocates; on MicroPython the fixed path only creates small ints.
+
+Usage:
+    python host/bench_line_sensor.py [calls]
+"""
+
+import sys
+import random
+import tracemalloc
+from time import perf_counter
+
+import hostenv
+hostenv.install()
+
+from linesensor import LineSensorDriver
+
+PINS = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
+
+class ListLineSensorDriver(LineSensorDriver):
+    # Original implementation: list buffers with pop(0) and sum() per tick.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buffers = [[] for _ in range(self.num_line_sensors)]
+
+    def line_reading(self):
+        self.update()
+
+        raw_values = self.get_values()
+        inverted = [4096 - x for x in raw_values]
+
+        moving_avg = []
+        for i in range(self.num_line_sensors):
+            self.buffers[i].append(inverted[i])
+            if len(self.buffers[i]) > self.window_size:
+                self.buffers[i].pop(0)
+            avg_val = sum(self.buffers[i]) / len(self.buffers[i])
+            moving_avg.append(avg_val)
+
+        normalized = []
+        for i in range(self.num_line_sensors):
+            diff = self.white_calib[i] - self.black_calib[i]
+            norm = (moving_avg[i] - self.black_calib[i]) / diff if diff != 0 else 0
+            norm = max(0, min(norm, 1))
+            normalized.append(norm)
+
+        total_weight = sum(normalized)
+        if total_weight > 0:
+            centroid = sum(n * pos for n, pos in zip(normalized, self.positions)) / total_weight
+        else:
+            centroid = (self.num_line_sensors + 1) / 2
+
+        center = (self.num_line_sensors + 1) / 2
+        error = centroid - center
+        scaled_error = max(self.error_range[0], min(error * 14, self.error_range[1]))
+        return scaled_error, normalized
+
+def make_driver(cls, window_size, seed=1):
+    driver = cls(PINS, window_size=window_size)
+    rng = random.Random(seed)
+    driver.black_calib = [rng.uniform(300, 600) for _ in PINS]
+    driver.white_calib = [rng.uniform(3200, 3800) for _ in PINS]
+    driver.build_tables()
+    return driver
+
+def feed(driver, rng):
+    for adc in driver.adc_line:
+        adc.value = rng.randrange(0, 4096)
+
+def time_per_call(driver, calls, method='line_reading'):
+    rng = random.Random(2)
+    frames = []
+    for _ in range(64):
+        frames.append([rng.randrange(0, 4096) for _ in PINS])
+    adcs = driver.adc_line
+    reading = getattr(driver, method)
+    start = perf_counter()
+    for k in range(calls):
+        frame = frames[k & 63]
+        for i in range(len(adcs)):
+            adcs[i].value = frame[i]
+        reading()
+    return (perf_counter() - start) / calls * 1e6
+
+def bytes_per_call(driver, calls, method='line_reading'):
+    # Peak transient allocation inside one call, averaged over calls
+    rng = random.Random(3)
+    reading = getattr(driver, method)
+    for _ in range(driver.window_size):
+        feed(driver, rng)
+        reading()
+    total = 0
+    tracemalloc.start()
+    for _ in range(calls):
+        feed(driver, rng)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        reading()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / calls
+
+def check_equivalent(window_size, calls=500):
+    old = make_driver(ListLineSensorDriver, window_size)
+    new = make_driver(LineSensorDriver, window_size)
+    rng = random.Random(4)
+    worst = 0.0
+    for _ in range(calls):
+        frame = [rng.randrange(0, 4096) for _ in PINS]
+        for i in range(len(PINS)):
+            old.adc_line[i].value = frame[i]
+            new.adc_line[i].value = frame[i]
+        e_old, _ = old.line_reading()
+        e_new, _ = new.line_reading()
+        worst = max(worst, abs(e_old - e_new))
+    return worst
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("window  list us/call  ring us/call  fixed us/call  list B/call  ring B/call  fixed B/call  max |d err|")
+    for window in (5, 10, 20, 50, 100):
+        old = make_driver(ListLineSensorDriver, window)
+        new = make_driver(LineSensorDriver, window)
+        t_old = time_per_call(old, calls)
+        t_new = time_per_call(new, calls)
+        t_fix = time_per_call(make_driver(LineSensorDriver, window), calls, 'line_reading_fixed')
+        b_old = bytes_per_call(make_driver(ListLineSensorDriver, window), 2000)
+        b_new = bytes_per_call(make_driver(LineSensorDriver, window), 2000)
+        b_fix = bytes_per_call(make_driver(LineSensorDriver, window), 2000, 'line_reading_fixed')
+        diff = check_equivalent(window)
+        print("%6d  %12.2f  %12.2f  %13.2f  %11.0f  %11.0f  %12.0f  %11.2e"
+              % (window, t_old, t_new, t_fix, b_old, b_new, b_fix, diff))
+
+if __name__ == "__main__":
+    main()
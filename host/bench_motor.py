@@ -0,0 +1,121 @@
+"""
+bench_motor.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host benchmark of the motor driver on the pyb Timer/Pin stand-ins, which
+count every DIR and compare write. The original Left_Motor.update (Share
+read of the multiplier, DIR and pulse_width_percent written every call)
+runs against motor.Motor.update per wheel and motor.MotorPair.update for
+both wheels, on effort traces for line following (efforts change most
+ticks), a maneuver (efforts held for hundreds of ms) and standing still.
+Reports time and pin/timer writes per tick for both wheels, and checks
+that every driver leaves the same DIR and compare value as the original.
+
+Usage:
+    python host/bench_motor.py [ticks]
+"""
+
+import sys
+import random
+from time import perf_counter
+
+import hostenv
+hostenv.install()
+
+import init
+import pyb
+from pyb import Pin, Timer
+from motor import Motor, MotorPair
+
+class Counter:
+    writes = 0
+
+def counting(cls, name):
+    # Wraps a stand-in method so every call with a value counts as a write.
+    original = getattr(cls, name)
+    def method(self, *args):
+        if args:
+            Counter.writes += 1
+        return original(self, *args)
+    setattr(cls, name, method)
+
+for name in ('value', 'high', 'low'):
+    counting(pyb.Pin, name)
+for name in ('pulse_width', 'pulse_width_percent'):
+    counting(pyb.TimerChannel, name)
+Pin.high = lambda self: Pin.value(self, 1)
+Pin.low = lambda self: Pin.value(self, 0)
+
+class LegacyMotor:
+    # The original Left_Motor / Right_Motor.
+    def __init__(self, PWM, DIR, nSLP, timer_num, channel):
+        self.DIR_pin = Pin(DIR, mode=Pin.OUT_PP, value=0)
+        self.nSLP_pin = Pin(nSLP, mode=Pin.OUT_PP, value=0)
+        self.timer = Timer(timer_num, freq=20000)
+        self.PWM = self.timer.channel(channel, Timer.PWM, pin=Pin(PWM))
+
+    def update(self, duty_cycle):
+        multiplier = init.constant_multiplier.get()
+        compensated_duty = max(-100, min(100, duty_cycle * multiplier))
+        if compensated_duty < 0:
+            self.DIR_pin.high()
+            self.PWM.pulse_width_percent(abs(compensated_duty))
+        else:
+            self.DIR_pin.low()
+            self.PWM.pulse_width_percent(compensated_duty)
+
+LEFT = dict(PWM='PB4', DIR='PH1', nSLP='PH0', timer_num=3, channel=1)
+RIGHT = dict(PWM='PB7', DIR='PC10', nSLP='PC11', timer_num=4, channel=2)
+
+def traces(ticks):
+    rng = random.Random(3)
+    line = [(18 - e, 18 + e) for e in (rng.randint(-12, 12) for _ in range(ticks))]
+    maneuver = []
+    for left, right, ms in ((-20, -20, 400), (20, -20, 600), (20, 20, 600), (-20, 20, 400), (20, 20, 300)):
+        maneuver += [(left, right)] * (ms // 11)
+    maneuver = (maneuver * (ticks // len(maneuver) + 1))[:ticks]
+    return (("line following", line), ("maneuver", maneuver), ("standing still", [(0, 0)] * ticks))
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    init.constant_multiplier.put(0.9)
+    print("%-16s %-22s %9s %12s" % ("trace", "driver", "us/tick", "writes/tick"))
+    ok = True
+    for name, trace in traces(ticks):
+        legacy = (LegacyMotor(**LEFT), LegacyMotor(**RIGHT))
+        motors = (Motor(**LEFT), Motor(**RIGHT))
+        pair_motors = (Motor(**LEFT), Motor(**RIGHT))
+        pair = MotorPair(*pair_motors)
+
+        def run_legacy(left, right):
+            legacy[0].update(left)
+            legacy[1].update(right)
+
+        def run_motors(left, right):
+            motors[0].update(left)
+            motors[1].update(right)
+
+        for driver, run, wheels in (("original update", run_legacy, legacy),
+                                    ("Motor.update", run_motors, motors),
+                                    ("MotorPair.update", pair.update, pair_motors)):
+            Counter.writes = 0
+            start = perf_counter()
+            for left, right in trace:
+                run(left, right)
+            elapsed = perf_counter() - start
+            print("%-16s %-22s %9.2f %12.2f" % (name, driver, elapsed / ticks * 1e6, Counter.writes / ticks))
+            state = [(m.DIR_pin._value, m.PWM.pulse_width()) for m in wheels]
+            if driver == "original update":
+                expect = state
+            elif state != expect:
+                print("    FAIL: ends at %s, original at %s" % (state, expect))
+                ok = False
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
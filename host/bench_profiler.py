@@ -0,0 +1,129 @@
+"""
+bench_profiler.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check and overhead measurement for the task profiler.
+
+1. Wrapper overhead per run, measured with measure_overhead() on the real
+   clock (the same call main.py makes at startup on the board).
+2. The main.py task set (default settings: speed loops, no record stream
+   or input capture) runs under the cotask stand-in on the virtual clock
+   with the run costs sim_track.py uses; the task names must be the ones
+   main.py schedules. Every 40th PID run takes 15 ms, which blows the
+   11 ms control budget. The profiler must name PID as the
+   worst task, count exactly those overruns, and keep histogram totals
+   equal to the run counts. Its worst start latency must match what the
+   scheduler itself measured.
+
+Exits non-zero if a check fails.
+
+Usage:
+    python host/bench_profiler.py [seconds]
+"""
+
+import os
+import re
+import sys
+
+import hostenv
+hostenv.install()
+from hostenv import clock, REPO_DIR
+
+import cotask
+from task_profiler import TaskProfiler, measure_overhead
+
+IDLE_STEP_US = 50
+SPIKE_EVERY = 40
+SPIKE_US = 15_000
+
+# name, priority, period (ms), run cost (us), as main.py schedules them
+TASKS = (
+    ("Mission", 3, 10, 60),
+    ("Motion", 2, 10, 250),
+    ("Line Sensor", 2, 11, 900),
+    ("IMU Service", 1, 20, 700),
+    ("PID Controller", 1, 11, 400),
+    ("Left Speed", 3, 5, 250),
+    ("Right Speed", 3, 5, 250),
+    ("Encoder Update", 0, 25, 600),
+    ("Battery", 0, 100, 300),
+    ("Recorder", 0, 11, 200),
+    ("GC", 0, 20, 40),
+)
+UNPROFILED = (("Profiler", 0, 200, 50),)  # Plain tasks in main.py
+OTHER_SETTINGS = ("Motors", "Record Flush", "Capture Flush")  # Scheduled by main.py with other settings
+
+def main_task_names():
+    # Task names main.py schedules under any setting.
+    with open(os.path.join(REPO_DIR, 'main.py')) as f:
+        return set(re.findall(r'name="([^"]+)"', f.read()))
+
+def costing(name, cost_us):
+    # Task body that spends cost_us of virtual time per run (PID spikes).
+    def run():
+        runs = 0
+        while True:
+            runs += 1
+            spike = name == "PID Controller" and runs % SPIKE_EVERY == 0
+            clock.advance(SPIKE_US if spike else cost_us)
+            yield 0
+    return run
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ok = True
+
+    clock.use_real()
+    print("wrapper overhead: %.2f us per run (host CPython, real clock)" % measure_overhead(20000))
+
+    clock.use_virtual()
+    profiler = TaskProfiler()
+    tasks = cotask.TaskList()
+    for name, priority, period, cost in TASKS:
+        tasks.append(profiler.task(costing(name, cost), name=name, priority=priority, period=period))
+    for name, priority, period, cost in UNPROFILED:
+        tasks.append(cotask.Task(costing(name, cost), name=name, priority=priority, period=period))
+
+    end = clock.us() + int(seconds * 1e6)
+    while clock.us() < end:
+        before = clock.us()
+        tasks.pri_sched()
+        if clock.us() == before:
+            clock.advance(IDLE_STEP_US)
+
+    print()
+    profiler.dump()
+    print()
+
+    worst = max(profiler.profiles, key=lambda p: p.worst_us)
+    pid = [p for p in profiler.profiles if p.name == "PID Controller"][0]
+    expect_overruns = pid.runs // SPIKE_EVERY
+    simulated = set(task[0] for task in TASKS + UNPROFILED)
+    checks = (
+        ("tasks match main.py", simulated == main_task_names() - set(OTHER_SETTINGS)),
+        ("worst task is PID", worst.name == "PID Controller"),
+        ("PID overruns = %d" % expect_overruns, pid.overruns == expect_overruns),
+        ("histogram totals = runs", all(sum(p.run_hist) == p.runs and sum(p.late_hist) == p.runs
+                                        for p in profiler.profiles)),
+    )
+    for name, good in checks:
+        print("%-32s %s" % (name, "OK" if good else "FAIL"))
+        ok &= good
+
+    print("\nworst start latency (ms)   profiler  scheduler")
+    by_name = {task.name: task for task in tasks.tasks()}
+    for profile in profiler.profiles:
+        sched = by_name[profile.name].max_late_us
+        good = abs(profile.max_late_us - sched) <= 1000
+        print("  %-24s %8.1f %10.1f  %s" % (profile.name, profile.max_late_us / 1000, sched / 1000,
+                                            "OK" if good else "FAIL"))
+        ok &= good
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+bench_state.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host microbenchmark of the state block (state.py) against task_share.Share.
+Times one get and one put through a thread-protected Share, an unprotected
+Share, a state.Field, and a direct state block subscript (through the
+module and through a local alias, as the hot loops use it). Then times the
+flag reads one PID_value tick makes (state input, motion active, override
+mode) and one odometry publish (six floats), with Shares and with the
+block, and scales the difference to one second of the 11 ms loop.
+The host task_share stand-in mirrors the board's, so the ratios carry
+over; the absolute times do not.
+
+Usage:
+    python host/bench_state.py [iterations]
+"""
+
+import sys
+from timeit import timeit
+
+import hostenv
+hostenv.install()
+
+import state
+from state import Field
+from task_share import Share
+
+def per_call_ns(statement, n, names):
+    # Mean time of statement in ns, less the cost of an empty loop.
+    base = timeit('pass', number=n)
+    return max(0.0, timeit(statement, globals=names, number=n) - base) / n * 1e9
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    protected = Share('h', thread_protect=True, name="Protected")
+    plain = Share('h', thread_protect=False, name="Plain")
+    field = Field(state.ints, state.MOTION_ACTIVE, name="Field")
+    ints = state.ints
+    floats = state.floats
+    X = state.MOTION_ACTIVE
+    names = dict(locals(), state=state)
+
+    print("%-30s %10s %10s" % ("access", "get (ns)", "put (ns)"))
+    rows = (("Share, thread_protect=True", "protected.get()", "protected.put(1)"),
+            ("Share, thread_protect=False", "plain.get()", "plain.put(1)"),
+            ("state.Field", "field.get()", "field.put(1)"),
+            ("state.ints[state.X]", "state.ints[state.MOTION_ACTIVE]", "state.ints[state.MOTION_ACTIVE] = 1"),
+            ("local alias ints[X]", "ints[X]", "ints[X] = 1"))
+    for name, get, put in rows:
+        print("%-30s %10.0f %10.0f" % (name, per_call_ns(get, n, names), per_call_ns(put, n, names)))
+
+    # One PID_value tick's flag reads and one odometry publish
+    names['flags'] = [Share('h', thread_protect=True) for _ in range(3)]
+    names['pose'] = [Share('f', thread_protect=True) for _ in range(6)]
+    share_tick = "\n".join(["flags[%d].get() == 1" % k for k in range(3)] +
+                           ["pose[%d].put(1.5)" % k for k in range(6)])
+    block_tick = "\n".join(["ints[state.%s] == 1" % f for f in ("STATE_INPUT", "MOTION_ACTIVE", "OVERRIDE_MODE")] +
+                           ["floats[state.%s] = 1.5" % f for f in ("DISTANCE", "POSE_X", "POSE_Y", "POSE_THETA",
+                                                                  "LINEAR_VELOCITY", "ANGULAR_VELOCITY")])
+    shares_ns = per_call_ns(share_tick, n // 4, names)
+    block_ns = per_call_ns(block_tick, n // 4, names)
+    ticks = 1000 / 11
+    print("\ncontrol tick (3 flag reads, 6 float writes): Shares %.0f ns, state block %.0f ns (%.1fx)"
+          % (shares_ns, block_ns, shares_ns / block_ns if block_ns else 0))
+    print("saved per second of the 11 ms loop: %.1f us" % ((shares_ns - block_ns) * ticks / 1000))
+
+if __name__ == "__main__":
+    main()
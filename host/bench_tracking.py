@@ -0,0 +1,121 @@
+"""
+bench_tracking.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host benchmark for the LineSensorDriver tracking mode. Runs a tracking
+driver and a full-sweep driver side by side on a synthetic line that
+wanders under the array and passes dashes, a diamond and perpendicular
+crossings. Reports ADC reads per tick, how often tracking fell back to a
+full sweep, the error difference from the full sweep and the accuracy of
+the interpolated line position.
+The difference from the full sweep is bounded, mean and largest, on a
+single line and through each feature (followed by a moving average window
+to settle), where a full sweep sees more than the tracking window. Exits
+non-zero when a bound is exceeded.
+
+Usage:
+    python host/bench_tracking.py [ticks]
+"""
+
+import sys
+import math
+import random
+
+import hostenv
+hostenv.install()
+
+from linesensor import LineSensorDriver, ERROR_ONE
+
+PINS = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
+BLACK = 450.0   # Inverted reading over the line
+WHITE = 3550.0  # Inverted reading over the board
+FEATURES = (('dash gap', 200, 215), ('crossing', 300, 306), ('diamond', 400, 440))  # Phases in ticks % 600
+SETTLE = 10     # Ticks after a feature counted with it (the moving average window)
+LINE_MAX = 0.6  # Largest |error - full sweep| on a single line
+LINE_MEAN = 0.2
+FEATURE_MEAN = 0.5  # Mean |error - full sweep| through each feature
+FEATURE_MAX = 1.5   # Largest |error - full sweep| through each feature
+
+def darkness(ch, tick, line_pos):
+    # Fraction of black seen by channel ch (0-based) on this tick
+    phase = tick % 600
+    if 200 <= phase < 215:
+        return 0.0                                   # Dash gap
+    if 300 <= phase < 306:
+        return 1.0                                   # Perpendicular crossing
+    if 400 <= phase < 440:
+        spread = 1.5 * math.sin(math.pi * (phase - 400) / 40)
+        return max(math.exp(-((ch - line_pos - spread) / 0.6) ** 2),
+                   math.exp(-((ch - line_pos + spread) / 0.6) ** 2))   # Diamond
+    return math.exp(-((ch - line_pos) / 0.6) ** 2)
+
+def segment(tick):
+    # Feature the tick belongs to, or 'line' for a single line.
+    phase = tick % 600
+    for name, start, end in FEATURES:
+        if start <= phase < end + SETTLE:
+            return name
+    return 'line'
+
+def make_driver(tracking):
+    driver = LineSensorDriver(PINS, fixed_point=True, tracking=tracking)
+    driver.black_calib = [BLACK] * len(PINS)
+    driver.white_calib = [WHITE] * len(PINS)
+    driver.build_tables()
+    return driver
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    rng = random.Random(7)
+    full = make_driver(False)
+    track = make_driver(True)
+
+    diffs = dict((name, [0, 0.0, 0.0]) for name in ['line'] + [f[0] for f in FEATURES])  # ticks, sum, max
+    pos_sum = 0.0
+    pos_n = 0
+    for tick in range(ticks):
+        line_pos = 3.0 + 2.2 * math.sin(tick / 90.0)
+        for i in range(len(PINS)):
+            inv = WHITE + (BLACK - WHITE) * darkness(i, tick, line_pos) + rng.gauss(0, 25)
+            raw = min(4095, max(0, int(4096 - inv)))
+            full.adc_line[i].value = raw
+            track.adc_line[i].value = raw
+        e_full, _ = full.line_reading_fixed()
+        e_track, _ = track.line_reading_fixed()
+        diff = abs(e_full - e_track) / ERROR_ONE
+        stats = diffs[segment(tick)]
+        stats[0] += 1
+        stats[1] += diff
+        stats[2] = max(stats[2], diff)
+        if track.since_full > 0:
+            pos_sum += abs(track.line_position_q / ERROR_ONE - (line_pos + 1))
+            pos_n += 1
+
+    reads_full = sum(adc.reads for adc in full.adc_line) / ticks
+    reads_track = sum(adc.reads for adc in track.adc_line) / ticks
+    sweeps, tracked, fallbacks = track.tracking_stats()
+    print("ADC reads per tick:   full %.2f  tracking %.2f  (%.0f%% saved)"
+          % (reads_full, reads_track, 100 * (1 - reads_track / reads_full)))
+    print("tracking ticks:       %d full sweeps, %d tracked, %d fallbacks (%.1f%% of tracked)"
+          % (sweeps, tracked, fallbacks, 100 * fallbacks / max(1, tracked)))
+    print("line position error:  mean %.3f sensor pitches while tracking" % (pos_sum / max(1, pos_n)))
+
+    ok = True
+    print("\n|error - full sweep|  ticks    mean     max")
+    for name, (count, total, largest) in diffs.items():
+        mean = total / max(1, count)
+        if name == 'line':
+            good = mean < LINE_MEAN and largest < LINE_MAX
+        else:
+            good = mean < FEATURE_MEAN and largest < FEATURE_MAX
+        print("%-20s %6d %7.4f %7.4f  %s" % (name, count, mean, largest, "OK" if good else "FAIL"))
+        ok &= good
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
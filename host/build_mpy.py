@@ -0,0 +1,128 @@
+"""
+build_mpy.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Builds the deployment bundle for the board. Every board module in the repo
+is cross-compiled to MicroPython bytecode (.mpy) with mpy-cross, so the
+board loads bytecode at import instead of compiling the source text on
+every boot, which costs both time and the parser's heap. Modules are
+written under their board names (imy.py becomes imu.mpy, line_sensor.py
+linesensor.mpy; see hostenv.ALIASES). boot.py and main.py are copied as
+source: the board runs those two files as text, and main.py only sets up
+and schedules when it runs as the main script.
+
+The board imports name.py before name.mpy, so the old .py copies of the
+modules must be deleted from flash when the bundle is copied on, e.g.
+    mpremote rm :imu.py ... + cp build/* :
+The .mpy format must match the firmware: install the mpy-cross release
+of the board's MicroPython (pip install mpy-cross==<version>); the version
+it reports is printed here.
+
+For every module the build prints the source and .mpy sizes and how long
+CPython takes to compile the source, a rough guide to the compile work
+each boot no longer does. The boot_timeline report on the board (time and
+heap per setup step) measures the real difference: run once with the
+source files and once with the bundle.
+
+Usage:
+    python host/build_mpy.py [out=DIR] [opt=N] [mpy_cross=PATH]
+    opt: mpy-cross optimisation level (-O); 1 and up drop assert statements
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+from time import perf_counter
+
+from hostenv import REPO_DIR, ALIASES
+
+SOURCE_ONLY = ('boot.py', 'main.py')  # Run as text by the board
+
+def board_name(file_name):
+    # Module file name on the board (without extension).
+    for name, repo_name in ALIASES.items():
+        if repo_name == file_name:
+            return name
+    return file_name[:-3]
+
+def find_mpy_cross(path=None):
+    # Command that runs mpy-cross, or None if it is not installed.
+    if path:
+        return [path]
+    exe = shutil.which('mpy-cross')
+    if exe:
+        return [exe]
+    try:
+        import mpy_cross
+    except ImportError:
+        return None
+    return [sys.executable, '-m', 'mpy_cross']
+
+def modules():
+    # Repo file names of the board modules, sorted.
+    return sorted(f for f in os.listdir(REPO_DIR)
+                  if f.endswith('.py') and f not in SOURCE_ONLY and os.path.isfile(os.path.join(REPO_DIR, f)))
+
+def compile_ms(path):
+    # CPython compile time of a source file (ms), best of three.
+    with open(path) as f:
+        text = f.read()
+    best = None
+    for _ in range(3):
+        start = perf_counter()
+        compile(text, path, 'exec')
+        elapsed = (perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def build(out, opt=0, command=None):
+    # Writes the bundle to out; returns [(board file, source B, bundle B, compile ms)].
+    os.makedirs(out, exist_ok=True)
+    rows = []
+    for file_name in modules():
+        source = os.path.join(REPO_DIR, file_name)
+        target = os.path.join(out, board_name(file_name) + '.mpy')
+        args = command + ['-o', target, '-s', board_name(file_name) + '.py']
+        if opt:
+            args.append('-O%d' % opt)
+        result = subprocess.run(args + [source], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SystemExit("mpy-cross failed on %s:\n%s" % (file_name, result.stderr.strip()))
+        rows.append((os.path.basename(target), os.path.getsize(source), os.path.getsize(target), compile_ms(source)))
+    for file_name in SOURCE_ONLY:
+        source = os.path.join(REPO_DIR, file_name)
+        shutil.copy(source, os.path.join(out, file_name))
+        size = os.path.getsize(source)
+        rows.append((file_name, size, size, compile_ms(source)))
+    return rows
+
+def main():
+    options = dict(out=os.path.join(REPO_DIR, 'build'), opt=0, mpy_cross='')
+    for arg in sys.argv[1:]:
+        name, _, value = arg.partition('=')
+        if name not in options:
+            raise SystemExit("unknown argument %r" % arg)
+        options[name] = type(options[name])(value)
+
+    command = find_mpy_cross(options['mpy_cross'])
+    if command is None:
+        raise SystemExit("mpy-cross not found: pip install mpy-cross==<board MicroPython version>")
+    version = subprocess.run(command + ['--version'], capture_output=True, text=True).stdout.strip()
+    print(version)
+
+    rows = build(options['out'], options['opt'], command)
+    print("\n%-20s %9s %9s %11s" % ("board file", "source B", "bundle B", "compile ms"))
+    for name, source, bundle, ms in rows:
+        print("%-20s %9d %9d %11.2f" % (name, source, bundle, ms))
+    compiled = [row for row in rows if row[0].endswith('.mpy')]
+    print("%-20s %9d %9d %11.2f" % ("modules (.mpy)", sum(r[1] for r in compiled), sum(r[2] for r in compiled),
+                                    sum(r[3] for r in compiled)))
+    print("\n%d modules compiled, bundle in %s" % (len(compiled), options['out']))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+check_alloc.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check that the control hot paths do not allocate in steady state, so
+the scheduled collector (gc_scheduler.py) has little to do and never has
+to stop a control run. Covers line_reading and line_reading_fixed on the
+200 Hz sampler, a PID_value run, the left and right WheelSpeedLoop tasks,
+the open-loop MotorPair task and Encoder.update, on the virtual clock with
+changing line, line error and encoder inputs. Each path is warmed up, then:
+1. Retained bytes: tracemalloc over [calls] calls must show less than one
+   byte kept per call (nothing grows).
+2. Allocation sites: every project function a call reaches (found with
+   sys.setprofile) is scanned for bytecode that builds an object on
+   MicroPython: tuple, list, dict, set, slice and string builds, closures,
+   *args calls and calls of the container constructors. Any site not in
+   ALLOWED fails.
+CPython hides short-lived allocations in freelists, and boxes ints that
+MicroPython keeps small, so transient bytes are not measured here; the
+scan stands in for them. Floats allocate on the board whatever the code
+does, which neither test sees; the profiler's track_alloc columns
+measure those on the robot.
+Exits non-zero on failure.
+
+Usage:
+    python host/check_alloc.py [calls]
+"""
+
+import os
+import sys
+import dis
+import random
+import tracemalloc
+
+import hostenv
+hostenv.install()
+from hostenv import clock, REPO_DIR
+clock.use_virtual()
+
+import pyb
+import init
+from linesensor import LineSensorDriver
+from line_sampler import LineSampler, ADCBackend
+from PID_controller import PID_value
+from encoder import Encoder
+from left_motor import left_motor
+from right_motor import right_motor
+from motor import MotorPair
+from wheel_speed import WheelSpeedLoop
+
+PINS = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
+WARMUP = 200
+
+ALLOC_OPS = {'BUILD_TUPLE', 'BUILD_LIST', 'BUILD_MAP', 'BUILD_CONST_KEY_MAP', 'BUILD_SET', 'BUILD_SLICE',
+             'BUILD_STRING', 'FORMAT_VALUE', 'MAKE_FUNCTION', 'CALL_FUNCTION_EX', 'LIST_EXTEND', 'DICT_MERGE'}
+ALLOC_NAMES = {'list', 'dict', 'set', 'tuple', 'bytes', 'bytearray', 'array', 'memoryview', 'str',
+               'sorted', 'enumerate', 'zip', 'map', 'filter', 'format'}
+ALLOC_METHODS = {'format', 'join', 'split', 'copy', 'encode', 'decode'}
+
+# Known sites, (function, op or name): why they stay
+ALLOWED = {
+    # The (error, normalized) result; 16 bytes per call on the board, left to the scheduled collector
+    ('LineSensorDriver.line_reading', 'BUILD_TUPLE'),
+    ('LineSensorDriver.line_reading_fixed', 'BUILD_TUPLE'),
+}
+
+def sites(code):
+    # (op or name, line) of every allocating instruction in a code object.
+    found = []
+    line = None
+    for ins in dis.get_instructions(code):
+        if ins.starts_line is not None:
+            line = ins.starts_line
+        if ins.opname in ALLOC_OPS:
+            found.append((ins.opname, line))
+        elif ins.opname in ('LOAD_GLOBAL', 'LOAD_NAME') and ins.argval in ALLOC_NAMES:
+            found.append((ins.argval, line))
+        elif ins.opname in ('LOAD_METHOD', 'LOAD_ATTR') and ins.argval in ALLOC_METHODS:
+            found.append(('.' + ins.argval, line))
+    return found
+
+def reached(call):
+    # Code objects of the project functions one call runs.
+    codes = {}
+    def profile(frame, event, arg):
+        code = frame.f_code
+        if event == 'call' and os.path.dirname(os.path.abspath(code.co_filename)) == REPO_DIR:
+            codes[code] = code.co_qualname if hasattr(code, 'co_qualname') else code.co_name
+    sys.setprofile(profile)
+    try:
+        call()
+    finally:
+        sys.setprofile(None)
+    return codes
+
+def retained(call, calls):
+    # Bytes kept per call after the warm-up.
+    tracemalloc.start()
+    for _ in range(10):
+        call()  # Settles what the first traced calls create
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(calls):
+        call()
+    kept = (tracemalloc.get_traced_memory()[0] - before) / calls
+    tracemalloc.stop()
+    return kept
+
+def build():
+    # Hot paths as (name, call) with their inputs moving between calls.
+    rng = random.Random(3)
+    counters = {}
+
+    def line_input():
+        position = rng.uniform(1, 7)
+        for k, pin in enumerate(PINS):
+            pyb.ADC.by_pin[pin].value = max(0, min(4095, int(3800 - 700 * (k + 1 - position) ** 2)))
+
+    def wheels():
+        for encoder in (left_enc, right_enc):
+            timer = encoder.enc_timer
+            counters[timer] = (counters.get(timer, 0) + rng.randint(0, 60)) & 0xFFFF
+            timer.counter(counters[timer])
+
+    def tick(us):
+        line_input()
+        wheels()
+        clock.advance(us)
+
+    float_driver = LineSensorDriver(line_pins=PINS, window_size=10)
+    float_driver.load_calibration([800] * len(PINS), [3800] * len(PINS))
+    fixed_driver = LineSensorDriver(line_pins=PINS, window_size=10, fixed_point=True)
+    fixed_driver.load_calibration([800] * len(PINS), [3800] * len(PINS))
+    sampler = LineSampler(ADCBackend(fixed_driver.adc_line), timer_num=6, freq=200)
+    fixed_driver.attach_sampler(sampler)
+    sampler.start()
+
+    left_enc = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
+    right_enc = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
+    left_loop = WheelSpeedLoop(left_motor, left_enc, init.left_effort, init.left_speed)
+    right_loop = WheelSpeedLoop(right_motor, right_enc, init.right_effort, init.right_speed)
+    motors = MotorPair(left_motor, right_motor)
+    motors.enable()
+
+    init.state_input.put(0)
+    init.motion_active.put(0)
+    init.override_mode.put(0)
+    pid = PID_value()
+    left_task = left_loop.task()
+    right_task = right_loop.task()
+    motor_task = motors.task(init.left_effort, init.right_effort)
+
+    def line_reading():
+        tick(11_000)
+        float_driver.line_reading()
+
+    def line_reading_fixed():
+        tick(11_000)
+        fixed_driver.line_reading_fixed()
+
+    def pid_run():
+        tick(11_000)
+        init.line_error.put(rng.uniform(-3, 3))
+        next(pid)
+
+    def speed_runs():
+        tick(5_000)
+        init.left_effort.put(rng.randint(-60, 60))
+        init.right_effort.put(rng.randint(-60, 60))
+        next(left_task)
+        next(right_task)
+
+    def motor_run():
+        tick(11_000)
+        init.left_effort.put(rng.randint(-100, 100))
+        init.right_effort.put(rng.randint(-100, 100))
+        next(motor_task)
+
+    def encoder_update():
+        tick(25_000)
+        left_enc.update()
+
+    return [
+        ("line_reading", line_reading),
+        ("line_reading_fixed", line_reading_fixed),
+        ("PID_value", pid_run),
+        ("WheelSpeedLoop.task", speed_runs),
+        ("MotorPair.task", motor_run),
+        ("Encoder.update", encoder_update),
+    ]
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ok = True
+    print("%-20s %9s %6s  %s" % ("path", "B kept", "funcs", "allocation sites"))
+    for name, call in build():
+        for _ in range(WARMUP):
+            call()
+        kept = retained(call, calls)
+        codes = reached(call)
+        found = []
+        for code, qualname in codes.items():
+            for op, line in sites(code):
+                if (qualname, op) not in ALLOWED:
+                    found.append("%s:%s %s" % (qualname, line, op))
+        good = kept < 1 and not found
+        print("%-20s %9.2f %6d  %s  %s" % (name, kept, len(codes), ", ".join(found) or "none",
+                                          "OK" if good else "FAIL"))
+        ok &= good
+    print("allowed:", ", ".join("%s %s" % site for site in sorted(ALLOWED)))
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+check_battery.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check for the battery monitor on a simulated discharge. A 6-cell NiMH
+pack runs from full to empty over RUN_S seconds (open-circuit voltage
+from a piecewise-linear discharge curve), sags under a motor load that
+changes every second through its internal resistance, and is read
+through the PC4 divider with ADC noise. The Battery task runs every
+100 ms on the virtual clock. Then:
+- the published voltage must follow the loaded pack voltage;
+- the multiplier must never move faster than max_rate;
+- motor authority (multiplier * pack volts / 7.2) must stay near 1, where
+  the multiplier frozen at startup drifts with the charge;
+- a 300 ms load dip below the low threshold must not raise the
+  low-voltage event, and the run-down past it must raise it exactly once,
+  latched without the task printing.
+Exits non-zero on failure.
+
+Usage:
+    python host/check_battery.py
+"""
+
+import io
+import sys
+import random
+from contextlib import redirect_stdout
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+clock.use_virtual()
+
+import init
+from pyb import ADC, Pin
+from battery_monitor import BatteryMonitor, DIVIDER, ADC_VREF, ADC_FULL, V_NOMINAL
+
+RUN_S = 240
+PERIOD_MS = 100
+R_INTERNAL = 0.4   # Pack resistance (ohm)
+NOISE_LSB = 20
+# (state of charge, open-circuit pack volts)
+CURVE = ((1.0, 8.4), (0.9, 7.7), (0.5, 7.3), (0.15, 6.9), (0.05, 6.4), (0.0, 5.8))
+DIP_S = (150.0, 150.3)  # Motor stall: 3 A for 300 ms
+
+def open_circuit(soc):
+    for (s0, v0), (s1, v1) in zip(CURVE, CURVE[1:]):
+        if soc >= s1:
+            return v1 + (v0 - v1) * (soc - s1) / (s0 - s1)
+    return CURVE[-1][1]
+
+def pack_volts(t, rng):
+    # Loaded pack voltage at t seconds.
+    current = 0.4 + 0.6 * rng.random() if int(t) % 4 else 0.2
+    if DIP_S[0] <= t < DIP_S[1]:
+        current = 3.0
+    return open_circuit(1 - t / RUN_S) - R_INTERNAL * current
+
+def main():
+    ok = True
+    rng = random.Random(5)
+    adc = ADC(Pin('PC4'))
+    volts = [pack_volts(0, rng)]
+
+    def noisy_read():
+        code = round(volts[0] / DIVIDER / ADC_VREF * ADC_FULL) + rng.randint(-NOISE_LSB, NOISE_LSB)
+        return max(0, min(ADC_FULL, code))
+    adc.read = noisy_read
+
+    monitor = BatteryMonitor(adc)
+    frozen = V_NOMINAL / monitor.start()
+    task = monitor.task()
+    errors = []
+    authority = []
+    frozen_authority = []
+    worst_step = 0.0
+    low_at = None
+    low_before_rundown = False
+    prev = monitor.multiplier
+    printed = io.StringIO()
+    t = 0.0
+    while t < RUN_S - 1:
+        clock.advance(PERIOD_MS * 1000)
+        t += PERIOD_MS / 1000
+        if int(t * 10) % 5 == 0:
+            volts[0] = pack_volts(t, rng)
+        with redirect_stdout(printed):
+            next(task)
+        worst_step = max(worst_step, abs(monitor.multiplier - prev))
+        prev = monitor.multiplier
+        if t > 5 and not DIP_S[0] <= t < DIP_S[1] + 3:
+            errors.append(abs(init.battery_voltage.get() - volts[0]))
+            authority.append(init.constant_multiplier.get() * volts[0] / V_NOMINAL)
+            frozen_authority.append(frozen * volts[0] / V_NOMINAL)
+        if init.battery_low.get() and low_at is None:
+            low_at = t
+            low_before_rundown = open_circuit(1 - t / RUN_S) - R_INTERNAL > monitor.low_volts
+
+    mean_error = sum(errors) / len(errors)
+    good = mean_error < 0.1
+    print("voltage        mean error %.3f V, worst %.3f V  %s" % (mean_error, max(errors), "OK" if good else "FAIL"))
+    ok &= good
+
+    limit = monitor.max_rate * PERIOD_MS / 1000
+    good = worst_step <= limit + 1e-9
+    print("multiplier     largest change %.4f per run (limit %.4f)  %s" % (worst_step, limit, "OK" if good else "FAIL"))
+    ok &= good
+
+    live = (min(authority), max(authority))
+    fixed = (min(frozen_authority), max(frozen_authority))
+    good = live[0] > 0.92 and live[1] < 1.08
+    print("authority      live %.3f .. %.3f, frozen at start %.3f .. %.3f  %s" % (
+        live + fixed + ("OK" if good else "FAIL",)))
+    ok &= good
+
+    good = monitor.low_events == 1 and low_at is not None and not low_before_rundown and low_at > DIP_S[1]
+    print("low voltage    %d event(s), first at %s s (dip at %.1f s ignored: %s)  %s" % (
+        monitor.low_events, "%.1f" % low_at if low_at is not None else "-", DIP_S[0],
+        "yes" if low_at is None or low_at > DIP_S[1] + 1 else "no", "OK" if good else "FAIL"))
+    ok &= good
+
+    events, event_volts, _ = monitor.stats()
+    good = not printed.getvalue() and events == monitor.low_events and 0 < event_volts < monitor.low_volts
+    print("quiet task     %d chars printed, latched %d event(s) at %.2f V  %s" % (
+        len(printed.getvalue()), events, event_volts, "OK" if good else "FAIL"))
+    ok &= good
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+check_flight_recorder.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check for the flight recorder. 1500 control ticks (about 16.5 s at
+the 11 ms control period) are recorded on the virtual clock from a real
+LineSensorDriver (synthetic ADC values), Encoders, the IMU service on the
+fake BNO055 and PID_controller.telemetry, each set to known per-tick
+values. Then:
+- the RAM ring (600 records) is dumped and decoded with decode_flight and
+  must hold exactly the last 600 ticks, oldest first;
+- a stream flushed every 64 records must hold all 1500 ticks, none lost;
+- the channel bytes must follow the normalized readings, with the driver
+  on line_reading_fixed() and on the floating point line_reading();
+- record() must not allocate (tracemalloc, net bytes retained per call).
+Exits non-zero on failure.
+
+Usage:
+    python host/check_flight_recorder.py
+"""
+
+import io
+import sys
+import struct
+import tracemalloc
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+clock.use_virtual()
+
+import init
+import PID_controller
+from pyb import ADC
+from linesensor import LineSensorDriver
+from encoder import Encoder
+from imu import BNO055
+from imu_service import IMUService
+from fake_bno055 import FakeBNO055
+from flight_recorder import FlightRecorder
+from decode_flight import read_dump
+
+PINS = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
+TICKS = 1500
+CAPACITY = 600
+PERIOD_US = 11_000
+
+def expected(k):
+    # Values set for tick k: error, p, i, d, efforts, counts, heading raw.
+    error = (k % 41 - 20) / 4
+    return (error, 10 * error, 0.0, 0.5 * error, k % 100 - 50, 50 - k % 100,
+            7 * k, -5 * k, (k * 3) % 5760)
+
+def main():
+    ok = True
+    bno = FakeBNO055.attach()
+    service = IMUService(BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1))
+    driver = LineSensorDriver(line_pins=PINS, fixed_point=True)
+    driver.load_calibration([1000.0] * 7, [3900.0] * 7)
+    left = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
+    right = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
+    recorder = FlightRecorder(CAPACITY, len(PINS), PID_controller.telemetry)
+    recorder.attach(driver, left, right, service)
+
+    stream = io.BytesIO()
+    recorder.write_header(stream)
+
+    def tick(k):
+        error, p, i, d, eff_l, eff_r, cnt_l, cnt_r, head = expected(k)
+        struct.pack_into('<4f', PID_controller.telemetry, 0, error, p, i, d)
+        init.left_effort.put(eff_l)
+        init.right_effort.put(eff_r)
+        left.position = cnt_l
+        right.position = cnt_r
+        bno.set_euler(head / 16, 0, 0)
+        service.refresh()
+        for ch, pin in enumerate(PINS):
+            ADC.by_pin[pin].value = 300 + (k + ch * 100) % 2700
+        driver.line_reading_fixed()
+        clock.advance(PERIOD_US)
+        recorder.record()
+
+    for k in range(TICKS):
+        tick(k)
+        if recorder.total - recorder.flushed >= 64:
+            recorder.flush(stream)
+    recorder.flush(stream)
+
+    ring = io.BytesIO()
+    recorder.dump(ring)
+    for name, data, first in (("ring dump", ring.getvalue(), TICKS - CAPACITY),
+                              ("streamed", stream.getvalue(), 0)):
+        columns = read_dump(data)
+        n = len(columns['t'])
+        bad = 0
+        for j in range(n):
+            k = first + j
+            got = (columns['error'][j], columns['p'][j], columns['i'][j], columns['d'][j],
+                   columns['left_effort'][j], columns['right_effort'][j],
+                   columns['left_counts'][j], columns['right_counts'][j], columns['heading_raw'][j])
+            if got != expected(k):
+                bad += 1
+        dt = (columns['t'][-1] - columns['t'][0]) / (n - 1)
+        good = n == TICKS - first and bad == 0 and abs(dt - PERIOD_US / 1e6) < 1e-9
+        print("%-10s %5d records, %d mismatched, %.1f ms apart, %d bytes  %s"
+              % (name, n, bad, dt * 1000, len(data), "OK" if good else "FAIL"))
+        ok &= good
+    if recorder.lost:
+        print("streamed: %d records lost  FAIL" % recorder.lost)
+        ok = False
+
+    # Channel bytes follow the normalized readings
+    ring_columns = read_dump(ring.getvalue())
+    last = [round(ring_columns['ch%d' % ch][-1] * 255) for ch in range(len(PINS))]
+    expect = [min(255, q >> 4) for q in driver.normalized_q]
+    good = last == expect
+    print("channels   %s  %s" % (last, "OK" if good else "FAIL (expected %s)" % expect))
+    ok &= good
+
+    # The same from the floating point path
+    float_driver = LineSensorDriver(line_pins=PINS)
+    float_driver.load_calibration([1000.0] * 7, [3900.0] * 7)
+    float_recorder = FlightRecorder(8, len(PINS), PID_controller.telemetry)
+    float_recorder.attach(float_driver, left, right, service)
+    for ch, pin in enumerate(PINS):
+        ADC.by_pin[pin].value = 2900 - 400 * ch
+    float_driver.line_reading()
+    float_recorder.record()
+    float_ring = io.BytesIO()
+    float_recorder.dump(float_ring)
+    float_columns = read_dump(float_ring.getvalue())
+    last = [round(float_columns['ch%d' % ch][-1] * 255) for ch in range(len(PINS))]
+    expect = [min(255, int(norm * 4096) >> 4) for norm in float_driver.normalized]
+    good = last == expect
+    print("float path %s  %s" % (last, "OK" if good else "FAIL (expected %s)" % expect))
+    ok &= good
+
+    # Allocation: net bytes retained per record() call
+    recorder.record()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(1000):
+        recorder.record()
+    retained = (tracemalloc.get_traced_memory()[0] - before) / 1000
+    tracemalloc.stop()
+    print("record(): %d bytes per record, %d bytes of RAM for %d records, %.1f bytes retained per call  %s"
+          % (recorder.record_size, len(recorder.ring), CAPACITY, retained, "OK" if retained < 1 else "FAIL"))
+    ok &= retained < 1
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+check_heading.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check for heading_estimator.HeadingEstimator on synthetic IMU
+streams. The true heading makes 90 degree turns both ways (peaking at
+TURN_RATE, crossing 0/360) with rests between. The gyro reads the true
+rate plus GYRO_BIAS and noise; the fused heading is updated at FUSION_HZ
+and is EULER_LATENCY_US old, both quantized to 1/16 as the BNO055 reports
+them. The estimator gets a sample every IMU_PERIOD_US.
+1. Bias: the bias estimate must end within 0.3 deg/s of GYRO_BIAS.
+2. Turns: while turning, the estimate's largest error must be under half
+   that of the fused heading read at the same instants.
+3. Rests: at the end of every rest the estimate must be within 0.5 degree.
+4. Wiring: through IMUService on the fake BNO055 (gyro z counter-clockwise,
+   heading clockwise), a steady clockwise spin must be followed within
+   1 degree.
+5. Turn control: 90 degree turns with the same proportional rate
+   controller, the yaw rate following the command with a 60 ms lag, run
+   on the fused heading polled every 20 ms and on the estimate every 5 ms.
+   The estimate must overshoot under 1 degree and less than the fused
+   heading, and settle sooner.
+Exits non-zero on failure.
+
+Usage:
+    python host/check_heading.py [seed]
+"""
+
+import sys
+import random
+
+import hostenv
+hostenv.install()
+from hostenv import clock, TICKS_MAX
+clock.use_virtual()
+
+from heading_estimator import HeadingEstimator, LATENCY_US
+from imu import BNO055
+from imu_service import IMUService
+from fake_bno055 import FakeBNO055
+
+STEP_US = 1000            # Truth resolution
+IMU_PERIOD_US = 5000      # Estimator update period
+FUSION_HZ = 100           # Fused heading output rate
+EULER_LATENCY_US = LATENCY_US
+GYRO_BIAS = 2.0           # deg/s
+GYRO_NOISE = 0.3          # deg/s, standard deviation
+TURN_RATE = 180.0         # Peak turn rate (deg/s)
+TURN_ACCEL = 1800.0       # deg/s^2
+
+def wrap(degrees):
+    return (degrees + 180) % 360 - 180
+
+def quantize(value):
+    return round(value * 16) / 16
+
+def turn_profile(seconds_rest=1.5, start=350.0):
+    # True (rate, heading) per STEP_US: turns of +90, +90, -90, -90, +90, ... with rests.
+    turns = (90, 90, -90, -90, 90, -90, 90, 90)
+    dt = STEP_US / 1e6
+    heading = start
+    samples = []
+    rests = []
+    for _ in range(int(seconds_rest / dt)):
+        samples.append((0.0, heading))
+    for turn in turns:
+        sign = 1 if turn > 0 else -1
+        left = abs(turn)
+        rate = 0.0
+        while left > 1e-9:
+            stop = rate * rate / (2 * TURN_ACCEL)
+            rate = rate - TURN_ACCEL * dt if left <= stop else min(TURN_RATE, rate + TURN_ACCEL * dt)
+            rate = max(rate, 10.0)
+            move = min(left, rate * dt)
+            left -= move
+            heading += sign * move
+            samples.append((sign * move / dt, heading))
+        for _ in range(int(seconds_rest / dt)):
+            samples.append((0.0, heading))
+        rests.append(len(samples) - 1)
+    return samples, rests
+
+def streams(samples, rng):
+    # Per estimator update: (index, gyro rate, fused heading read, stamp).
+    lag = EULER_LATENCY_US // STEP_US
+    fusion_every = 1_000_000 // FUSION_HZ // STEP_US
+    fused = samples[0][1] % 360
+    out = []
+    for k in range(len(samples)):
+        if k % fusion_every == 0:
+            fused = quantize(samples[max(0, k - lag)][1]) % 360
+        if k % (IMU_PERIOD_US // STEP_US) == 0:
+            gyro = quantize(samples[k][0] + GYRO_BIAS + rng.gauss(0, GYRO_NOISE))
+            out.append((k, gyro, fused, (k * STEP_US) & TICKS_MAX))
+    return out
+
+def wiring():
+    # Largest estimate error following a clockwise spin through IMUService.
+    bno = FakeBNO055.attach(bus=1)
+    imu = BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1)
+    imu.initialize()
+    estimator = HeadingEstimator(latency_us=0)  # The fake reports the heading at once
+    service = IMUService(imu, estimator=estimator)
+    heading = 10.0
+    worst = 0.0
+    for k in range(800):
+        heading = (heading + 90 * IMU_PERIOD_US / 1e6) % 360
+        bno.set_euler(heading, 0, 0)
+        bno.set_gyro(0, 0, -90)  # Counter-clockwise positive
+        clock.advance(IMU_PERIOD_US)
+        service.refresh()
+        if k > 200:
+            worst = max(worst, abs(wrap(estimator.heading() - heading)))
+    return worst
+
+def turn_control(use_estimator, rng, target=90.0, seconds=2.0):
+    # Overshoot (degrees) and 1 degree settling time (s) of one turn.
+    kp = 6.0        # Commanded rate per degree of error (1/s)
+    max_rate = TURN_RATE
+    lag_tau = 0.06
+    dt = STEP_US / 1e6
+    period = IMU_PERIOD_US if use_estimator else 20_000
+    estimator = HeadingEstimator()
+    history = []
+    heading = rate = command = 0.0
+    fused = 0.0
+    peak = 0.0
+    settle = 0.0
+    for k in range(int(seconds / dt)):
+        t_us = k * STEP_US
+        history.append(heading)
+        if t_us % (1_000_000 // FUSION_HZ) == 0:
+            fused = quantize(history[max(0, len(history) - 1 - EULER_LATENCY_US // STEP_US)])
+        if t_us % IMU_PERIOD_US == 0:
+            estimator.update(quantize(rate + GYRO_BIAS + rng.gauss(0, GYRO_NOISE)), fused % 360, t_us)
+        if t_us % period == 0:
+            measured = estimator.heading() if use_estimator else fused % 360
+            command = max(-max_rate, min(max_rate, kp * wrap(target - measured)))
+        rate += (command - rate) * dt / lag_tau
+        heading += rate * dt
+        peak = max(peak, heading - target)
+        if abs(heading - target) > 1.0:
+            settle = (k + 1) * dt
+    return peak, settle
+
+def main():
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    rng = random.Random(seed)
+    ok = True
+
+    def report(name, good, text):
+        nonlocal ok
+        print("%-22s %s  %s" % (name, text, "OK" if good else "FAIL"))
+        ok &= good
+
+    samples, rests = turn_profile()
+    estimator = HeadingEstimator()
+    turn_est = turn_fused = 0.0
+    rest_worst = 0.0
+    rest_points = set(rests)
+    for k, gyro, fused, stamp in streams(samples, rng):
+        estimator.update(gyro, fused, stamp)
+        true = samples[k][1] % 360
+        if samples[k][0] != 0:
+            turn_est = max(turn_est, abs(wrap(estimator.heading() - true)))
+            turn_fused = max(turn_fused, abs(wrap(fused - true)))
+        if any(r - IMU_PERIOD_US // STEP_US < k <= r for r in rest_points):
+            rest_worst = max(rest_worst, abs(wrap(estimator.heading() - true)))
+    print("%d s of turns, gyro bias %.1f deg/s, fused heading %d Hz and %d ms late, estimate every %d ms\n" % (
+        len(samples) * STEP_US // 1_000_000, GYRO_BIAS, FUSION_HZ, EULER_LATENCY_US // 1000, IMU_PERIOD_US // 1000))
+
+    report("1. bias", abs(estimator.bias() - GYRO_BIAS) < 0.3,
+           "estimated %.2f deg/s" % estimator.bias())
+    report("2. turns", turn_est < turn_fused / 2,
+           "largest error %.2f deg, fused heading %.2f deg" % (turn_est, turn_fused))
+    report("3. rests", rest_worst < 0.5, "largest error at the end of a rest %.2f deg" % rest_worst)
+    worst = wiring()
+    report("4. IMUService wiring", worst < 1.0, "largest error %.2f deg on a 90 deg/s spin" % worst)
+
+    fused = turn_control(False, random.Random(seed))
+    estimated = turn_control(True, random.Random(seed))
+    print("5. 90 degree turn       overshoot  settle (1 deg)")
+    print("   fused heading, 20 ms %7.2f deg  %6.2f s" % fused)
+    print("   estimate, 5 ms       %7.2f deg  %6.2f s" % estimated)
+    report("5. turn control", estimated[0] < 1.0 and estimated[0] < fused[0] and estimated[1] < fused[1],
+           "overshoot %.2f -> %.2f deg, settles %.2f -> %.2f s" % (fused[0], estimated[0], fused[1], estimated[1]))
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
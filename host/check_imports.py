@@ -0,0 +1,128 @@
+"""
+check_imports.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check of the board modules' import graph. Each module is imported on
+its own in a fresh interpreter, recording the other board modules it
+loads, the pyb.Timer objects constructed while importing and the import
+time (CPython, so only relative).
+1. Only the modules in HARDWARE (the two motor instances and the data
+   collection encoders) may set up a timer at import; importing a driver
+   such as imu or linesensor must not start the motors.
+2. No module may load one of the modules in NOT_FROM unless it is listed
+   there for it (imu must not pull in the motors or PID_controller).
+3. main.py imports the modules in OPTIONAL only under the setting that
+   uses them, never at the top level, so a run configuration loads only
+   what it needs.
+Prints the graph. Exits non-zero on failure.
+
+Usage:
+    python host/check_imports.py
+"""
+
+import os
+import ast
+import sys
+import json
+import subprocess
+
+import hostenv
+from hostenv import REPO_DIR, ALIASES
+
+HARDWARE = ('left_motor', 'right_motor', 'task_encoder')  # Hardware instances by design
+NOT_FROM = {
+    'left_motor': ('main',),
+    'right_motor': ('main',),
+    'PID_controller': ('main', 'motion', 'wheel_speed', 'mission', 'bump_sensor', 'input_capture',
+                       'flight_recorder'),
+}
+OPTIONAL = ('gain_table', 'calib_profile', 'line_sampler', 'wheel_speed', 'input_capture')
+SKIP = ('boot', 'main')  # Run by the board, not imported
+
+def board_modules():
+    names = []
+    for file_name in sorted(os.listdir(REPO_DIR)):
+        if file_name.endswith('.py'):
+            name = next((n for n, f in ALIASES.items() if f == file_name), file_name[:-3])
+            if name not in SKIP:
+                names.append(name)
+    return names
+
+def probe(name):
+    # Runs in the child: imports name and prints what it loaded as JSON.
+    hostenv.install()
+    import importlib
+    from time import perf_counter
+    import pyb
+
+    timers = []
+    timer_init = pyb.Timer.__init__
+    def counting_init(self, *args, **kwargs):
+        timers.append(args[0] if args else None)
+        timer_init(self, *args, **kwargs)
+    pyb.Timer.__init__ = counting_init
+
+    before = set(sys.modules)
+    start = perf_counter()
+    importlib.import_module(name)
+    elapsed = (perf_counter() - start) * 1000
+    loaded = []
+    for module_name in set(sys.modules) - before:
+        path = getattr(sys.modules[module_name], '__file__', None) or ''
+        if module_name != name and os.path.dirname(os.path.abspath(path)) == REPO_DIR:
+            loaded.append(module_name)
+    print(json.dumps(dict(loaded=sorted(loaded), timers=timers, ms=elapsed)))
+
+def top_level_imports(path):
+    # Module names imported by a file's top-level statements (not inside if, def, ...).
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    names = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            names.add(node.module)
+    return names
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == 'probe':
+        probe(sys.argv[2])
+        return
+
+    ok = True
+    print("%-16s %8s %6s  %s" % ("module", "host ms", "timers", "board modules loaded"))
+    for name in board_modules():
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), 'probe', name],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print("%-16s import failed:\n%s  FAIL" % (name, result.stderr.strip()))
+            ok = False
+            continue
+        info = json.loads(result.stdout.strip().splitlines()[-1])
+        problems = []
+        if info['timers'] and name not in HARDWARE:
+            timer_owners = [m for m in info['loaded'] if m in HARDWARE]
+            problems.append("sets up timers %s%s" % (info['timers'], " via " + ", ".join(timer_owners) if timer_owners else ""))
+        for loaded in info['loaded']:
+            if loaded in NOT_FROM and name not in NOT_FROM[loaded]:
+                problems.append("loads " + loaded)
+        print("%-16s %8.1f %6d  %s%s" % (name, info['ms'], len(info['timers']), " ".join(info['loaded']) or "-",
+                                        "  FAIL (%s)" % "; ".join(problems) if problems else ""))
+        ok &= not problems
+
+    eager = top_level_imports(os.path.join(REPO_DIR, 'main.py')) & set(OPTIONAL)
+    good = not eager
+    print("\nmain.py top-level imports of optional modules: %s  %s" % (
+        ", ".join(sorted(eager)) or "none", "OK" if good else "FAIL"))
+    ok &= good
+    if not ok:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+check_line_fixed.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check that LineSensorDriver.line_reading_fixed() matches the floating
+point line_reading() to within FIXED_TOLERANCE. Drives two drivers with the
+same calibration and ADC frames over many random calibrations, window
+sizes and line positions, including the moving-average fill phase.
+Exits non-zero on failure.
+
+Usage:
+    python host/check_line_fixed.py [trials]
+"""
+
+import sys
+import random
+
+import hostenv
+hostenv.install()
+
+from linesensor import LineSensorDriver, ERROR_ONE, NORM_ONE, FIXED_TOLERANCE
+
+PINS = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
+
+def random_calibration(rng):
+    black = [rng.uniform(100, 1500) for _ in PINS]
+    white = [b + rng.uniform(50, 3000) for b in black]
+    # Degenerate channels the float path also has to handle
+    if rng.random() < 0.2:
+        k = rng.randrange(len(PINS))
+        white[k] = black[k]
+    if rng.random() < 0.2:
+        k = rng.randrange(len(PINS))
+        black[k], white[k] = white[k], black[k]
+    return black, white
+
+def frame_for(rng, black, white, line_pos):
+    # Inverted readings follow a dip around line_pos plus noise
+    raw = []
+    for i in range(len(PINS)):
+        weight = max(0.0, 1.0 - abs(i - line_pos) / 1.5)
+        value = white[i] + (black[i] - white[i]) * weight + rng.gauss(0, 40)
+        raw.append(min(4095, max(0, int(4096 - value))))
+    return raw
+
+def run(trials):
+    rng = random.Random(405)
+    worst_err = 0.0
+    worst_norm = 0.0
+    for trial in range(trials):
+        window = rng.choice((1, 3, 5, 10, 20, 50))
+        black, white = random_calibration(rng)
+        drivers = []
+        for fixed in (False, True):
+            driver = LineSensorDriver(PINS, window_size=window, fixed_point=fixed)
+            driver.black_calib = list(black)
+            driver.white_calib = list(white)
+            driver.build_tables()
+            drivers.append(driver)
+        float_drv, fixed_drv = drivers
+
+        line_pos = rng.uniform(-1, len(PINS))
+        for tick in range(3 * window + 20):
+            line_pos += rng.gauss(0, 0.2)
+            raw = frame_for(rng, black, white, line_pos)
+            for i in range(len(PINS)):
+                float_drv.adc_line[i].value = raw[i]
+                fixed_drv.adc_line[i].value = raw[i]
+            e_float, n_float = float_drv.line_reading()
+            e_fixed, n_fixed = fixed_drv.line_reading_fixed()
+            worst_err = max(worst_err, abs(e_fixed / ERROR_ONE - e_float))
+            for i in range(len(PINS)):
+                worst_norm = max(worst_norm, abs(n_fixed[i] / NORM_ONE - n_float[i]))
+    return worst_err, worst_norm
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    worst_err, worst_norm = run(trials)
+    print("max |fixed - float| scaled error: %.5f (tolerance %.5f)" % (worst_err, FIXED_TOLERANCE))
+    print("max |fixed - float| normalized:   %.5f" % worst_norm)
+    if worst_err > FIXED_TOLERANCE:
+        print("FAIL")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+check_line_sampler.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check for the timer-driven line sampler. A synthetic backend encodes
+the sample time in every channel; a consumer that runs with heavy random
+scheduling jitter must still see complete frames whose timestamps fall on
+the sampling grid, and LineSensorDriver.dt must be a whole number of
+sampling periods. Exits non-zero on failure.
+
+Usage:
+    python host/check_line_sampler.py
+"""
+
+import sys
+import random
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+
+from linesensor import LineSensorDriver
+from line_sampler import LineSampler
+from synthetic import SyntheticLineBackend
+
+PINS = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
+FREQ = 500
+PERIOD_US = 1_000_000 // FREQ
+
+def main():
+    clock.use_virtual()
+    rng = random.Random(11)
+
+    # Every channel reports the sample index, so a torn frame is detectable
+    backend = SyntheticLineBackend(len(PINS), lambda t, ch: (t // PERIOD_US) & 0xFFF)
+    sampler = LineSampler(backend, timer_num=6, freq=FREQ)
+    driver = LineSensorDriver(PINS)
+    driver.attach_sampler(sampler)
+    sampler.start()
+
+    failures = 0
+    ticks = 0
+    last_seq = 0
+    for _ in range(5000):
+        # Consumer nominally every 11 ms, delayed by up to 6 ms of other work
+        clock.advance(11_000 + rng.randrange(0, 6_000))
+        driver.update()
+        ticks += 1
+        values = driver.get_values()
+        if len(set(values)) != 1:
+            failures += 1
+        if driver.last_time % PERIOD_US != 0 or driver.dt % PERIOD_US != 0:
+            failures += 1
+        if driver.frame_seq == last_seq:
+            failures += 1
+        last_seq = driver.frame_seq
+    sampler.stop()
+
+    print("consumer ticks: %d, frames sampled: %d, failures: %d" % (ticks, backend.frames, failures))
+    if failures:
+        print("FAIL")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
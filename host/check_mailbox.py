@@ -0,0 +1,99 @@
+"""
+check_mailbox.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check of the line error handoff under the cotask scheduler on the
+virtual clock. A producer (the line sensor task) puts a stamped sample
+every PRODUCER ms and a consumer (PID_value) takes one every 11 ms, once
+through the original 100-deep Queue (an empty queue read as error 0.0)
+and once through a Mailbox. With the producer faster than the consumer
+the queue backs up and the consumer acts on old samples; with it slower
+the consumer sees empty-queue zeros. The mailbox consumer must always act
+on a sample younger than one producer period plus one consumer period,
+and never on a made-up value.
+Exits non-zero on failure.
+
+Usage:
+    python host/check_mailbox.py
+"""
+
+import sys
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+clock.use_virtual()
+
+import cotask
+from cotask import Task
+from task_share import Queue
+from mailbox import Mailbox
+
+RUN_MS = 20_000
+CONSUMER_MS = 11
+IDLE_STEP_US = 100
+
+def run(producer_ms, use_mailbox):
+    # Returns (ages of the samples acted on in us, runs with no new data, made-up zeros).
+    box = Mailbox('l', name="Line Error") if use_mailbox else Queue('l', 100, name="Collection Queue")
+    ages = []
+    idle = [0, 0]
+
+    def producer():
+        while True:
+            if use_mailbox:
+                box.put(clock.us() + 1)  # Sample value: its own timestamp, never 0
+            elif not box.full():
+                box.put(clock.us() + 1)
+            yield 0
+
+    def consumer():
+        while True:
+            if use_mailbox:
+                if box.any():
+                    ages.append(clock.us() + 1 - box.get())
+                else:
+                    idle[0] += 1
+            else:
+                sample = box.get() if not box.empty() else 0
+                if sample:
+                    ages.append(clock.us() + 1 - sample)
+                else:
+                    idle[1] += 1
+            yield 0
+
+    tasks = cotask.TaskList()
+    tasks.append(Task(producer, name="Line Sensor", priority=2, period=producer_ms))
+    tasks.append(Task(consumer, name="PID Controller", priority=1, period=CONSUMER_MS))
+    end = clock.us() + RUN_MS * 1000
+    while clock.us() < end:
+        before = clock.us()
+        tasks.pri_sched()
+        if clock.us() == before:
+            clock.advance(IDLE_STEP_US)
+    return ages, idle[0], idle[1]
+
+def main():
+    ok = True
+    print("%-9s %-8s %9s %9s %8s %10s" % ("producer", "handoff", "mean age", "max age", "no data", "fake zeros"))
+    for producer_ms in (10, 11, 12):
+        for use_mailbox in (False, True):
+            ages, no_data, zeros = run(producer_ms, use_mailbox)
+            mean = sum(ages) / len(ages) / 1000
+            worst = max(ages) / 1000
+            good = True
+            if use_mailbox:
+                good = worst <= producer_ms + CONSUMER_MS and zeros == 0
+            print("%6d ms %-8s %6.1f ms %6.1f ms %8d %10d  %s" % (
+                producer_ms, "mailbox" if use_mailbox else "queue", mean, worst, no_data, zeros,
+                ("OK" if good else "FAIL") if use_mailbox else ""))
+            ok &= good
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+check_mission.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check of mission plans (mission.py) under the cotask scheduler on the
+virtual clock, with check_motion's plant extended to a position on the
+floor. The line is followed with a line error of zero (straight ahead),
+and a wall across the floor at WALL_X sets the bump flag the first time
+the robot reaches it heading back toward the start.
+
+1. validate() accepts mission.COURSE and reports each problem in a set of
+   broken plans; Mission() refuses them.
+2. COURSE runs through the Mission task and the original final task plus
+   bump handler run the same course. The line must end at the same arc
+   length, the alignment reach the same heading, the wall maneuver apply
+   every output pair on time after the bump without stopping the wheels
+   in between, and the lap take no longer.
+3. A plan with drive-distance, turn-to-heading, align, timed stop and
+   wait-for-bump phases ends each phase where it should.
+
+With a plan given as module.NAME (imported from the repo or host
+directory), only that plan is validated and simulated, and its phase
+splits are printed: the check to run on a retuned plan before a trial.
+Exits non-zero on failure.
+
+Usage:
+    python host/check_mission.py [module.PLAN]
+"""
+
+import sys
+import importlib
+from math import cos, sin
+
+import check_motion
+from check_motion import Plant, costly, IDLE_STEP_US
+from hostenv import clock
+
+import init
+import state
+import cotask
+from cotask import Task
+from encoder import Encoder
+from odometry import Odometry
+from imu import BNO055
+from imu_service import IMUService
+from fake_bno055 import FakeBNO055
+from left_motor import left_motor
+from right_motor import right_motor
+from motor import MotorPair
+from PID_controller import PID_value
+import motion
+import bump_sensor
+import mission
+from mission import (Mission, validate, COURSE, LINE_SECTION_LENGTH, LINE, ALIGN, DRIVE, TURN, ARC,
+                     WAIT, STOP, UNTIL_DONE, UNTIL_DISTANCE, UNTIL_TIME, UNTIL_BUMP)
+
+WALL_X = 3.3        # Wall position (m) along the line, hit on the way back
+LAP_LIMIT_MS = 60_000
+BUMP_AT_MS = 4000    # Bump time in the trial plan
+
+BROKEN = (
+    ("unknown action", (("jump", 9, (), UNTIL_TIME, 100),)),
+    ("unknown end", (("line", LINE, (), 7, 1.0),)),
+    ("argument count", (("drive", DRIVE, (25,), UNTIL_BUMP, 0),)),
+    ("effort range", (("arc", ARC, (120, 20), UNTIL_TIME, 300),)),
+    ("never ends", (("line", LINE, (), UNTIL_DONE, 0),)),
+    ("no limit", (("pause", WAIT, (), UNTIL_TIME, 0),)),
+    ("turn on distance", (("turn", TURN, (20, 90), UNTIL_DISTANCE, 0.5),)),
+    ("empty plan", ()),
+)
+
+TRIAL = (
+    ("out",   DRIVE, (20, 0),  UNTIL_DISTANCE, 0.5),
+    ("turn",  TURN,  (20, 90), UNTIL_DONE,     0),
+    ("align", ALIGN, (90, 2),  UNTIL_DONE,     0),
+    ("pause", STOP,  (),       UNTIL_TIME,     300),
+    ("over",  DRIVE, (20, 90), UNTIL_TIME,     500),
+    ("bump",  WAIT,  (),       UNTIL_BUMP,     0),
+)
+
+class FloorPlant(Plant):
+    # check_motion's plant, also tracking the position on the floor.
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.x = self.y = 0.0
+        self.wall_hit = None  # Virtual time (us) the wall was hit
+        self.wall = True
+
+    def step(self):
+        left, right = self.left, self.right
+        super().step()
+        ds = (self.left - left + self.right - right) / 2
+        self.x += ds * cos(self.theta)
+        self.y += ds * sin(self.theta)
+        if self.wall and self.wall_hit is None and self.x <= WALL_X and cos(self.theta) < 0:
+            self.wall_hit = clock.us()
+            state.ints[state.BUMP] = 1
+
+def legacy_final_task():
+    # The original final task.
+    ints = state.ints
+    floats = state.floats
+    while True:
+        if floats[state.DISTANCE] >= LINE_SECTION_LENGTH:
+            ints[state.FINAL_FLAG] = 1
+        if ints[state.FINAL_FLAG] == 1:
+            break
+        yield 0
+    init.state_input.put(1)
+    target_heading = (init.init_heading.get() - 180) % 360
+    motion.executor.align(target_heading)
+    motion.executor.drive(25, hold=target_heading)
+    while True:
+        yield 0
+
+def legacy_bump_handling():
+    # The bump handler task bump_sensor.py had before the mission took over
+    # the wall maneuver.
+    maneuvering = False
+    flags = state.ints
+    while True:
+        if flags[state.BUMP] and not maneuvering:
+            motion.executor.clear()
+            maneuvering = True
+            for left, right, ms in bump_sensor.WALL_MANEUVER:
+                motion.executor.arc(left, right, ms=ms)
+        if maneuvering and not motion.executor.busy():
+            maneuvering = False
+            state.take(state.BUMP)
+        yield 0
+
+def build(plan=None, wall=True):
+    # Fresh scheduler and robot; plan None runs the original final task and bump handler.
+    tasks = cotask.TaskList()
+    left_enc = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
+    right_enc = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
+    bno = FakeBNO055.attach()
+    service = IMUService(BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1))
+    service.refresh()
+    odom = Odometry(left_enc, right_enc, service)
+    executor = motion.executor = motion.MotionExecutor(odom, service)
+    plant = check_motion.plant = FloorPlant(left_enc, right_enc, bno)
+    plant.wall = wall
+
+    def encoder_task():
+        while True:
+            left_enc.update()
+            right_enc.update()
+            odom.update()
+            odom.publish()
+            yield 0
+
+    def line_task():
+        # The line sensor on a straight line: error 0.0 every run
+        while True:
+            init.line_error.put(0.0)
+            yield 0
+
+    for index in range(state.NUM_INTS):
+        state.ints[index] = 0
+    for index in range(state.NUM_FLOATS):
+        state.floats[index] = 0.0
+    init.init_heading.put(service.heading())
+    runner = None
+    if plan is None:
+        tasks.append(Task(costly(legacy_bump_handling), name="Bump Handler", priority=3, period=20))
+    else:
+        runner = Mission(plan, executor, service)
+        tasks.append(Task(costly(runner.task), name="Mission", priority=3, period=10))
+    tasks.append(Task(costly(executor.task), name="Motion", priority=2, period=10))
+    tasks.append(Task(costly(line_task), name="Line Sensor", priority=2, period=11))
+    tasks.append(Task(costly(service.task), name="IMU Service", priority=1, period=20))
+    tasks.append(Task(costly(PID_value), name="PID Controller", priority=1, period=11))
+    motors = MotorPair(left_motor, right_motor)
+    tasks.append(Task(costly(lambda: motors.task(init.left_effort, init.right_effort)), name="Motors",
+                      priority=0, period=11))
+    tasks.append(Task(costly(encoder_task), name="Encoder Update", priority=0, period=25))
+    if plan is None:
+        tasks.append(Task(costly(legacy_final_task), name="Final Task", priority=0, period=50))
+    return tasks, runner, executor, odom, service, plant
+
+def simulate(plan=None, wall=True, bump_at_ms=None):
+    # Runs a course to its end; returns a dict of what happened.
+    tasks, runner, executor, odom, service, plant = build(plan, wall)
+    start = clock.us()
+    result = dict(line_end=None, aligned=None, lap_ms=None, runner=runner, phase_distance=[],
+                  odom=odom, service=service, plant=plant)
+    settle = None
+    while clock.us() - start < LAP_LIMIT_MS * 1000:
+        before = clock.us()
+        tasks.pri_sched()
+        if clock.us() == before:
+            clock.advance(IDLE_STEP_US)
+        plant.step()
+        if bump_at_ms is not None and clock.us() - start >= bump_at_ms * 1000:
+            state.ints[state.BUMP] = 1
+            bump_at_ms = None
+        if result['line_end'] is None and state.ints[state.FINAL_FLAG]:
+            result['line_end'] = odom.distance
+        if result['aligned'] is None and executor.current is not None and executor.current[0] == 25:
+            result['aligned'] = service.heading()  # Drive to the wall started
+        if runner is not None and runner.index >= len(result['phase_distance']):
+            result['phase_distance'].append(odom.distance)
+        if runner is not None:
+            finished = runner.done
+        else:
+            finished = (plant.wall_hit is not None and not state.ints[state.BUMP]
+                        and not executor.busy())
+        if finished:
+            if settle is None:
+                result['lap_ms'] = (clock.us() - start) / 1000
+                settle = clock.us()
+            elif clock.us() - settle >= 100_000:
+                break
+    result['log'] = [entry for entry in plant.log if entry[0] >= start]
+    result['start'] = start
+    return result
+
+def check_validation():
+    ok = True
+    problems = validate(COURSE)
+    print("    %-18s %s" % ("COURSE", "valid  OK" if not problems else "; ".join(problems) + "  FAIL"))
+    ok &= not problems
+    for name, plan in BROKEN:
+        problems = validate(plan)
+        try:
+            Mission(plan, motion.executor)
+            refused = False
+        except ValueError:
+            refused = True
+        good = len(problems) == 1 and refused
+        print("    %-18s %s  %s" % (name, problems[0] if problems else "(accepted)", "OK" if good else "FAIL"))
+        ok &= good
+    return ok
+
+def check_maneuver(log, hit_us):
+    # Every wall maneuver pair applied on time after the bump, with no stop in between.
+    expect_t = 0
+    i = 0
+    first = None
+    for left, right, ms in bump_sensor.WALL_MANEUVER:
+        while i < len(log) and (log[i][0] < hit_us or (log[i][1], log[i][2]) != (left, right)):
+            i += 1
+        if i == len(log):
+            return False, "(%d, %d) never applied" % (left, right)
+        first = i if first is None else first
+        late = (log[i][0] - hit_us) / 1000 - expect_t
+        if not 0 <= late <= 45:
+            return False, "(%d, %d) %.1f ms late" % (left, right, late)
+        expect_t += ms
+    if any((l, r) == (0, 0) for _, l, r in log[first:i]):
+        return False, "wheels stopped between maneuver segments"
+    if (log[-1][1], log[-1][2]) != (0, 0):
+        return False, "motors left running"
+    return True, "all %d segments on time" % len(bump_sensor.WALL_MANEUVER)
+
+def check_course():
+    ok = True
+    runs = {"original tasks": simulate(None), "Mission(COURSE)": simulate(COURSE)}
+    print("    %-16s %10s %10s %10s %10s  %s" % ("course", "line end", "heading", "wall hit", "lap", "wall maneuver"))
+    for name, run in runs.items():
+        plant = run['plant']
+        hit = plant.wall_hit
+        good, note = check_maneuver(run['log'], hit) if hit is not None else (False, "wall never hit")
+        run['maneuver'] = good
+        print("    %-16s %8.3f m %8.1f d %8.0f ms %7.0f ms  %s" % (
+            name, run['line_end'] or 0, run['aligned'] or 0, (hit - run['start']) / 1000 if hit else 0,
+            run['lap_ms'] or 0, note))
+    old, new = runs.values()
+    checks = (
+        ("line ends at LINE_SECTION_LENGTH", new['line_end'] is not None and
+         0 <= new['line_end'] - LINE_SECTION_LENGTH <= 0.02 and abs(new['line_end'] - old['line_end']) <= 0.02),
+        ("aligned to the reverse heading", new['aligned'] is not None and
+         abs(new['aligned'] - old['aligned']) <= 2),
+        ("wall maneuver on time", new['maneuver'] and old['maneuver']),
+        ("lap no longer than the original", new['lap_ms'] is not None and new['lap_ms'] <= old['lap_ms'] + 20),
+    )
+    for name, good in checks:
+        print("    %-36s %s" % (name, "OK" if good else "FAIL"))
+        ok &= good
+    return ok
+
+def print_splits(plan, run):
+    runner = run['runner']
+    splits = list(runner.splits) + [runner.splits[0] + int(run['lap_ms'] or 0)]
+    print("    %-3s %-12s %-6s %-9s %10s %10s" % ("#", "phase", "action", "until", "start", "duration"))
+    for k, phase in enumerate(plan):
+        reached = k <= runner.index
+        duration = (splits[k + 1] - splits[k]) if reached else 0
+        print("    %-3d %-12s %-6s %-9s %7d ms %7d ms%s" % (
+            k, phase[0], mission.ACTION_NAMES[phase[1]], mission.UNTIL_NAMES[phase[3]],
+            splits[k] - splits[0], duration, "" if reached else "  (not reached)"))
+
+def check_trial():
+    run = simulate(TRIAL, wall=False, bump_at_ms=BUMP_AT_MS)
+    runner = run['runner']
+    print_splits(TRIAL, run)
+    splits = runner.splits
+    out = run['phase_distance'][1] - run['phase_distance'][0]
+    heading = run['service'].heading()
+    checks = (
+        ("drive distance=0.5 m", "%.3f m" % out, abs(out - 0.5) <= 0.02),
+        ("pause 300 ms", "%d ms" % (splits[4] - splits[3]), 300 <= splits[4] - splits[3] <= 320),
+        ("heading 90 after turn and align", "%.1f deg" % heading, abs(mission.wrap_degrees(heading - 90)) <= 3),
+        ("bump ends the plan", "%.0f ms" % (run['lap_ms'] or 0),
+         runner.done and BUMP_AT_MS <= run['lap_ms'] <= BUMP_AT_MS + 20),
+    )
+    ok = True
+    for name, value, good in checks:
+        print("    %-32s %10s  %s" % (name, value, "OK" if good else "FAIL"))
+        ok &= good
+    return ok
+
+def run_plan(path):
+    # Validates and simulates a plan given as module.NAME.
+    module_name, _, name = path.rpartition('.')
+    plan = getattr(importlib.import_module(module_name), name)
+    problems = validate(plan)
+    for problem in problems:
+        print("    " + problem)
+    if problems:
+        return False
+    run = simulate(plan)
+    print_splits(plan, run)
+    print("    lap %s" % ("%.0f ms" % run['lap_ms'] if run['lap_ms'] else "not finished in %d ms" % LAP_LIMIT_MS))
+    return run['runner'].done
+
+def main():
+    init.constant_multiplier.put(1.0)
+    if len(sys.argv) > 1:
+        ok = run_plan(sys.argv[1])
+    else:
+        print("plan validation:")
+        ok = check_validation()
+        print("\ndefault course, original tasks against the mission plan:")
+        ok &= check_course()
+        print("\nCOURSE phase splits:")
+        print_splits(COURSE, simulate(COURSE))
+        print("\ntrial plan (drive distance, turn, align, stop, wait for bump):")
+        ok &= check_trial()
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
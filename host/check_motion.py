@@ -0,0 +1,268 @@
+"""
+check_motion.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check for the motion executor under the cotask scheduler on the
+virtual clock. Every task run costs TASK_COST_US of virtual time, and a
+simple plant turns the motor outputs into wheel travel, encoder counts and
+a fake BNO055 heading.
+
+1. The bump wall maneuver runs once with the original busy-wait wall_nav
+   and once as a mission plan runs it, through the executor. For each, the largest gap between runs
+   of every task is reported; a task is starved if it misses a run, i.e.
+   a gap exceeds its period plus one period of slack.
+2. Distance, degree, align and hold segments end where they should.
+
+Exits non-zero if a task is starved with the executor, the maneuver's
+segment timing is off, or a segment misses its end condition.
+
+Usage:
+    python host/check_motion.py
+"""
+
+import sys
+from math import pi, degrees
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+clock.use_virtual()
+
+from time import ticks_ms, ticks_diff
+import init
+import state
+import cotask
+from cotask import Task
+from encoder import Encoder
+from odometry import Odometry, WHEEL_RADIUS, TRACK_WIDTH, COUNTS_PER_REV
+from imu import BNO055
+from imu_service import IMUService
+from fake_bno055 import FakeBNO055
+from left_motor import left_motor
+from right_motor import right_motor
+from motor import MotorPair
+from PID_controller import PID_value
+import motion
+from mission import Mission, WAIT, ARC, UNTIL_BUMP, UNTIL_TIME
+
+TASK_COST_US = 300
+IDLE_STEP_US = 100
+SPEED_PER_EFFORT = 0.01  # Plant wheel speed (m/s) per % effort
+COUNTS_PER_M = COUNTS_PER_REV / (2 * pi * WHEEL_RADIUS)
+MANEUVER = ((-20, -20, 400), (20, -20, 600), (20, 20, 600), (-20, 20, 400), (20, 20, 300))
+
+def motor_output(motor):
+    duty = motor.PWM.pulse_width_percent()
+    return -duty if motor.DIR_pin.value() else duty
+
+class Plant:
+    # Wheels follow the motor outputs; encoders and the fake IMU follow the wheels.
+    def __init__(self, left_enc, right_enc, bno):
+        self.left_enc = left_enc
+        self.right_enc = right_enc
+        self.bno = bno
+        self.left = self.right = self.theta = 0.0
+        self.last = clock.us()
+        self.log = []  # (time us, left output, right output) on every change
+
+    def step(self):
+        now = clock.us()
+        dt = (now - self.last) / 1e6
+        self.last = now
+        out_l = motor_output(left_motor)
+        out_r = motor_output(right_motor)
+        if not self.log or self.log[-1][1:] != (out_l, out_r):
+            self.log.append((now, out_l, out_r))
+        dl = out_l * SPEED_PER_EFFORT * dt
+        dr = out_r * SPEED_PER_EFFORT * dt
+        self.left += dl
+        self.right += dr
+        self.theta += (dr - dl) / TRACK_WIDTH
+        self.left_enc.enc_timer.counter(round(self.left * COUNTS_PER_M))
+        self.right_enc.enc_timer.counter(round(self.right * COUNTS_PER_M))
+        self.bno.set_euler(-degrees(self.theta), 0, 0)
+
+def costly(fun):
+    # Wraps a task so every run costs TASK_COST_US of virtual time.
+    def run():
+        steps = fun()
+        while True:
+            state = next(steps)
+            clock.advance(TASK_COST_US)
+            yield state
+    return run
+
+def legacy_wall_nav(left_pwm, right_pwm, duration):
+    # The original busy wait; the virtual clock moves while it spins.
+    left_motor.update(left_pwm)
+    right_motor.update(right_pwm)
+    start_time = ticks_ms()
+    while ticks_diff(ticks_ms(), start_time) < duration:
+        clock.advance(IDLE_STEP_US)
+        plant.step()
+    left_motor.update(0)
+    right_motor.update(0)
+
+def legacy_bump_task():
+    while True:
+        if state.ints[state.BUMP]:
+            for left, right, ms in MANEUVER:
+                legacy_wall_nav(left, right, ms)
+            state.take(state.BUMP)
+        yield 0
+
+# The wall maneuver as mission.COURSE runs it: wait for a bump, then the timed arcs
+WALL_PLAN = (("bump", WAIT, (), UNTIL_BUMP, 0),) + tuple(
+    ("wall %d" % (k + 1), ARC, (left, right), UNTIL_TIME, ms) for k, (left, right, ms) in enumerate(MANEUVER))
+
+def mission_bump_task():
+    return Mission(WALL_PLAN, motion.executor).task()
+
+def build(bump_task):
+    # Fresh scheduler, encoders, odometry, IMU service and executor.
+    global plant
+    tasks = cotask.TaskList()
+    left_enc = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
+    right_enc = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
+    bno = FakeBNO055.attach()
+    service = IMUService(BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1))
+    service.refresh()
+    odom = Odometry(left_enc, right_enc, service)
+    executor = motion.executor = motion.MotionExecutor(odom, service)
+    plant = Plant(left_enc, right_enc, bno)
+
+    def encoder_task():
+        while True:
+            left_enc.update()
+            right_enc.update()
+            odom.update()
+            odom.publish()
+            yield 0
+
+    state.take(state.BUMP)
+    init.motion_active.put(0)
+    init.state_input.put(1)  # No line to follow on the host
+    tasks.append(Task(costly(bump_task), name="Bump Handler", priority=3, period=20))
+    tasks.append(Task(costly(executor.task), name="Motion", priority=2, period=10))
+    tasks.append(Task(costly(service.task), name="IMU Service", priority=1, period=20))
+    tasks.append(Task(costly(PID_value), name="PID Controller", priority=1, period=11))
+    motors = MotorPair(left_motor, right_motor)
+    tasks.append(Task(costly(lambda: motors.task(init.left_effort, init.right_effort)), name="Motors",
+                      priority=0, period=11))
+    tasks.append(Task(costly(encoder_task), name="Encoder Update", priority=0, period=25))
+    return tasks, executor, odom, service
+
+def run(tasks, ms, until=None):
+    end = clock.us() + ms * 1000
+    while clock.us() < end:
+        before = clock.us()
+        tasks.pri_sched()
+        if clock.us() == before:
+            clock.advance(IDLE_STEP_US)
+        plant.step()
+        if until is not None and until():
+            break
+
+def starvation(tasks, start_us):
+    # Returns [(name, period ms, max gap ms, starved)] for runs after start_us.
+    rows = []
+    for task in tasks.tasks():
+        times = [start_us] + [t for t in task.run_times if t >= start_us]
+        gap = max(b - a for a, b in zip(times, times[1:]))
+        rows.append((task.name, task.period / 1000, gap / 1000, gap > 2 * task.period))
+    return rows
+
+def maneuver(bump_task):
+    tasks, executor, _, _ = build(bump_task)
+    run(tasks, 100)
+    start = clock.us()
+    state.ints[state.BUMP] = 1
+    run(tasks, 2600)
+    return tasks, start, [entry for entry in plant.log if entry[0] >= start]
+
+def check_timing(log, start):
+    # Each output pair must appear within one bump, executor and motor period
+    # (20 + 10 + 11 ms, plus task costs) of its due time.
+    ok = True
+    expect_t = 0
+    i = 0
+    for left, right, ms in MANEUVER:
+        while i < len(log) and (log[i][1], log[i][2]) != (left, right):
+            i += 1
+        if i == len(log):
+            print("    %4d %4d never applied  FAIL" % (left, right))
+            return False
+        late = (log[i][0] - start) / 1000 - expect_t
+        good = 0 <= late <= 45
+        print("    %4d %4d at %6.1f ms (due %4d ms)  %s" % (left, right, (log[i][0] - start) / 1000,
+                                                          expect_t, "OK" if good else "FAIL"))
+        ok &= good
+        expect_t += ms
+    if (log[-1][1], log[-1][2]) != (0, 0):
+        print("    FAIL: maneuver incomplete or motors left running")
+        ok = False
+    return ok
+
+def check_ends():
+    ok = True
+    tasks, executor, odom, service = build(mission_bump_task)
+    run(tasks, 50)
+
+    def segment(name, queue, expect, got, tol):
+        nonlocal ok
+        queue()
+        run(tasks, 10_000, until=lambda: not executor.busy())
+        value = got()
+        good = abs(value - expect) <= tol
+        print("    %-30s %8.3f expected %8.3f  %s" % (name, value, expect, "OK" if good else "FAIL"))
+        ok &= good
+
+    start = odom.distance
+    segment("drive distance=0.5 (m)", lambda: executor.drive(20, distance=0.5), 0.5,
+            lambda: odom.distance - start, 0.02)
+    start = service.heading()
+    segment("turn degrees=90 (deg)", lambda: executor.turn(20, degrees=90), 90,
+            lambda: (service.heading() - start) % 360, 5)
+    segment("align heading=200 (deg)", lambda: executor.align(200), 200, service.heading, 3)
+    segment("drive ms=500 hold=200 (deg)", lambda: executor.drive(20, ms=500, hold=200), 200,
+            service.heading, 3)
+    if init.motion_active.get() or init.left_effort.get() or init.right_effort.get():
+        print("    FAIL: executor did not release the motors")
+        ok = False
+    return ok
+
+def main():
+    init.constant_multiplier.put(1.0)
+    ok = True
+    results = {}
+    for name, bump_task in (("busy-wait wall_nav", legacy_bump_task),
+                            ("motion executor", mission_bump_task)):
+        tasks, start, log = maneuver(bump_task)
+        results[name] = starvation(tasks, start)
+        if name == "motion executor":
+            print("maneuver through the executor:")
+            ok &= check_timing(log, start)
+
+    print("\nlargest gap between runs during the maneuver (ms):")
+    print("    %-16s %6s %20s %20s" % ("task", "period", *results))
+    names = list(results)
+    for row_a, row_b in zip(*results.values()):
+        print("    %-16s %6.0f %14.1f %5s %14.1f %5s" % (
+            row_a[0], row_a[1], row_a[2], "STARVED" if row_a[3] else "", row_b[2],
+            "STARVED" if row_b[3] else ""))
+    starved = [row[0] for row in results[names[1]] if row[3]]
+    if starved:
+        print("    FAIL: starved with the executor:", ", ".join(starved))
+        ok = False
+
+    print("\nsegment end conditions:")
+    ok &= check_ends()
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+check_odometry.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check for the odometry. Encoder timer counters are driven along known
+paths on the virtual clock, with the real Encoder class in between (so the
+16-bit counter wrap is exercised), at the 25 ms encoder task period:
+- a 1 m straight line,
+- a full circle of 0.5 m radius, which must close on itself,
+- 4 m straight with the right wheel reading 3% long (slip / radius error),
+  with and without the fake BNO055 fused through IMUService.
+Exits non-zero if a pose is outside tolerance or the IMU does not reduce
+the heading error.
+
+Usage:
+    python host/check_odometry.py
+"""
+
+import sys
+from math import pi, degrees
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+clock.use_virtual()
+
+from encoder import Encoder
+from odometry import Odometry, WHEEL_RADIUS, TRACK_WIDTH, COUNTS_PER_REV
+from imu import BNO055
+from imu_service import IMUService
+from fake_bno055 import FakeBNO055
+
+PERIOD_US = 25_000
+COUNTS_PER_M = COUNTS_PER_REV / (2 * pi * WHEEL_RADIUS)
+
+def drive(v_left, v_right, seconds, right_scale=1.0, imu=None, service=None, fuse=True):
+    # Runs the wheels at v_left, v_right (m/s) and returns the odometry.
+    # imu/service: fake sensor and IMUService; the fake is set to the true heading.
+    left = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
+    right = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
+    odom = Odometry(left, right, service if fuse else None)
+    true_left = true_right = 0.0
+    true_theta = 0.0
+    for _ in range(int(seconds * 1_000_000 / PERIOD_US)):
+        clock.advance(PERIOD_US)
+        dl = v_left * PERIOD_US / 1e6
+        dr = v_right * PERIOD_US / 1e6
+        true_left += dl
+        true_right += dr
+        true_theta += (dr - dl) / TRACK_WIDTH
+        left.enc_timer.counter(round(true_left * COUNTS_PER_M))
+        right.enc_timer.counter(round(true_right * COUNTS_PER_M * right_scale))
+        left.update()
+        right.update()
+        if service is not None:
+            imu.set_euler(-degrees(true_theta), 0, 0)
+            service.refresh()
+        odom.update()
+    return odom
+
+def check(name, got, expect, tol):
+    ok = abs(got - expect) <= tol
+    print("  %-28s %9.4f  expected %9.4f  %s" % (name, got, expect, "OK" if ok else "FAIL"))
+    return ok
+
+def main():
+    ok = True
+
+    print("straight 1 m:")
+    odom = drive(0.25, 0.25, 4.0)
+    ok &= check("x (m)", odom.x, 1.0, 0.002)
+    ok &= check("y (m)", odom.y, 0.0, 0.002)
+    ok &= check("distance (m)", odom.distance, 1.0, 0.002)
+    ok &= check("v (m/s)", odom.v, 0.25, 0.01)
+
+    print("circle, 0.5 m radius:")
+    radius = 0.5
+    omega = 0.5
+    v_l = omega * (radius - TRACK_WIDTH / 2)
+    v_r = omega * (radius + TRACK_WIDTH / 2)
+    odom = drive(v_l, v_r, 2 * pi / omega)
+    ok &= check("x (m)", odom.x, 0.0, 0.01)
+    ok &= check("y (m)", odom.y, 0.0, 0.01)
+    ok &= check("theta (rad)", odom.theta, 0.0, 0.01)
+    ok &= check("distance (m)", odom.distance, 2 * pi * radius, 0.005)
+    ok &= check("omega (rad/s)", odom.omega, omega, 0.05)  # One count per tick is 0.04 rad/s
+
+    print("4 m straight, right wheel 3% long:")
+    imu_dev = FakeBNO055.attach()
+    service = IMUService(BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1))
+    plain = drive(0.4, 0.4, 10.0, right_scale=1.03, imu=imu_dev, service=service, fuse=False)
+    fused = drive(0.4, 0.4, 10.0, right_scale=1.03, imu=imu_dev, service=service)
+    print("  heading error encoders only: %6.1f deg, y %.3f m" % (degrees(plain.theta), plain.y))
+    print("  heading error with IMU:      %6.1f deg, y %.3f m" % (degrees(fused.theta), fused.y))
+    if not abs(fused.theta) < abs(plain.theta) / 5:
+        print("  FAIL: IMU fusion did not reduce the heading error")
+        ok = False
+
+    print("line section end: 113 rad of wheel = %.3f m of arc length" % (113 * WHEEL_RADIUS))
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
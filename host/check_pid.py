@@ -0,0 +1,231 @@
+"""
+check_pid.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check and benchmark for PID_controller.PID.
+1. Step response on a first-order plant (gain 1, time constant 0.2 s,
+   11 ms steps): overshoot, 2% settling time and steady-state error.
+2. Windup: the same plant with the output clamped below what a large
+   step needs. Back-calculation must overshoot less and settle sooner
+   than the clamp alone (kaw=0).
+3. Derivative filter: with noisy measurements, the filtered D term must
+   swing less than the raw one.
+4. With Ki=0 and no filter, step() must give the original line following
+   P + D terms.
+5. Gaps: in PID_value with Ki > 0, the first error after an override,
+   motion or grid mode gap (and the very first error) must not add to the
+   integral, however long the gap.
+6. Calls per second of the original PID_value generator, the PID_value
+   generator built on PID, and PID.step alone, plus bytes kept per step()
+   (tracemalloc).
+Exits non-zero on failure.
+
+Usage:
+    python host/check_pid.py [calls]
+"""
+
+import sys
+import random
+import tracemalloc
+from struct import unpack_from
+from time import perf_counter
+
+import hostenv
+hostenv.install()
+
+from time import ticks_us, ticks_diff
+import init
+import PID_controller
+from PID_controller import PID, PID_value, Kp, Kd
+
+DT = 0.011
+PLANT_TAU = 0.2
+
+def simulate(pid, setpoint=1.0, seconds=3.0, noise=0.0, seed=1):
+    # Closed loop on dy/dt = (u - y) / PLANT_TAU; returns (outputs, d terms).
+    rng = random.Random(seed)
+    y = 0.0
+    ys = []
+    ds = []
+    for _ in range(int(seconds / DT)):
+        u = pid.step(setpoint - (y + rng.uniform(-noise, noise)), DT)
+        y += (u - y) * DT / PLANT_TAU
+        ys.append(y)
+        ds.append(pid.d)
+    return ys, ds
+
+def response(ys, setpoint):
+    # Overshoot (%), 2% settling time (s) and final error.
+    overshoot = max(0.0, (max(ys) - setpoint) / setpoint * 100)
+    settle = 0
+    for k, y in enumerate(ys):
+        if abs(y - setpoint) > 0.02 * setpoint:
+            settle = k + 1
+    return overshoot, settle * DT, setpoint - ys[-1]
+
+def legacy_PID_value():
+    # The generator PID_controller.PID_value replaced, for the benchmark
+    # (reading the line error mailbox in place of the queue).
+    integral = 0.0
+    prev_error = 0.0
+    prev_time = ticks_us()
+    base_speed = 18
+    while True:
+        if init.state_input.get() == 1:
+            yield 0
+            continue
+        if init.motion_active.get() == 1:
+            yield 0
+            continue
+        error = 0.0
+        if not init.line_error.empty():
+            error = init.line_error.get()
+        if init.override_mode.get() == 1:
+            error = 0.0
+        if error == 0:
+            integral = 0.0
+            prev_error = 0.0
+            left_out = base_speed
+            right_out = base_speed
+        else:
+            now = ticks_us()
+            dt = ticks_diff(now, prev_time) / 1_000_000.0
+            prev_time = now
+            p_term = Kp * error
+            integral += error * dt
+            i_term = PID_controller.Ki * integral
+            d_term = 0.0
+            if dt > 0:
+                d_term = Kd * (error - prev_error) / dt
+            prev_error = error
+            pid_output = p_term + i_term + d_term
+            left_out = base_speed - pid_output
+            right_out = base_speed + pid_output
+        left_out = max(-100, min(100, left_out))
+        right_out = max(-100, min(100, right_out))
+        init.left_effort.put(int(left_out))
+        init.right_effort.put(int(right_out))
+        yield 0
+
+def gap_steps():
+    # Integral added by PID_value's first error and by the first error after
+    # each kind of gap (2 s long, 10 ms between errors otherwise). Override,
+    # motion and grid mode all reset the PID.
+    ki = PID_controller.Ki
+    PID_controller.Ki = 5.0
+    gaps = (init.override_mode, init.motion_active, init.state_input)
+    for flag in gaps:
+        flag.put(0)
+    gen = PID_value()
+    stamp = 0
+
+    def step(gap_us=10_000):
+        # Integral (telemetry) after one error of 1.0 gap_us after the last.
+        nonlocal stamp
+        stamp += gap_us
+        init.line_error.put(1.0, stamp=stamp)
+        next(gen)
+        return unpack_from('<4f', PID_controller.telemetry, 0)[2]
+
+    added = [step()]
+    for flag in gaps:
+        for _ in range(5):
+            step()
+        flag.put(1)
+        next(gen)
+        flag.put(0)
+        added.append(step(gap_us=2_000_000))
+    PID_controller.Ki = ki
+    return added
+
+def rate(fun, calls):
+    # Calls per second of fun(k) over calls calls.
+    start = perf_counter()
+    for k in range(calls):
+        fun(k)
+    return calls / (perf_counter() - start)
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ok = True
+
+    def report(name, good, text):
+        nonlocal ok
+        print("%-26s %s  %s" % (name, text, "OK" if good else "FAIL"))
+        ok &= good
+
+    # 1. Step response
+    overshoot, settle, final = response(simulate(PID(2.0, 10.0, out_min=-100, out_max=100))[0], 1.0)
+    report("step response", overshoot < 20 and settle < 1.0 and abs(final) < 0.01,
+           "overshoot %5.1f%%, settles in %.2f s, final error %+.4f" % (overshoot, settle, final))
+
+    # 2. Windup on a saturated step
+    results = {}
+    for name, kaw in (("clamp only", 0.0), ("back-calculation", None)):
+        ys = simulate(PID(2.0, 10.0, out_min=-1.2, out_max=1.2, kaw=kaw), setpoint=1.0, seconds=5.0)[0]
+        results[name] = response(ys, 1.0)
+        print("%-26s overshoot %5.1f%%, settles in %.2f s" % ("windup, " + name, *results[name][:2]))
+    clamp, back = results["clamp only"], results["back-calculation"]
+    report("anti-windup", back[0] < clamp[0] and back[1] < clamp[1],
+           "overshoot %.1f%% -> %.1f%%" % (clamp[0], back[0]))
+
+    # 3. Derivative filter on noisy measurements
+    swing = {}
+    for tau in (0.0, 0.02):
+        ds = simulate(PID(2.0, 10.0, 0.05, tau=tau), noise=0.01)[1][100:]
+        swing[tau] = max(ds) - min(ds)
+    report("derivative filter", swing[0.02] < swing[0.0] / 2,
+           "D swing %.3f raw, %.3f with tau 0.02 s" % (swing[0.0], swing[0.02]))
+
+    # 4. Original P + D terms
+    rng = random.Random(2)
+    pid = PID(Kp, 0, Kd, out_min=-1000, out_max=1000)
+    worst = 0.0
+    prev = 0.0
+    for k in range(1000):
+        error = rng.uniform(-5, 5)
+        dt = rng.uniform(0.009, 0.013)
+        expect = Kp * error + (Kd * (error - prev) / dt if k else 0.0)
+        worst = max(worst, abs(pid.step(error, dt) - expect))
+        prev = error
+    report("matches original P + D", worst < 1e-9, "largest difference %.1e" % worst)
+
+    # 5. Gaps
+    added = gap_steps()
+    report("no integration over gaps", max(abs(a) for a in added) < 1e-6,
+           "integral added: first error %.4f, after override %.4f, motion %.4f, grid %.4f" % tuple(added))
+
+    # 6. Benchmark
+    init.state_input.put(0)
+    init.motion_active.put(0)
+    init.override_mode.put(0)
+    errors = [rng.uniform(-5, 5) for _ in range(1024)]
+    print("\ncalls per second (%d calls):" % calls)
+    rates = {}
+    for name, gen in (("original PID_value", legacy_PID_value()), ("PID_value with PID", PID_value())):
+        def run(k, gen=gen):
+            init.line_error.put(errors[k & 1023])
+            next(gen)
+        rates[name] = rate(run, calls)
+    pid = PID(Kp, PID_controller.Ki, Kd, tau=PID_controller.Tf)
+    rates["PID.step"] = rate(lambda k: pid.step(errors[k & 1023], DT), calls)
+    for name, value in rates.items():
+        print("    %-20s %10.0f" % (name, value))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for k in range(1000):
+        pid.step(errors[k & 1023], DT)
+    retained = (tracemalloc.get_traced_memory()[0] - before) / 1000
+    tracemalloc.stop()
+    print()
+    report("step() allocation", retained < 1, "%.1f bytes retained per call" % retained)
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
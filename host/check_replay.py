@@ -0,0 +1,223 @@
+"""
+check_replay.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check for input capture and replay (input_capture.py,
+host/replay_capture.py). Builds the sensing and line-following path as
+main.py does (line sensor driver on the 200 Hz sampler, encoders read by
+a speed-loop task and the encoder task, the BNO055 through the IMU
+service, PID_value) on the virtual clock, with a moving line, turning
+wheels, a changing heading, control flags toggling and bump edges. The
+run is captured, and every captured call's outputs are logged as it runs.
+1. Replaying the capture in a fresh process must give the logged outputs
+   row for row.
+2. A capture with one line channel's counts changed for a second must
+   replay to different outputs, so the comparison is not vacuous.
+Also prints the capture rate in bytes per second of run time.
+Exits non-zero on failure.
+
+Usage:
+    python host/check_replay.py [seconds]
+"""
+
+import io
+import os
+import sys
+import random
+import shutil
+import tempfile
+import subprocess
+from math import sin, exp
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+clock.use_virtual()
+
+import pyb
+from pyb import ExtInt
+import cotask
+from cotask import Task
+import init
+import state
+from linesensor import LineSensorDriver, ERROR_ONE
+from line_sampler import LineSampler, ADCBackend
+from PID_controller import PID_value
+from encoder import Encoder
+from imu import BNO055
+from imu_service import IMUService
+from bump_sensor import init_bump_sensors
+from fake_bno055 import FakeBNO055
+from input_capture import InputCapture, CALL_LINE, CALL_PID, EV_ADC, EV_I2C, SIZES
+from replay_capture import line_row, pid_row, imu_row, encoder_row, write_rows
+
+PINS = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 20.0
+    rng = random.Random(7)
+    rows = []
+    channels = {pin: k for k, pin in enumerate(PINS)}
+
+    def counts(adc):
+        # A line that wanders across the array, with noise
+        k = channels.get(adc.pin.name())
+        if k is None:
+            return 0
+        position = 4 + 2.5 * sin(clock.us() / 700_000)
+        dark = exp(-((k + 1 - position) / 0.8) ** 2)
+        return max(0, min(4095, int(250 + 3050 * dark + rng.gauss(0, 20))))
+    pyb.ADC.read = counts
+
+    bno = FakeBNO055.attach(bus=1)
+    imu = BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1, wait=False)
+    imu.initialize()
+    driver = LineSensorDriver(line_pins=PINS, brightness_pin='PC2', window_size=10, fixed_point=True)
+    driver.load_calibration([800] * len(PINS), [3800] * len(PINS))
+    sampler = LineSampler(ADCBackend(driver.adc_line, driver.adc_brightness), timer_num=6, freq=200)
+    driver.attach_sampler(sampler)
+    sampler.start()
+    imu_service = IMUService(imu)
+    left_enc = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
+    right_enc = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
+    init_bump_sensors()
+
+    capture = InputCapture()
+    stream = io.BytesIO()
+    capture.attach(driver, sampler, left_enc, right_enc, imu_service)
+    capture.write_header(stream)
+    capture.start()
+
+    # Outputs of every captured call, logged as the replay logs them
+    def logged(method, row):
+        def call():
+            method()
+            rows.append(row())
+        return call
+    imu_service.refresh = logged(imu_service.refresh, lambda: imu_row(imu_service))
+    left_enc.update = logged(left_enc.update, lambda: encoder_row(0, left_enc))
+    right_enc.update = logged(right_enc.update, lambda: encoder_row(1, right_enc))
+
+    def logged_task(task_fun, row):
+        def task():
+            gen = task_fun()
+            while True:
+                result = next(gen)
+                rows.append(row())
+                yield result
+        return task
+
+    def task_line():
+        # main.py's task_linesensor_wrapper
+        while True:
+            error_q, _ = driver.line_reading_fixed()
+            init.line_error.put(error_q / ERROR_ONE, driver.last_time)
+            yield 0
+
+    def task_encoders():
+        while True:
+            left_enc.update()
+            right_enc.update()
+            yield 0
+
+    def task_speed():
+        while True:
+            left_enc.update()
+            yield 0
+
+    wheel = [0.0, 0.0]
+    def task_world():
+        # Wheels, heading, control flags and bumps; not captured
+        k = 0
+        while True:
+            k += 1
+            t = clock.us() / 1e6
+            for index, timer in enumerate((left_enc.enc_timer.timer, right_enc.enc_timer.timer)):
+                wheel[index] += 30 + 20 * sin(t * (1 + index))
+                timer.counter(int(wheel[index]) & 0xFFFF)
+            bno.set_euler((t * 40) % 360, 0, 0)
+            bno.set_gyro(0, 0, -40 + 5 * sin(t))
+            ints = state.ints
+            ints[state.MOTION_ACTIVE] = 1 if int(t) % 7 == 5 else 0
+            ints[state.OVERRIDE_MODE] = 1 if int(t) % 11 == 9 else 0
+            if k % 1500 == 0:
+                ext = ExtInt.instances[0]
+                ext.swint()
+                rows.append(('bump', ext.line()))
+            yield 0
+
+    task_list = cotask.TaskList()
+    tasks = [
+        Task(task_world, name="World", priority=4, period=2),
+        Task(logged_task(capture.wrap(task_line, CALL_LINE), line_row), name="Line Sensor", priority=2, period=11),
+        Task(logged_task(capture.wrap(PID_value, CALL_PID), pid_row), name="PID Controller", priority=1, period=11),
+        Task(imu_service.task, name="IMU Service", priority=1, period=20),
+        Task(task_speed, name="Left Speed", priority=3, period=5),
+        Task(task_encoders, name="Encoder Update", priority=0, period=25),
+        Task(lambda: capture.flush_task(stream), name="Capture Flush", priority=0, period=50),
+    ]
+    for task in tasks:
+        task_list.append(task)
+
+    end = clock.us() + int(seconds * 1e6)
+    while clock.us() < end:
+        before = clock.us()
+        task_list.pri_sched()
+        clock.advance(300 if clock.us() == before else 150)
+    sampler.stop()
+    capture.stop()
+    capture.flush(stream)
+    data = stream.getvalue()
+    events, written, max_pending, overflowed = capture.stats()
+    print("captured %.0f s: %d events, %d bytes (%.1f kB/s), buffer peak %d bytes%s" % (
+        seconds, events, len(data), len(data) / seconds / 1000, max_pending, ", OVERFLOWED" if overflowed else ""))
+    print("live outputs: %d rows" % len(rows))
+
+    failures = 0
+    workdir = tempfile.mkdtemp(prefix='romi_replay_')
+    capture_path = os.path.join(workdir, 'capture.bin')
+    live_path = os.path.join(workdir, 'live.csv')
+    with open(capture_path, 'wb') as f:
+        f.write(data)
+    write_rows(live_path, rows)
+    replay = [sys.executable, os.path.join(HERE, 'replay_capture.py'), capture_path, 'compare=' + live_path]
+
+    print("\n1. replay against the live outputs")
+    result = subprocess.run(replay, capture_output=True, text=True)
+    print(result.stdout.rstrip())
+    if result.returncode != 0:
+        print(result.stderr.rstrip())
+        failures += 1
+
+    print("\n2. replay of a capture with one line channel's counts changed for a second")
+    tampered = bytearray(data)
+    pos = len(data) - written
+    changed = 0
+    while pos < len(tampered) and changed < 200:
+        source = tampered[pos]
+        size = SIZES[source] + (tampered[pos + 2] * tampered[pos + 3] if source == EV_I2C else 0)
+        if source == EV_ADC and tampered[pos + 1] == 3 and pos > len(data) // 2:
+            tampered[pos + 3] ^= 0x04  # Count high byte: 1024 counts
+            changed += 1
+        pos += 1 + size
+    with open(capture_path, 'wb') as f:
+        f.write(tampered)
+    result = subprocess.run(replay, capture_output=True, text=True)
+    print(result.stdout.rstrip().splitlines()[-1])
+    if not changed or result.returncode == 0:
+        print("tampered capture replayed to the same outputs")
+        failures += 1
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    if failures:
+        print("FAIL")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
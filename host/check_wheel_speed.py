@@ -0,0 +1,138 @@
+"""
+check_wheel_speed.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host check for the wheel speed loops on the virtual clock, with
+motor_plant.MotorPlant standing in for the gearmotors. The speed loops run
+every 5 ms as on the board; open loop is the original motor task, with the
+battery multiplier computed once at startup.
+1. Step response to effort 30 (6 rad/s): rise time, overshoot and final
+   error.
+2. Battery sag: the pack runs down from 8.4 V to 6.3 V over 20 s at a
+   constant command. The closed loop must hold its speed within 3%.
+3. Mismatched motors (right one 12% weaker) driving straight for 5 s: the
+   heading drift must stay under 2 degrees with the speed loops.
+Exits non-zero on failure.
+
+Usage:
+    python host/check_wheel_speed.py
+"""
+
+import sys
+from math import degrees
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+clock.use_virtual()
+
+import init
+from encoder import Encoder
+from left_motor import left_motor
+from right_motor import right_motor
+from odometry import WHEEL_RADIUS, TRACK_WIDTH
+from wheel_speed import WheelSpeedLoop, FULL_SPEED
+from motor_plant import MotorPlant, NOMINAL_VOLTS
+
+PERIOD_US = 5_000
+PLANT_STEP_US = 500
+EFFORT = 30
+
+def build(closed, volts=NOMINAL_VOLTS, right_gain=25.0):
+    # Returns a step function that advances both wheels by one 5 ms period.
+    left_enc = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
+    right_enc = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
+    left_enc.enc_timer.counter(0)
+    right_enc.enc_timer.counter(0)
+    left = MotorPlant(left_motor, left_enc, volts=volts)
+    right = MotorPlant(right_motor, right_enc, volts=volts, gain=right_gain)
+    loops = (WheelSpeedLoop(left_motor, left_enc, init.left_effort, init.left_speed),
+             WheelSpeedLoop(right_motor, right_enc, init.right_effort, init.right_speed))
+    init.constant_multiplier.put(NOMINAL_VOLTS / volts)  # Startup battery compensation
+    left_motor.set_multiplier()
+    right_motor.set_multiplier()
+    left_motor.set_duty(0)
+    right_motor.set_duty(0)
+
+    def step():
+        if closed:
+            for loop in loops:
+                loop.step()
+        else:
+            left_motor.update(init.left_effort.get())
+            right_motor.update(init.right_effort.get())
+        for _ in range(PERIOD_US // PLANT_STEP_US):
+            clock.advance(PLANT_STEP_US)
+            left.step(PLANT_STEP_US / 1e6)
+            right.step(PLANT_STEP_US / 1e6)
+    return step, left, right
+
+def command(left, right):
+    init.left_effort.put(left)
+    init.right_effort.put(right)
+
+def check_step():
+    step, left, _ = build(True)
+    target = EFFORT * FULL_SPEED / 100
+    command(EFFORT, EFFORT)
+    speeds = []
+    for _ in range(200):
+        step()
+        speeds.append(left.speed)
+    rise = next(k for k, s in enumerate(speeds) if s >= 0.9 * target) * PERIOD_US / 1000
+    overshoot = max(0.0, (max(speeds) - target) / target * 100)
+    final = (speeds[-1] - target) / target * 100
+    good = rise < 150 and overshoot < 15 and abs(final) < 2
+    print("step to %.1f rad/s: rise %.0f ms, overshoot %.1f%%, final error %+.2f%%  %s"
+          % (target, rise, overshoot, final, "OK" if good else "FAIL"))
+    return good
+
+def check_sag():
+    print("\nbattery sag 8.4 V -> 6.3 V over 20 s, command %.1f rad/s:" % (EFFORT * FULL_SPEED / 100))
+    ok = True
+    for closed in (False, True):
+        step, left, _ = build(closed, volts=8.4)
+        command(EFFORT, EFFORT)
+        speeds = []
+        n = 20_000_000 // PERIOD_US
+        for k in range(n):
+            left.volts = 8.4 - 2.1 * k / n
+            step()
+            if k >= 100:
+                speeds.append(left.speed)
+        spread = (max(speeds) - min(speeds)) / max(speeds) * 100
+        good = not closed or spread < 3
+        print("    %-11s speed %5.2f .. %5.2f rad/s, spread %5.1f%%  %s" % (
+            "closed loop" if closed else "open loop", min(speeds), max(speeds), spread,
+            "OK" if good else "FAIL"))
+        ok &= good
+    return ok
+
+def check_drift():
+    print("\nmismatched motors, straight for 5 s:")
+    ok = True
+    for closed in (False, True):
+        step, left, right = build(closed, right_gain=22.0)
+        command(EFFORT, EFFORT)
+        for _ in range(5_000_000 // PERIOD_US):
+            step()
+        drift = degrees((right.angle - left.angle) * WHEEL_RADIUS / TRACK_WIDTH)
+        good = not closed or abs(drift) < 2
+        print("    %-11s heading drift %7.1f deg  %s" % ("closed loop" if closed else "open loop", drift,
+                                                        "OK" if good else "FAIL"))
+        ok &= good
+    return ok
+
+def main():
+    ok = check_step()
+    ok &= check_sag()
+    ok &= check_drift()
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
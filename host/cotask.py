@@ -0,0 +1,138 @@
+"""
+cotask.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host stand-in for the ME405 cotask module (Task, TaskList, task_list).
+Follows the on-board scheduler: a task is ready once its period has
+passed, the next run time advances by whole periods from the previous
+one, and pri_sched() runs at most one ready task per call, taking the
+highest priority first and going round-robin within a priority.
+
+For host checks each task also records the virtual time of every run
+(run_times) and its lateness against the run time it was due at, so a
+starved task shows up as a large lateness or a gap between runs.
+"""
+
+from time import ticks_us, ticks_diff, ticks_add
+
+class Task:
+    def __init__(self, run_fun, name="NoName", priority=0, period=None,
+                 profile=False, trace=False, shares=()):
+        self._run_gen = run_fun(shares) if shares else run_fun()
+        self.name = name
+        self.priority = int(priority)
+        if period is not None:
+            self.period = int(period * 1000)
+            self._next_run = ticks_add(ticks_us(), self.period)
+        else:
+            self.period = None
+            self._next_run = None
+        self._prof = profile
+        self._trace = trace
+        self._tr_data = []
+        self.go_flag = False
+        self.reset_profile()
+
+        # Host bookkeeping
+        self.run_times = []
+        self.max_late_us = 0
+        self._due = None
+
+    def reset_profile(self):
+        self._runs = 0
+        self._run_sum = 0
+        self._slowest = 0
+        self._late_sum = 0
+        self._latest = 0
+
+    def schedule(self):
+        if self.ready():
+            self.go_flag = False
+            stime = ticks_us()
+            state = next(self._run_gen)
+            self.run_times.append(stime)
+            if self._due is not None:
+                late = ticks_diff(stime, self._due)
+                if late > self.max_late_us:
+                    self.max_late_us = late
+            self._runs += 1
+            if self._prof:
+                runt = ticks_diff(ticks_us(), stime)
+                if self._runs > 2:
+                    self._run_sum += runt
+                    if runt > self._slowest:
+                        self._slowest = runt
+            if self._trace:
+                self._tr_data.append((stime, state))
+            return True
+        return False
+
+    def ready(self):
+        if self.period is not None and not self.go_flag:
+            late = ticks_diff(ticks_us(), self._next_run)
+            if late >= 0:
+                self.go_flag = True
+                self._due = self._next_run
+                self._next_run = ticks_add(self._next_run, self.period)
+                if self._prof:
+                    self._late_sum += late
+                    if late > self._latest:
+                        self._latest = late
+        return self.go_flag
+
+    def set_period(self, new_period):
+        self.period = None if new_period is None else int(new_period) * 1000
+
+    def get_trace(self):
+        return '\n'.join("%d: %s" % entry for entry in self._tr_data)
+
+    def go(self):
+        self.go_flag = True
+
+    def __repr__(self):
+        period = "-" if self.period is None else "%.1f" % (self.period / 1000)
+        line = "%-16s %4d %6s %8d" % (self.name, self.priority, period, self._runs)
+        if self._prof and self._runs > 2:
+            line += " %8.3f %8.3f %8.3f %8.3f" % (
+                self._run_sum / (self._runs - 2) / 1000, self._slowest / 1000,
+                self._late_sum / self._runs / 1000, self._latest / 1000)
+        return line
+
+class TaskList:
+    def __init__(self):
+        self.pri_list = []  # [priority, next index, task, task, ...], highest priority first
+
+    def append(self, task):
+        for pri in self.pri_list:
+            if pri[0] == task.priority:
+                pri.append(task)
+                return
+        self.pri_list.append([task.priority, 2, task])
+        self.pri_list.sort(key=lambda pri: pri[0], reverse=True)
+
+    def tasks(self):
+        return [task for pri in self.pri_list for task in pri[2:]]
+
+    def rr_sched(self):
+        for task in self.tasks():
+            task.schedule()
+
+    def pri_sched(self):
+        for pri in self.pri_list:
+            count = len(pri) - 2
+            for _ in range(count):
+                task = pri[pri[1]]
+                pri[1] = pri[1] + 1 if pri[1] < len(pri) - 1 else 2
+                if task.schedule():
+                    return
+
+    def __repr__(self):
+        lines = ["TASK             PRI    PER     RUNS   AVG DUR   MAX DUR  AVG LATE  MAX LATE"]
+        lines += [repr(task) for task in self.tasks()]
+        return '\n'.join(lines)
+
+task_list = TaskList()
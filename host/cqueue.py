@@ -0,0 +1,55 @@
+"""
+cqueue.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host stand-in for the ME405 cqueue module (fast fixed-size queues).
+"""
+
+from array import array
+
+class _Queue:
+    _type = 'l'
+
+    def __init__(self, size):
+        self._size = size
+        self._buf = array(self._type, [0] * size)
+        self.clear()
+
+    def put(self, value):
+        self._buf[self._wr] = value
+        self._wr = (self._wr + 1) % self._size
+        if self._num < self._size:
+            self._num += 1
+        else:
+            self._rd = (self._rd + 1) % self._size
+
+    def get(self):
+        value = self._buf[self._rd]
+        if self._num:
+            self._rd = (self._rd + 1) % self._size
+            self._num -= 1
+        return value
+
+    def any(self):
+        return self._num > 0
+
+    def available(self):
+        return self._num
+
+    def full(self):
+        return self._num >= self._size
+
+    def clear(self):
+        self._rd = 0
+        self._wr = 0
+        self._num = 0
+
+class IntQueue(_Queue):
+    _type = 'l'
+
+class FloatQueue(_Queue):
+    _type = 'f'
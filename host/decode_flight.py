@@ -0,0 +1,94 @@
+"""
+decode_flight.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Decodes a flight recorder dump (flight.bin from the board, or a capture of
+a UART dump) into CSV, or into NumPy arrays saved as .npz when NumPy is
+installed. Times are converted to seconds from the first record (ticks
+wrap at 2^30 us), efforts stay in %, heading is converted to degrees and
+line channels to 0..1 reflectance.
+
+Usage:
+    python host/decode_flight.py flight.bin [out.csv | out.npz]
+
+From Python:
+    from decode_flight import read_dump
+    columns = read_dump(open('flight.bin', 'rb').read())
+"""
+
+import sys
+import csv
+import struct
+
+import hostenv
+hostenv.install()
+
+from flight_recorder import MAGIC, VERSION, HEADER_FMT, RECORD_FMT, FIELDS
+
+TICKS_PERIOD = 1 << 30
+
+def read_dump(data):
+    # Returns {column name: list} for every record in a dump.
+    magic, version, num_channels, record_size = struct.unpack_from(HEADER_FMT, data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a flight recorder dump (magic %r, version %d)" % (magic, version))
+    fmt = RECORD_FMT + '%dB' % num_channels
+    if struct.calcsize(fmt) != record_size:
+        raise ValueError("record size %d does not match layout %d" % (record_size, struct.calcsize(fmt)))
+    names = list(FIELDS) + ['ch%d' % k for k in range(num_channels)]
+    columns = {name: [] for name in names}
+    offset = struct.calcsize(HEADER_FMT)
+    for record in struct.iter_unpack(fmt, data[offset:offset + (len(data) - offset) // record_size * record_size]):
+        for name, value in zip(names, record):
+            columns[name].append(value)
+
+    # Unwrap ticks into seconds from the first record
+    t = columns['t_us']
+    seconds = []
+    elapsed = 0
+    for k in range(len(t)):
+        if k:
+            elapsed += (t[k] - t[k - 1]) % TICKS_PERIOD
+        seconds.append(elapsed / 1e6)
+    columns['t'] = seconds
+    columns['heading'] = [h / 16 for h in columns['heading_raw']]
+    for k in range(num_channels):
+        columns['ch%d' % k] = [v / 255 for v in columns['ch%d' % k]]
+    return columns
+
+def write_csv(columns, path):
+    names = ['t'] + [name for name in columns if name != 't']
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(columns[name] for name in names)))
+
+def write_npz(columns, path):
+    import numpy
+    numpy.savez(path, **{name: numpy.asarray(values) for name, values in columns.items()})
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    with open(sys.argv[1], 'rb') as f:
+        columns = read_dump(f.read())
+    out = sys.argv[2] if len(sys.argv) > 2 else sys.argv[1].rsplit('.', 1)[0] + '.csv'
+    if out.endswith('.npz'):
+        try:
+            write_npz(columns, out)
+        except ImportError:
+            print("NumPy is not installed; write a .csv instead")
+            sys.exit(1)
+    else:
+        write_csv(columns, out)
+    n = len(columns['t'])
+    span = columns['t'][-1] if n else 0
+    print("%d records over %.2f s (%.1f Hz) written to %s" % (n, span, (n - 1) / span if span else 0, out))
+
+if __name__ == "__main__":
+    main()
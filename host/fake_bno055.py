@@ -0,0 +1,107 @@
+"""
+fake_bno055.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Register-level stand-in for the BNO055 on the host I2C bus. Host scripts
+set physical values (heading, rates, ...) and the imu driver reads them
+back through the normal register interface.
+
+Bring-up timing is optional. With boot_us set, a rising edge on the reset
+pin restarts the sensor and it NACKs every transfer until boot_us has
+passed on the host clock. With switch timing set, a write to OPR_MODE
+reads back the old mode until the datasheet switching time has passed.
+All timings default to zero (instant sensor).
+
+Usage:
+    bno = FakeBNO055.attach(bus=1)
+    bno.set_euler(90.0, 0.0, 0.0)
+"""
+
+import struct
+from pyb import I2C, Pin
+from hostenv import clock
+
+class FakeBNO055:
+    ADDR = 0x28
+    CHIP_ID = 0xA0
+
+    def __init__(self, boot_us=0, to_config_us=0, from_config_us=0):
+        self.regs = bytearray(0x80)
+        self.regs[0x00] = self.CHIP_ID
+        self.mode_writes = []
+        self.boot_us = boot_us
+        self.to_config_us = to_config_us
+        self.from_config_us = from_config_us
+        self.booted_at = clock.us()
+        self.switch_done = 0
+        self.previous_mode = 0
+        self.nacks = 0
+
+    @classmethod
+    def attach(cls, bus=1, rst_pin='PA15', **timing):
+        device = cls(**timing)
+        I2C.attach(bus, cls.ADDR, device)
+        Pin.watchers[rst_pin] = device._on_reset_pin
+        return device
+
+    @classmethod
+    def datasheet(cls, bus=1, rst_pin='PA15'):
+        # Typical timings from the BNO055 datasheet.
+        return cls.attach(bus, rst_pin, boot_us=650_000, to_config_us=19_000, from_config_us=7_000)
+
+    def _on_reset_pin(self, value):
+        if value:
+            self.booted_at = clock.us() + self.boot_us
+            self.regs[0x3D] = 0x00
+            self.switch_done = 0
+
+    def _check_awake(self):
+        if clock.us() < self.booted_at:
+            self.nacks += 1
+            raise OSError(5)  # EIO: no ACK while booting
+
+    def read(self, memaddr, nbytes):
+        self._check_awake()
+        data = bytearray(self.regs[memaddr:memaddr + nbytes])
+        if memaddr <= 0x3D < memaddr + nbytes and clock.us() < self.switch_done:
+            data[0x3D - memaddr] = self.previous_mode
+        return bytes(data)
+
+    def write(self, memaddr, data):
+        self._check_awake()
+        if memaddr == 0x3D:
+            self.mode_writes.append(data[0])
+            self.previous_mode = self.regs[0x3D]
+            switch_us = self.to_config_us if data[0] == 0 else self.from_config_us
+            self.switch_done = clock.us() + switch_us
+        self.regs[memaddr:memaddr + len(data)] = data
+
+    def _put(self, addr, *values):
+        struct.pack_into('<%dh' % len(values), self.regs, addr, *values)
+
+    def set_accel(self, x, y, z):
+        # m/s^2, 100 LSB per unit
+        self._put(0x08, round(x * 100), round(y * 100), round(z * 100))
+
+    def set_mag(self, x, y, z):
+        # uT, 16 LSB per unit
+        self._put(0x0E, round(x * 16), round(y * 16), round(z * 16))
+
+    def set_gyro(self, x, y, z):
+        # deg/s, 16 LSB per unit
+        self._put(0x14, round(x * 16), round(y * 16), round(z * 16))
+
+    def set_euler(self, heading, roll, pitch):
+        # degrees, 16 LSB per unit; heading wraps to 0..360
+        self._put(0x1A, round((heading % 360) * 16), round(roll * 16), round(pitch * 16))
+
+    def set_calib_status(self, sys_cal, gyro, accel, mag):
+        self.regs[0x35] = (sys_cal << 6) | (gyro << 4) | (accel << 2) | mag
+
+    @property
+    def mode(self):
+        return self.regs[0x3D]
@@ -0,0 +1,169 @@
+"""
+hostenv.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Prepares a desktop CPython interpreter to import the Romi modules unchanged.
+Puts the host stand-ins (pyb, micropython, task_share, ...) ahead of the
+project files on sys.path, adds the MicroPython-only helpers to the time
+and gc modules and maps the board module names onto the file names in
+this repo.
+
+Functionality:
+- install() must be called before any project module is imported.
+- clock provides either real time or a virtual microsecond clock that
+  host scripts advance explicitly.
+- gc.mem_alloc() is the memory traced by tracemalloc (0 when it is not
+  tracing), gc.mem_free() the rest of a HEAP_BYTES heap, and gc.threshold()
+  only stores its value. CPython's gc module is built in, so it is patched
+  like time rather than shadowed by a file here.
+"""
+
+import builtins
+import gc
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(HOST_DIR)
+
+# Modules whose file name in the repo differs from the name used on the board
+ALIASES = {
+    'imu': 'imy.py',
+    'linesensor': 'line_sensor.py',
+}
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALF = TICKS_PERIOD // 2
+HEAP_BYTES = 100_000  # Roughly the heap MicroPython has on the Nucleo
+
+class Clock:
+    # Microsecond clock used by every ticks_* and delay function on the host.
+    # In virtual mode, advancing the clock also fires timer callbacks that
+    # fall due, in time order, as the hardware timer interrupts would.
+
+    def __init__(self):
+        self.virtual = False
+        self.now = 0
+        self.timers = []
+        self._t0 = time.perf_counter()
+
+    def use_virtual(self, start_us=0):
+        # Switches to a virtual clock that only moves when advanced.
+        self.virtual = True
+        self.now = start_us
+
+    def use_real(self):
+        self.virtual = False
+
+    def us(self):
+        if self.virtual:
+            return self.now
+        return int((time.perf_counter() - self._t0) * 1_000_000)
+
+    def advance(self, us):
+        # Moves the virtual clock forward (sleeps when running in real time).
+        if not self.virtual:
+            if us > 0:
+                time.sleep(us / 1_000_000)
+            return
+        end = self.now + int(us)
+        while self.timers:
+            timer = min(self.timers, key=lambda t: t.next_due)
+            if timer.next_due > end:
+                break
+            self.now = int(timer.next_due)
+            timer.next_due += 1_000_000 / timer.freq()
+            timer._callback(timer)
+        self.now = end
+
+    def add_timer(self, timer):
+        # Registers a pyb.Timer whose callback should fire periodically.
+        if timer not in self.timers:
+            timer.next_due = self.now + 1_000_000 / timer.freq()
+            self.timers.append(timer)
+
+    def remove_timer(self, timer):
+        if timer in self.timers:
+            self.timers.remove(timer)
+
+clock = Clock()
+
+def ticks_us():
+    return clock.us() & TICKS_MAX
+
+def ticks_ms():
+    return (clock.us() // 1000) & TICKS_MAX
+
+def ticks_diff(end, start):
+    return ((end - start + TICKS_HALF) & TICKS_MAX) - TICKS_HALF
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+def sleep_us(us):
+    clock.advance(us)
+
+def sleep_ms(ms):
+    clock.advance(ms * 1000)
+
+def mem_alloc():
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+def mem_free():
+    return HEAP_BYTES - mem_alloc()
+
+_gc_threshold = -1
+
+def threshold(amount=None):
+    global _gc_threshold
+    if amount is None:
+        return _gc_threshold
+    _gc_threshold = amount
+
+class _AliasFinder:
+    # Resolves board module names (e.g. 'imu') to the repo file names.
+
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        file_name = ALIASES.get(name)
+        if file_name is None:
+            return None
+        return importlib.util.spec_from_file_location(name, os.path.join(REPO_DIR, file_name))
+
+_installed = False
+
+def install():
+    # Makes the project importable on the host; safe to call more than once.
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    for path in (REPO_DIR, HOST_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+    sys.meta_path.insert(0, _AliasFinder)
+
+    time.ticks_us = ticks_us
+    time.ticks_ms = ticks_ms
+    time.ticks_cpu = ticks_us
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep_us = sleep_us
+    time.sleep_ms = sleep_ms
+    gc.mem_alloc = mem_alloc
+    gc.mem_free = mem_free
+    gc.threshold = threshold
+
+    # MicroPython's compiler accepts const() without an import
+    import micropython
+    builtins.const = micropython.const
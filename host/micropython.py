@@ -0,0 +1,28 @@
+"""
+micropython.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host stand-in for the MicroPython micropython module.
+"""
+
+def const(value):
+    return value
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+def schedule(func, arg):
+    func(arg)
+
+def mem_info(verbose=False):
+    pass
+
+def native(func):
+    return func
+
+def viper(func):
+    return func
@@ -0,0 +1,54 @@
+"""
+motor_plant.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host stand-in for a Romi gearmotor and its encoder. The motor reads the
+duty and direction that a motor.Motor wrote to the pyb stand-ins, turns
+the wheel with first-order dynamics and writes the wheel angle into the
+encoder's timer counter.
+
+    d(speed)/dt = (gain * volts / 7.2 * drive - speed) / tau
+    drive = duty / 100 less the friction deadband (same sign)
+
+gain is the no-load wheel speed (rad/s) at 100% duty on a 7.2 V pack.
+volts can be changed while running to model the pack sagging.
+"""
+
+from math import pi
+
+NOMINAL_VOLTS = 7.2
+COUNTS_PER_RAD = 1440 / (2 * pi)
+
+def motor_output(motor):
+    # Signed duty (%) a motor driver last wrote.
+    duty = motor.PWM.pulse_width_percent()
+    return -duty if motor.DIR_pin.value() else duty
+
+class MotorPlant:
+    def __init__(self, motor, encoder, gain=25.0, tau=0.05, volts=NOMINAL_VOLTS, deadband=2.0):
+        # motor: motor.Motor, encoder: Encoder of the same wheel
+        # deadband: duty (%) lost to friction
+        self.motor = motor
+        self.encoder = encoder
+        self.gain = gain
+        self.tau = tau
+        self.volts = volts
+        self.deadband = deadband
+        self.speed = 0.0   # Wheel speed (rad/s)
+        self.angle = 0.0   # Wheel angle (rad)
+
+    def step(self, dt):
+        # Advances the wheel by dt seconds.
+        duty = motor_output(self.motor)
+        if abs(duty) <= self.deadband:
+            drive = 0.0
+        else:
+            drive = (duty - self.deadband if duty > 0 else duty + self.deadband) / 100
+        target = self.gain * self.volts / NOMINAL_VOLTS * drive
+        self.speed += (target - self.speed) * min(1.0, dt / self.tau)
+        self.angle += self.speed * dt
+        self.encoder.enc_timer.counter(round(self.angle * COUNTS_PER_RAD))
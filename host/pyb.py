@@ -0,0 +1,275 @@
+"""
+pyb.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host stand-in for the parts of the pyb module used by the Romi code.
+Hardware objects keep their state in plain attributes so host scripts
+can set sensor inputs and inspect outputs.
+"""
+
+from hostenv import clock
+
+def delay(ms):
+    clock.advance(ms * 1000)
+
+def udelay(us):
+    clock.advance(us)
+
+def millis():
+    return clock.us() // 1000
+
+def micros():
+    return clock.us()
+
+def elapsed_millis(start):
+    return millis() - start
+
+def disable_irq():
+    return True
+
+def enable_irq(state=True):
+    pass
+
+def repl_uart(uart=None):
+    pass
+
+class Pin:
+    IN = 0
+    OUT_PP = 1
+    OUT_OD = 2
+    AF_PP = 3
+    AF_OD = 4
+    ANALOG = 5
+    PULL_NONE = 0
+    PULL_UP = 1
+    PULL_DOWN = 2
+    OUT = OUT_PP
+    watchers = {}  # Pin name -> callback(value), for host devices wired to a pin
+
+    def __init__(self, pin, mode=None, pull=None, value=None, af=None):
+        self._name = pin._name if isinstance(pin, Pin) else pin
+        self.mode = mode
+        self.pull = pull
+        self._value = 0 if value is None else value
+
+    def name(self):
+        return self._name
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._set(1 if value else 0)
+
+    def high(self):
+        self._set(1)
+
+    def low(self):
+        self._set(0)
+
+    def _set(self, value):
+        self._value = value
+        watcher = Pin.watchers.get(self._name)
+        if watcher is not None:
+            watcher(value)
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+class ADC:
+    # 12-bit ADC; host scripts set .value (or register by pin name).
+    by_pin = {}
+
+    def __init__(self, pin):
+        self.pin = Pin(pin)
+        self.value = 0
+        self.reads = 0
+        ADC.by_pin[self.pin.name()] = self
+
+    def read(self):
+        self.reads += 1
+        return self.value
+
+class TimerChannel:
+    def __init__(self, timer, channel, mode, pin=None):
+        self.timer = timer
+        self.channel_num = channel
+        self.mode = mode
+        self.pin = pin
+        self._compare = 0
+
+    def pulse_width(self, value=None):
+        if value is None:
+            return self._compare
+        self._compare = int(value)
+
+    def pulse_width_percent(self, value=None):
+        period = self.timer.period() + 1
+        if value is None:
+            return self._compare * 100 / period
+        self._compare = int(value * period / 100)
+
+    def capture(self, value=None):
+        return self.pulse_width(value)
+
+    def compare(self, value=None):
+        return self.pulse_width(value)
+
+    def callback(self, fun):
+        pass
+
+class Timer:
+    PWM = 0
+    PWM_INVERTED = 1
+    OC_TIMING = 2
+    IC = 3
+    ENC_A = 4
+    ENC_B = 5
+    ENC_AB = 6
+    UP = 0
+    DOWN = 1
+    CENTER = 2
+    SOURCE_FREQ = 80_000_000
+
+    def __init__(self, num, freq=None, prescaler=0, period=0xFFFF):
+        self.num = num
+        self._channels = {}
+        self._callback = None
+        self._counter = 0
+        self.init(freq=freq, prescaler=prescaler, period=period)
+
+    def init(self, freq=None, prescaler=0, period=0xFFFF):
+        if freq is not None:
+            self._prescaler = 0
+            self._period = int(self.SOURCE_FREQ // freq) - 1
+            self._freq = freq
+        else:
+            self._prescaler = prescaler
+            self._period = period
+            self._freq = self.SOURCE_FREQ / ((prescaler + 1) * (period + 1))
+
+    def channel(self, channel, mode=None, pin=None, **kwargs):
+        if mode is None:
+            return self._channels.get(channel)
+        ch = TimerChannel(self, channel, mode, pin)
+        self._channels[channel] = ch
+        return ch
+
+    def counter(self, value=None):
+        if value is None:
+            return self._counter
+        self._counter = int(value) & self._period
+
+    def period(self, value=None):
+        if value is None:
+            return self._period
+        self._period = value
+
+    def prescaler(self, value=None):
+        if value is None:
+            return self._prescaler
+        self._prescaler = value
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self.init(freq=value)
+
+    def callback(self, fun):
+        self._callback = fun
+        if fun is None:
+            clock.remove_timer(self)
+        else:
+            clock.add_timer(self)
+
+    def deinit(self):
+        self.callback(None)
+
+class I2C:
+    # Memory transfers go to host devices registered with attach(); each
+    # device implements read(memaddr, nbytes) -> bytes and write(memaddr, data).
+    MASTER = 0
+    SLAVE = 1
+    devices = {}
+
+    def __init__(self, bus, mode=MASTER, baudrate=400000, addr=0x12):
+        self.bus = bus
+        self.baudrate = baudrate
+        self.transactions = 0
+        self.bytes = 0
+
+    @classmethod
+    def attach(cls, bus, addr, device):
+        cls.devices[(bus, addr)] = device
+
+    def _device(self, addr):
+        device = I2C.devices.get((self.bus, addr))
+        if device is None:
+            raise OSError(5)  # EIO: no ACK
+        return device
+
+    def mem_read(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        device = self._device(addr)
+        nbytes = data if isinstance(data, int) else memoryview(data).nbytes
+        payload = device.read(memaddr, nbytes)
+        self.transactions += 1
+        self.bytes += nbytes
+        if isinstance(data, int):
+            return bytes(payload)
+        memoryview(data).cast('B')[:] = payload
+
+    def mem_write(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        device = self._device(addr)
+        payload = bytes([data]) if isinstance(data, int) else bytes(memoryview(data).cast('B'))
+        device.write(memaddr, payload)
+        self.transactions += 1
+        self.bytes += len(payload)
+
+    def bus_time_us(self):
+        # Approximate time on the wire: start, two address bytes, register
+        # byte, repeated start and stop per transaction, 9 bits per byte.
+        bits = self.transactions * (3 * 9 + 3) + self.bytes * 9
+        return bits * 1_000_000 / self.baudrate
+
+class ExtInt:
+    IRQ_RISING = 0
+    IRQ_FALLING = 1
+    IRQ_RISING_FALLING = 2
+    instances = []
+
+    def __init__(self, pin, mode, pull, callback):
+        self.pin = Pin(pin)
+        self.mode = mode
+        self.callback = callback
+        ExtInt.instances.append(self)
+
+    def line(self):
+        return len(ExtInt.instances) - 1
+
+    def enable(self):
+        pass
+
+    def disable(self):
+        pass
+
+    def swint(self):
+        self.callback(self.line())
+
+class UART:
+    def __init__(self, bus, baudrate=9600, timeout=0, **kwargs):
+        self.bus = bus
+        self.baudrate = baudrate
+        self.sent = bytearray()
+
+    def write(self, data):
+        self.sent.extend(data)
+        return len(data)
+
+    def any(self):
+        return 0
+
+    def read(self, n=None):
+        return None
@@ -0,0 +1,397 @@
+"""
+replay_capture.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Replays an input capture (input_capture.py) through the unmodified
+LineSensorDriver, LineSampler, Encoder, BNO055, IMUService and PID_value
+code on a PC. The drivers are built as main.py builds them, from the
+capture header, and their hardware is replaced by replay stand-ins: every
+ADC read, encoder counter, BNO055 register read and ticks_us() in the
+hooked modules returns the next recorded value. The captured calls run in
+recorded order, sampler interrupts where they fell, so the same code
+computes the same outputs it did on the robot, with nothing sleeping in
+between.
+
+The stand-ins check each event against the read asking for it. A driver
+that reads differently from the captured code (a new read, a skipped one,
+another register) stops the replay with the event index, which marks the
+first point the two versions part ways.
+
+Outputs, one row per captured call, in order:
+    line     scaled line error put in init.line_error
+    pid      left and right effort, and the error, P, I and D terms
+    imu      heading and yaw rate (1/16 degree), calibration status byte
+    encoder  index, position (counts), delta, dt (us)
+    bump     ExtInt line
+written to CSV with exact float reprs, so two replays (or a replay and a
+previous version's output) can be diffed; compare= reports the first
+differing row. The summary gives a CRC of the rows and the replay rate
+against the captured run time, for use as a performance regression corpus.
+
+Usage:
+    python host/replay_capture.py capture.bin [out.csv] [compare=old.csv]
+Exits non-zero if the replay diverges or differs from compare=.
+"""
+
+import sys
+import csv
+import zlib
+from struct import unpack_from, calcsize
+from time import perf_counter
+
+import hostenv
+hostenv.install()
+
+import init
+import state
+import PID_controller
+from PID_controller import PID_value
+from linesensor import LineSensorDriver, ERROR_ONE
+from line_sampler import LineSampler, ADCBackend
+from encoder import Encoder
+from imu import BNO055
+from imu_service import IMUService
+from input_capture import (MAGIC, VERSION, HEADER_FMT, GAINS_FMT, STATE_FMT, HOOKED, SIZES, EVENT_NAMES,
+                           OPT_FIXED_POINT, OPT_TRACKING, OPT_SAMPLER, OPT_BRIGHTNESS,
+                           EV_TIME, EV_CALL, EV_SAMPLE, EV_FRAME, EV_BUMP, EV_ADC, EV_COUNTER, EV_I2C,
+                           CALL_LINE, CALL_PID, CALL_IMU, CALL_LEFT_ENC, CALL_RIGHT_ENC, CALL_NAMES,
+                           FLAG_STATE_INPUT, FLAG_MOTION_ACTIVE, FLAG_OVERRIDE_MODE, sampler_layout)
+
+TICKS_PERIOD = 1 << 30
+
+class ReplayError(Exception):
+    pass
+
+class EndOfCapture(Exception):
+    pass
+
+# Output rows, shared with host/check_replay.py so live and replayed runs compare
+def line_row():
+    return ('line', repr(init.line_error.peek()))
+
+def pid_row():
+    return ('pid', init.left_effort.peek(), init.right_effort.peek()) + tuple(
+        repr(v) for v in unpack_from('<4f', PID_controller.telemetry))
+
+def imu_row(service):
+    return ('imu', service.heading_raw, service.yaw_rate_raw, service.calib_stat)
+
+def encoder_row(index, enc):
+    return ('encoder', index, enc.position, enc.delta, enc.dt)
+
+class ReplayADC:
+    def __init__(self, replay, index):
+        self.replay = replay
+        self.index = index
+
+    def read(self):
+        off = self.replay.pop(EV_ADC)
+        data = self.replay.data
+        if data[off] != self.index:
+            self.replay.diverged("ADC read of channel %d, captured channel %d" % (self.index, data[off]))
+        return unpack_from('<H', data, off + 1)[0]
+
+class ReplayTimer:
+    def __init__(self, replay, index):
+        self.replay = replay
+        self.index = index
+
+    def counter(self):
+        off = self.replay.pop(EV_COUNTER)
+        data = self.replay.data
+        if data[off] != self.index:
+            self.replay.diverged("counter of encoder %d, captured encoder %d" % (self.index, data[off]))
+        return unpack_from('<H', data, off + 1)[0]
+
+class ReplayI2C:
+    def __init__(self, replay):
+        self.replay = replay
+
+    def mem_read(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        replay = self.replay
+        off = replay.pop(EV_I2C)
+        raw = replay.data
+        reg, n, width = raw[off], raw[off + 1], raw[off + 2]
+        if reg != memaddr or n != len(data):
+            replay.diverged("I2C read of %d items at 0x%02X, captured %d at 0x%02X" % (len(data), memaddr, n, reg))
+        fmt = '<B' if width == 1 else '<h'
+        for k in range(n):
+            data[k] = unpack_from(fmt, raw, off + 3 + k * width)[0]
+
+    def mem_write(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        pass
+
+class Replay:
+    def __init__(self, data):
+        self.data = data
+        magic, version, n, options, window = unpack_from(HEADER_FMT, data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not an input capture (magic %r, version %d)" % (magic, version))
+        pos = calcsize(HEADER_FMT)
+        kp, ki, kd, tf, base_speed, yaw_sign, calib_every = unpack_from(GAINS_FMT, data, pos)
+        pos += calcsize(GAINS_FMT)
+        black = unpack_from('<%dd' % n, data, pos)
+        pos += 8 * n
+        white = unpack_from('<%dd' % n, data, pos)
+        pos += 8 * n
+        snapshot = unpack_from(STATE_FMT, data, pos)
+        pos += calcsize(STATE_FMT)
+        self.options = options
+        self.num_channels = n
+
+        # Line sensor driver and sampler, as main.py builds them
+        pins = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3', 'PA5', 'PA6', 'PB1', 'PC5', 'PA2', 'PA3'][:n]
+        driver = LineSensorDriver(line_pins=pins, brightness_pin='PC2' if options & OPT_BRIGHTNESS else None,
+                                  window_size=window, fixed_point=bool(options & OPT_FIXED_POINT),
+                                  tracking=bool(options & OPT_TRACKING))
+        driver.load_calibration(black, white)
+        driver.last_time = snapshot[0]
+        for i in range(n):
+            driver.adc_line[i] = ReplayADC(self, i)
+        if driver.adc_brightness:
+            driver.adc_brightness = ReplayADC(self, n)
+        self.driver = driver
+        self.sampler = None
+        if options & OPT_SAMPLER:
+            layout = sampler_layout(n)
+            values = unpack_from(layout, data, pos)
+            pos += calcsize(layout)
+            sampler = LineSampler(ADCBackend(driver.adc_line, driver.adc_brightness))
+            size = n + 1
+            for k in range(size):
+                sampler.frames[0][k] = values[k]
+                sampler.frames[1][k] = values[size + k]
+            (sampler.stamps[0], sampler.stamps[1], sampler.front, sampler.lo, sampler.hi,
+             sampler.seq) = values[2 * size:]
+            driver.attach_sampler(sampler)
+            read = sampler.read
+            def frame(values):
+                self.pop(EV_FRAME)
+                return read(values)
+            sampler.read = frame
+            self.sampler = sampler
+
+        # Encoders
+        self.encoders = (Encoder(tim=1, chA_pin='PA9', chB_pin='PA8'), Encoder(tim=8, chA_pin='PC7', chB_pin='PC6'))
+        for index, enc in enumerate(self.encoders):
+            enc.enc_timer = ReplayTimer(self, index)
+            enc.prev_count, enc.position, enc.last_time = snapshot[1 + 3 * index:4 + 3 * index]
+
+        # BNO055 and its service
+        imu = BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1, wait=False)
+        imu.i2c = ReplayI2C(self)
+        imu.mode = imu.NDOF_MODE
+        imu.ready = True
+        self.imu_service = IMUService(imu, calib_every=calib_every, yaw_sign=yaw_sign)
+        self.imu_service.stamp, self.imu_service.seq, self.imu_service._runs = snapshot[7:10]
+
+        # PID controller with the captured gains
+        PID_controller.Kp = kp
+        PID_controller.Ki = ki
+        PID_controller.Kd = kd
+        PID_controller.Tf = tf
+        PID_controller.base_speed = int(round(base_speed))
+        self.pid = PID_value()
+
+        # Every ticks_us() in the hooked modules comes from the capture
+        for name in HOOKED:
+            module = sys.modules.get(name)
+            if module is not None:
+                module.ticks_us = self.ticks_us
+
+        self.start = pos
+        self.pos = pos
+        self.events = 0
+        self.counts = [0] * len(SIZES)
+        self.calls = [0] * len(CALL_NAMES)
+        self.first_time = None
+        self.last_time = None
+        self.rows = []
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+    def diverged(self, message):
+        raise ReplayError("event %d: %s" % (self.events, message))
+
+    def _next(self):
+        # Returns (source, payload offset) of the next event.
+        data = self.data
+        pos = self.pos
+        if pos >= len(data):
+            raise EndOfCapture()
+        source = data[pos]
+        if source >= len(SIZES):
+            self.diverged("unknown event source %d at byte %d" % (source, pos))
+        end = pos + 1 + SIZES[source]
+        if source == EV_I2C and end <= len(data):
+            end += data[pos + 2] * data[pos + 3]
+        if end > len(data):
+            raise EndOfCapture()
+        self.pos = end
+        self.events += 1
+        self.counts[source] += 1
+        return source, pos + 1
+
+    def pop(self, source):
+        # Payload offset of the next event, which must come from source.
+        # Interrupts recorded before it run first, where they fell.
+        while True:
+            found, off = self._next()
+            if found == EV_SAMPLE:
+                self._interrupt()
+            elif found == EV_BUMP:
+                self._bump(off)
+            elif found != source:
+                self.diverged("code read %s, capture has %s" % (EVENT_NAMES[source], EVENT_NAMES[found]))
+            else:
+                return off
+
+    def ticks_us(self):
+        t = unpack_from('<I', self.data, self.pop(EV_TIME))[0]
+        if self.first_time is None:
+            self.first_time = t
+        self.last_time = t
+        return t
+
+    def _interrupt(self):
+        if self.sampler is None:
+            self.diverged("sampler interrupt without a sampler")
+        self.sampler._sample(None)
+
+    def _bump(self, off):
+        state.ints[state.BUMP] = 1
+        self.rows.append(('bump', self.data[off]))
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+    def _line(self):
+        # The body of main.py's task_linesensor_wrapper.
+        driver = self.driver
+        if driver.fixed_point:
+            error_q, _ = driver.line_reading_fixed()
+            scaled_error = error_q / ERROR_ONE
+        else:
+            scaled_error, _ = driver.line_reading()
+        init.line_error.put(scaled_error, driver.last_time if self.sampler else None)
+        self.rows.append(line_row())
+
+    def _pid(self, flags):
+        ints = state.ints
+        ints[state.STATE_INPUT] = 1 if flags & FLAG_STATE_INPUT else 0
+        ints[state.MOTION_ACTIVE] = 1 if flags & FLAG_MOTION_ACTIVE else 0
+        ints[state.OVERRIDE_MODE] = 1 if flags & FLAG_OVERRIDE_MODE else 0
+        next(self.pid)
+        self.rows.append(pid_row())
+
+    def _call(self, call, flags):
+        self.calls[call] += 1
+        if call == CALL_LINE:
+            self._line()
+        elif call == CALL_PID:
+            self._pid(flags)
+        elif call == CALL_IMU:
+            self.imu_service.refresh()
+            self.rows.append(imu_row(self.imu_service))
+        elif call in (CALL_LEFT_ENC, CALL_RIGHT_ENC):
+            index = call - CALL_LEFT_ENC
+            self.encoders[index].update()
+            self.rows.append(encoder_row(index, self.encoders[index]))
+        else:
+            self.diverged("unknown call %d" % call)
+
+    def run(self):
+        # Replays every event; returns True if the capture ended cleanly
+        # (False if it stops inside a call, e.g. after a buffer overflow).
+        data = self.data
+        while True:
+            try:
+                source, off = self._next()
+            except EndOfCapture:
+                return True
+            try:
+                if source == EV_CALL:
+                    self._call(data[off], data[off + 1])
+                elif source == EV_SAMPLE:
+                    self._interrupt()
+                elif source == EV_BUMP:
+                    self._bump(off)
+                else:
+                    self.diverged("%s event outside a captured call" % EVENT_NAMES[source])
+            except EndOfCapture:
+                return False
+
+    def run_seconds(self):
+        # Span of the captured ticks_us() values.
+        if self.first_time is None:
+            return 0.0
+        return ((self.last_time - self.first_time) % TICKS_PERIOD) / 1e6
+
+def write_rows(path, rows):
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return [tuple(row) for row in csv.reader(f)]
+
+def compare_rows(rows, other):
+    # Returns None if equal, else a description of the first difference.
+    rows = [tuple(str(v) for v in row) for row in rows]
+    for k, (a, b) in enumerate(zip(rows, other)):
+        if a != b:
+            return "row %d: %s != %s" % (k, ",".join(a), ",".join(b))
+    if len(rows) != len(other):
+        return "%d rows != %d rows" % (len(rows), len(other))
+    return None
+
+def digest(rows):
+    return zlib.crc32("\n".join(",".join(str(v) for v in row) for row in rows).encode())
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('compare=')]
+    compare = [a[8:] for a in sys.argv[1:] if a.startswith('compare=')]
+    if not args:
+        raise SystemExit(__doc__)
+    with open(args[0], 'rb') as f:
+        data = f.read()
+
+    replay = Replay(data)
+    start = perf_counter()
+    failure = None
+    try:
+        complete = replay.run()
+    except ReplayError as e:
+        complete = False
+        failure = str(e)
+    wall = perf_counter() - start
+
+    print("%d events (%s)" % (replay.events, ", ".join(
+        "%s %d" % (name, count) for name, count in zip(EVENT_NAMES, replay.counts) if count)))
+    print("calls: %s" % ", ".join("%s %d" % (name, count) for name, count in zip(CALL_NAMES, replay.calls)))
+    run_s = replay.run_seconds()
+    print("replayed %.2f s of captured run in %.3f s (%.0fx, %.0f events/s)" % (
+        run_s, wall, run_s / wall if wall else 0, replay.events / wall if wall else 0))
+    print("%d output rows, crc32 %08x" % (len(replay.rows), digest(replay.rows)))
+    if failure:
+        print("replay diverged at %s" % failure)
+    elif not complete:
+        print("capture ends inside a call (overflowed or cut short); replayed up to it")
+
+    if len(args) > 1:
+        write_rows(args[1], replay.rows)
+        print("outputs written to %s" % args[1])
+    if compare:
+        difference = compare_rows(replay.rows, read_rows(compare[0]))
+        print("compare %s: %s" % (compare[0], "identical" if difference is None else difference))
+        if difference is not None:
+            failure = failure or difference
+    sys.exit(1 if failure else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+sim_track.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Faster-than-real-time simulator of Romi on the game track. main.py is
+imported unchanged, so the whole task graph it builds (line sensor and
+sampler, PID, speed loops, odometry, IMU service, mission, battery,
+recorder, profiler) runs under the cotask stand-in on the virtual clock.
+The pyb, task_share and cotask stand-ins play the hardware:
+
+- Line sensors: every ADC read of a line channel is the reflectance of the
+  rasterized Game_Track.pdf (track_map.py) under that sensor, turned into
+  QTR counts, with optional noise. A calibration profile for the same
+  counts is written first, so main.py warm starts without prompts.
+- Wheels: a motor_plant.MotorPlant per wheel reads the duty main.py's
+  motors wrote, turns the wheel and writes the encoder counter; the robot
+  moves as a differential drive on the wheel speeds.
+- BNO055: the fake sensor's heading and yaw rate follow the robot.
+- Bumpers: running the front of the chassis into one of the track's
+  obstacles (the grid posts and the wall) fires the bump sensor interrupt
+  once and stops the robot there. Sides and back pass through.
+- Battery: the PC4 divider reads the plant's pack voltage.
+
+Each task run costs its TASK_COST_US of virtual time (MicroPython
+estimates); idle time jumps straight to the next task or timer due, so a
+lap takes seconds. The run ends at the finish (CP#6 after CP#5), when the
+robot leaves the mat, when the mission is done and the robot has stopped,
+or at the time limit. Checkpoints count in order when the robot centre
+comes within CP_RADIUS of the dot. The report also gives the line section
+time (the mission's first phase) and the mean cross-track error, the
+distance from the sensor row centre to the line sampled every 10 ms while
+the robot follows the line. run(gains=...) writes a gain table
+(gain_table.py) for main.py to load; host/tune_line.py sweeps it.
+
+Geometry that is not in the repo (sensor position and pitch, the QTR
+counts, robot radius) is set below; the robot starts on CP#6 facing along
+the line (+x).
+
+Usage:
+    python host/sim_track.py [seconds] [seed=N] [module.NAME=value ...] [--help]
+    e.g. python host/sim_track.py 90 PID_controller.Kp=12 PID_controller.base_speed=22
+"""
+
+import io
+import os
+import ast
+import sys
+import random
+import tempfile
+import importlib
+from contextlib import redirect_stdout
+from math import cos, sin, degrees, hypot
+from time import perf_counter
+
+import hostenv
+hostenv.install()
+from hostenv import clock
+clock.use_virtual()
+
+from time import ticks_us, ticks_diff
+import pyb
+from pyb import ADC, ExtInt
+from fake_bno055 import FakeBNO055
+from motor_plant import MotorPlant, NOMINAL_VOLTS
+from track_map import TrackMap
+import calib_profile
+import gain_table
+import state
+from battery_monitor import DIVIDER, ADC_VREF, ADC_FULL
+
+WHEEL_RADIUS = 0.035
+TRACK_WIDTH = 0.141
+ROBOT_RADIUS = 0.0825     # Romi chassis (m)
+BUMPER_MARGIN = 0.02      # Obstacles closer to the side than this miss the bumpers (m)
+SENSOR_AHEAD = 0.05      # Line sensor row ahead of the wheel axle (m)
+SENSOR_PITCH = 0.008      # Every other channel of the 4 mm, 13 channel QTR (m); channel 1 on the right
+SENSOR_SPOT = 0.0015      # Half width of the patch each sensor sees (m)
+LINE_PINS = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
+BATTERY_PIN = 'PC4'
+RAW_WHITE = 250           # QTR counts over white mat
+RAW_BLACK = 3300          # QTR counts over the line
+INK = 33 / 255            # Reflectance of the line ink in the map
+START_HEADING = 90.0      # BNO055 heading at the start (degrees)
+CP_RADIUS = 0.05          # Checkpoint reached within this distance (m)
+STOPPED_MS = 1000         # Mission done and wheels still this long ends the run
+PLANT_STEP_US = 1000      # Longest plant step while idle
+OFFSET_PERIOD_US = 10000  # Cross-track error sampling period
+OFFSET_RANGE = 0.04       # Farthest line searched for across the sensor row (m); further counts as this
+OFFSET_STEP = 0.002
+
+# Virtual time per task run (us), MicroPython estimates; others DEFAULT_COST_US
+TASK_COST_US = {
+    "Mission": 60,
+    "Motion": 250,
+    "Line Sensor": 900,
+    "IMU Service": 700,
+    "PID Controller": 400,
+    "Left Speed": 250,
+    "Right Speed": 250,
+    "Motors": 300,
+    "Encoder Update": 600,
+    "Battery": 300,
+    "Recorder": 200,
+    "Profiler": 50,
+    "GC": 40,
+}
+DEFAULT_COST_US = 200
+
+class World:
+    # Robot pose on the track and the sensors that follow it.
+    def __init__(self, track, volts=NOMINAL_VOLTS, noise=0.0, seed=0):
+        self.track = track
+        self.volts = volts
+        self.noise = noise
+        self.rng = random.Random(seed)
+        name, self.x, self.y = [cp for cp in track.checkpoints if cp[0] == 'CP#6'][0]
+        self.theta = 0.0          # Counter-clockwise from +x (rad)
+        self.omega = 0.0
+        self.speed = 0.0
+        self.plants = None
+        self.bno = None
+        self.last = clock.us()
+        self.contact = False
+        self.bumps = 0
+        self.off_mat = False
+        self.next_cp = 0
+        self.cp_times = []        # (name, virtual us)
+        self.offset_sum = 0.0     # Cross-track error samples while following the line
+        self.offset_count = 0
+        self.next_offset = self.last
+        self.channels = {pin: k for k, pin in enumerate(LINE_PINS)}
+        self.adc_battery = round(volts / DIVIDER / ADC_VREF * ADC_FULL)
+
+    def sensor_counts(self, k):
+        # QTR counts of line channel k (0 = rightmost) at the current pose.
+        offset = (k - (len(LINE_PINS) - 1) / 2) * SENSOR_PITCH
+        c = cos(self.theta)
+        s = sin(self.theta)
+        # Sensor row across the robot, ahead of the axle; channel 1 on the right
+        px = self.x + SENSOR_AHEAD * c + offset * s
+        py = self.y + SENSOR_AHEAD * s - offset * c
+        track = self.track
+        refl = (track.reflectance(px, py) + track.reflectance(px + SENSOR_SPOT, py)
+                + track.reflectance(px - SENSOR_SPOT, py) + track.reflectance(px, py + SENSOR_SPOT)
+                + track.reflectance(px, py - SENSOR_SPOT)) / 5
+        counts = RAW_WHITE + (RAW_BLACK - RAW_WHITE) * (1 - refl) / (1 - INK)
+        if self.noise:
+            counts += self.rng.gauss(0, self.noise)
+        return max(0, min(4095, int(counts)))
+
+    def line_offset(self):
+        # Distance (m) along the sensor row from its centre to the nearest line
+        # ink, OFFSET_RANGE if there is none within it.
+        c = cos(self.theta)
+        s = sin(self.theta)
+        px = self.x + SENSOR_AHEAD * c
+        py = self.y + SENSOR_AHEAD * s
+        reflectance = self.track.reflectance
+        threshold = (1 + INK) / 2
+        steps = int(OFFSET_RANGE / OFFSET_STEP)
+        for k in range(steps + 1):
+            d = k * OFFSET_STEP
+            if (reflectance(px + d * s, py - d * c) < threshold
+                    or reflectance(px - d * s, py + d * c) < threshold):
+                return d
+        return OFFSET_RANGE
+
+    def adc_read(self, adc):
+        # Stands in for pyb.ADC.read.
+        adc.reads += 1
+        name = adc.pin.name()
+        k = self.channels.get(name)
+        if k is not None:
+            return self.sensor_counts(k)
+        if name == BATTERY_PIN:
+            return self.adc_battery
+        return adc.value
+
+    def attach(self, main):
+        # Wires the plants to the motors and encoders main.py built.
+        self.plants = (MotorPlant(main.left_motor, main.left_enc, volts=self.volts),
+                       MotorPlant(main.right_motor, main.right_enc, volts=self.volts))
+        self.last = clock.us()
+
+    def _blocked(self, x, y, theta):
+        # True if an obstacle touches the front half of the chassis (the bumpers).
+        c = cos(theta)
+        s = sin(theta)
+        for x0, y0, x1, y1 in self.track.obstacles:
+            dx = min(max(x, x0), x1) - x
+            dy = min(max(y, y0), y1) - y
+            if dx * dx + dy * dy < ROBOT_RADIUS * ROBOT_RADIUS and dx * c + dy * s > BUMPER_MARGIN:
+                return True
+        return False
+
+    def step(self):
+        now = clock.us()
+        dt = (now - self.last) / 1e6
+        self.last = now
+        if dt <= 0 or self.plants is None:
+            return
+        left, right = self.plants
+        left.step(dt)
+        right.step(dt)
+        v = WHEEL_RADIUS * (left.speed + right.speed) / 2
+        self.omega = WHEEL_RADIUS * (right.speed - left.speed) / TRACK_WIDTH
+        theta = self.theta + self.omega * dt / 2
+        x = self.x + v * dt * cos(theta)
+        y = self.y + v * dt * sin(theta)
+        self.theta += self.omega * dt
+        if self._blocked(x, y, self.theta):
+            if not self.contact:
+                self.contact = True
+                self.bumps += 1
+                for ext in ExtInt.instances[:1]:
+                    ext.callback(ext.line())
+            self.speed = 0.0
+        else:
+            self.contact = False
+            self.x, self.y = x, y
+            self.speed = v
+        if not self.track.on_mat(self.x, self.y):
+            self.off_mat = True
+        self.bno.set_euler(START_HEADING - degrees(self.theta), 0, 0)
+        self.bno.set_gyro(0, 0, degrees(self.omega))
+        if now >= self.next_offset:
+            self.next_offset = now + OFFSET_PERIOD_US
+            if state.ints[state.STATE_INPUT] == 0:
+                self.offset_sum += self.line_offset()
+                self.offset_count += 1
+        checkpoints = self.track.checkpoints
+        if self.next_cp < len(checkpoints):
+            name, cx, cy = checkpoints[self.next_cp]
+            if hypot(self.x - cx, self.y - cy) <= CP_RADIUS:
+                self.cp_times.append((name, now))
+                self.next_cp += 1
+
+    @property
+    def finished(self):
+        return self.next_cp == len(self.track.checkpoints)
+
+def costly(gen, cost_us):
+    # Charges cost_us of virtual time for every run of a task generator.
+    while True:
+        state = next(gen)
+        clock.advance(cost_us)
+        yield state
+
+def override(assignments):
+    # Applies 'module.NAME=value' settings to imported modules. The value is a
+    # Python literal (text that is not one is taken as a string), converted to
+    # the type of the setting it replaces.
+    for assignment in assignments:
+        target, _, value = assignment.partition('=')
+        module_name, _, name = target.rpartition('.')
+        module = importlib.import_module(module_name)
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+        current = getattr(module, name)
+        setattr(module, name, value if current is None else type(current)(value))
+
+def run(seconds=120, overrides=(), seed=0, noise=0.0, volts=NOMINAL_VOLTS, track=None, quiet=True,
+        gains=None):
+    # Runs main.py on the track once. Only one run per process: main.py builds
+    # its tasks at import. gains: gain_table rows written to gains.txt for
+    # main.py to load. main.py's files go to a temporary directory, removed
+    # afterwards; the working directory is restored. Returns a dict of the outcome.
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='romi_sim_') as workdir:
+        os.chdir(workdir)
+        try:
+            return _run(seconds, overrides, seed, noise, volts, track or TrackMap(), quiet, gains)
+        finally:
+            os.chdir(cwd)
+
+def _run(seconds, overrides, seed, noise, volts, track, quiet, gains):
+    # Body of run(), in the working directory main.py uses.
+    world = World(track, volts=volts, noise=noise, seed=seed)
+    ink = 4096 - RAW_BLACK
+    paper = 4096 - RAW_WHITE
+    calib_profile.save('calib.bin', [ink] * len(LINE_PINS), [paper] * len(LINE_PINS),
+                       bytes(calib_profile.IMU_DATA_LEN), START_HEADING)
+    if gains:
+        gain_table.save('gains.txt', gains)
+    world.bno = FakeBNO055.attach(bus=1)
+    world.bno.set_euler(START_HEADING, 0, 0)
+    pyb.ADC.read = lambda adc: world.adc_read(adc)
+
+    log = io.StringIO()
+    start_wall = perf_counter()
+    with redirect_stdout(log if quiet else sys.stdout):
+        import main
+    override(overrides)
+    world.attach(main)
+    import cotask
+    for task in cotask.task_list.tasks():
+        task._run_gen = costly(task._run_gen, TASK_COST_US.get(task.name, DEFAULT_COST_US))
+
+    tasks = cotask.task_list.tasks()
+    start = clock.us()
+    end = start + int(seconds * 1e6)
+    stopped_since = None
+    outcome = "time limit"
+    with redirect_stdout(log if quiet else sys.stdout):
+        while clock.us() < end:
+            before = clock.us()
+            cotask.task_list.pri_sched()
+            if clock.us() == before:
+                now = ticks_us()
+                wait = min(ticks_diff(task._next_run, now) for task in tasks if task.period)
+                clock.advance(max(1, min(wait, PLANT_STEP_US)))
+            world.step()
+            if world.finished:
+                outcome = "finished"
+                break
+            if world.off_mat:
+                outcome = "left the mat"
+                break
+            if main.mission.done and abs(world.speed) < 1e-3:
+                stopped_since = stopped_since or clock.us()
+                if clock.us() - stopped_since >= STOPPED_MS * 1000:
+                    outcome = "stopped"
+                    break
+            else:
+                stopped_since = None
+    virtual_s = (clock.us() - start) / 1e6
+    wall_s = perf_counter() - start_wall
+    splits = main.mission.splits
+    line_s = ticks_diff(splits[1], splits[0]) / 1000 if main.mission.index >= 1 else None
+    return dict(outcome=outcome, virtual_s=virtual_s, wall_s=wall_s,
+                splits=[(name, (t - start) / 1e6) for name, t in world.cp_times],
+                distance=main.odometry.distance, bumps=world.bumps, line_s=line_s,
+                cross_track=world.offset_sum / world.offset_count if world.offset_count else 0.0,
+                pose=(world.x, world.y, degrees(world.theta)),
+                phase=main.mission.index, phase_name=main.mission.plan[main.mission.index][0],
+                log=log.getvalue())
+
+def report(result):
+    print("%-6s %9s %9s" % ("", "time", "split"))
+    last = 0.0
+    for name, t in result['splits']:
+        print("%-6s %7.2f s %7.2f s" % (name, t, t - last))
+        last = t
+    x, y, heading = result['pose']
+    if result['line_s'] is not None:
+        print("line section: %.2f s" % result['line_s'])
+    print("mean cross-track error: %.1f mm" % (result['cross_track'] * 1000))
+    print("outcome: %s after %.2f s (mission phase '%s', %.2f m travelled, %d bumps, at %.2f, %.2f m)"
+          % (result['outcome'], result['virtual_s'], result['phase_name'], result['distance'],
+             result['bumps'], x, y))
+    print("simulated %.1f s in %.1f s of wall time (%.1fx real time)"
+          % (result['virtual_s'], result['wall_s'], result['virtual_s'] / result['wall_s']))
+
+def main():
+    seconds = 120.0
+    seed = 0
+    overrides = []
+    for arg in sys.argv[1:]:
+        if arg in ('-h', '--help'):
+            print(__doc__)
+            return
+        if arg.startswith('seed='):
+            seed = int(arg[5:])
+        elif '=' in arg:
+            overrides.append(arg)
+        else:
+            try:
+                seconds = float(arg)
+            except ValueError:
+                raise SystemExit("unknown argument %r (--help for usage)" % arg)
+    report(run(seconds, overrides, seed=seed, noise=20.0 if seed else 0.0))
+
+if __name__ == "__main__":
+    main()
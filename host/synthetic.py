@@ -0,0 +1,31 @@
+"""
+synthetic.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Synthetic sensor sources for host scripts.
+
+Functionality:
+- SyntheticLineBackend is a drop-in for line_sampler.ADCBackend that asks
+  a Python function for each frame of raw ADC counts.
+"""
+
+from hostenv import clock
+
+class SyntheticLineBackend:
+    def __init__(self, num_channels, source, brightness=0):
+        # source(t_us, channel) returns the raw ADC count for that channel.
+        self.num_channels = num_channels
+        self.source = source
+        self.brightness = brightness
+        self.frames = 0
+
+    def read_into(self, frame, lo, hi):
+        now = clock.us()
+        for i in range(lo, hi):
+            frame[i] = self.source(now, i)
+        frame[self.num_channels] = self.brightness
+        self.frames += 1
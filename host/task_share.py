@@ -0,0 +1,100 @@
+"""
+task_share.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Host stand-in for the ME405 task_share module (Share and Queue).
+Mirrors the on-board implementation closely enough that relative
+timings measured on the host are meaningful.
+"""
+
+import array
+import pyb
+
+share_list = []
+
+class Queue:
+    def __init__(self, type_code, size, thread_protect=False, overwrite=False, name=None):
+        self._size = size
+        self._buffer = array.array(type_code, range(size))
+        self._thread_protect = thread_protect
+        self._overwrite = overwrite
+        self._name = str(name)
+        self.clear()
+        share_list.append(self)
+
+    def put(self, item, in_ISR=False):
+        if self.full() and not self._overwrite:
+            return
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq()
+        self._buffer[self._wr_idx] = item
+        self._wr_idx = (self._wr_idx + 1) % self._size
+        if self._num_items < self._size:
+            self._num_items += 1
+        else:
+            self._rd_idx = (self._rd_idx + 1) % self._size
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq(irq_state)
+
+    def get(self, in_ISR=False):
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq()
+        to_return = self._buffer[self._rd_idx]
+        if self._num_items > 0:
+            self._rd_idx = (self._rd_idx + 1) % self._size
+            self._num_items -= 1
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq(irq_state)
+        return to_return
+
+    def any(self):
+        return self._num_items > 0
+
+    def empty(self):
+        return self._num_items == 0
+
+    def full(self):
+        return self._num_items >= self._size
+
+    def num_in(self):
+        return self._num_items
+
+    def clear(self):
+        self._rd_idx = 0
+        self._wr_idx = 0
+        self._num_items = 0
+
+    def __repr__(self):
+        return '{:<12s} Queue<{:s}> Max: {:d}'.format(self._name, self._buffer.typecode, self._size)
+
+class Share:
+    def __init__(self, type_code, thread_protect=True, name=None):
+        self._buffer = array.array(type_code, [0])
+        self._thread_protect = thread_protect
+        self._name = str(name)
+        share_list.append(self)
+
+    def put(self, data, in_ISR=False):
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq()
+        self._buffer[0] = data
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq(irq_state)
+
+    def get(self, in_ISR=False):
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq()
+        to_return = self._buffer[0]
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq(irq_state)
+        return to_return
+
+    def __repr__(self):
+        return '{:<12s} Share<{:s}>'.format(self._name, self._buffer.typecode)
+
+def show_all():
+    return '\n'.join(repr(item) for item in share_list)
@@ -0,0 +1,419 @@
+"""
+track_map.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Rasterized game track for the host simulator. Reads the page content of
+Game_Track.pdf (a vector drawing, one Flate-compressed content stream),
+runs the path operators through a small PDF graphics interpreter and
+paints the strokes and fills into a reflectance map: 255 over white mat,
+about 35 over the ink of the line.
+
+Functionality:
+- The drawing is at full scale, 72 pt per inch: the 5184 x 2592 pt page
+  is the 6 x 3 ft mat and the line is 3/8 in wide.
+- Handles the operators the track uses: q/Q/cm, w/d, the colour operators
+  (gray level = luminance), m/l/c/v/y/h/re, S/s/f/F/f*/B/b/n and the text
+  position operators. Stroke dashes are applied; caps and joins are round.
+  Text is not painted.
+- checkpoints: the filled dots labelled CP#1..CP#6, in label order, as
+  (name, x, y) in metres. obstacles: the ink rectangles (the grid posts
+  and the wall) as (x0, y0, x1, y1) in metres. Coordinates have x along
+  the page to the right and y up the page, origin at the lower left.
+- TrackMap(res) rasterizes at res pt per cell (2 pt by default, 0.7 mm);
+  reflectance(x, y) returns 0..1 at a point in metres, 0 off the mat.
+
+Usage:
+    track = TrackMap()
+    track.reflectance(0.2, 0.8)
+"""
+
+import os
+import re
+import zlib
+from math import ceil, floor, hypot, sqrt
+
+PDF_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Game_Track.pdf')
+METERS_PER_PT = 0.0254 / 72
+BEZIER_STEPS = 16
+
+def page_content(path=PDF_PATH):
+    # Returns the decompressed content stream of the first page.
+    data = open(path, 'rb').read()
+
+    def obj(num):
+        match = re.search(rb'(?<![0-9])%d 0 obj' % num, data)
+        if match is None:
+            raise ValueError("object %d not found" % num)
+        return match.end()
+
+    start = data.index(b'/Type/Page>>') if b'/Type/Page>>' in data else data.index(b'/Type /Page')
+    page = data[data.rindex(b'obj', 0, start):start]
+    contents = int(re.search(rb'/Contents (\d+) 0 R', page).group(1))
+    at = obj(contents)
+    head_end = data.index(b'stream', at)
+    head = data[at:head_end]
+    length = int(re.search(rb'/Length (\d+)', head).group(1))
+    body = head_end + len(b'stream')
+    while data[body:body + 1] in (b'\r', b'\n'):
+        body += 1
+    stream = data[body:body + length]
+    return zlib.decompress(stream) if b'FlateDecode' in head else stream
+
+DELIMITERS = b'()<>[]{}/%'
+WHITESPACE = b' \t\r\n\f\x00'
+
+def tokens(content):
+    # Yields operands (float, name str, bytes string, list) and operators (Op).
+    i = 0
+    n = len(content)
+    stack = [[]]
+    while i < n:
+        c = content[i:i + 1]
+        if c in WHITESPACE:
+            i += 1
+        elif c == b'%':
+            while i < n and content[i:i + 1] not in b'\r\n':
+                i += 1
+        elif c == b'(':
+            depth = 1
+            i += 1
+            out = bytearray()
+            while i < n and depth:
+                ch = content[i:i + 1]
+                if ch == b'\\':
+                    out += content[i + 1:i + 2]
+                    i += 2
+                    continue
+                depth += ch == b'('
+                depth -= ch == b')'
+                if depth:
+                    out += ch
+                i += 1
+            stack[-1].append(bytes(out))
+        elif c == b'<':
+            end = content.index(b'>', i)
+            stack[-1].append(bytes.fromhex(content[i + 1:end].decode()))
+            i = end + 1
+        elif c == b'[':
+            stack.append([])
+            i += 1
+        elif c == b']':
+            array = stack.pop()
+            stack[-1].append(array)
+            i += 1
+        else:
+            j = i + 1
+            while j < n and content[j:j + 1] not in WHITESPACE and content[j:j + 1] not in DELIMITERS:
+                j += 1
+            word = content[i:j].decode('latin-1')
+            i = j
+            if word.startswith('/'):
+                stack[-1].append(word)
+            else:
+                try:
+                    stack[-1].append(float(word))
+                except ValueError:
+                    if len(stack) == 1:
+                        yield stack[0], word
+                        stack[0] = []
+                    else:
+                        stack[-1].append(word)
+
+def multiply(m, n):
+    # PDF matrix product m x n, matrices as (a, b, c, d, e, f).
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D,
+            e * A + f * C + E, e * B + f * D + F)
+
+def luminance(components):
+    if len(components) == 1:
+        return components[0]
+    if len(components) == 3:
+        r, g, b = components
+        return 0.299 * r + 0.587 * g + 0.114 * b
+    if len(components) == 4:
+        c, m, y, k = components
+        return (1 - min(1, c + k)) * 0.299 + (1 - min(1, m + k)) * 0.587 + (1 - min(1, y + k)) * 0.114
+    return 0.0
+
+def bezier(p0, p1, p2, p3):
+    # Points along a cubic Bezier, p0 excluded.
+    points = []
+    for k in range(1, BEZIER_STEPS + 1):
+        t = k / BEZIER_STEPS
+        u = 1 - t
+        points.append((u * u * u * p0[0] + 3 * u * u * t * p1[0] + 3 * u * t * t * p2[0] + t * t * t * p3[0],
+                       u * u * u * p0[1] + 3 * u * u * t * p1[1] + 3 * u * t * t * p2[1] + t * t * t * p3[1]))
+    return points
+
+def dashed(points, closed, dash, phase):
+    # Splits a polyline into the "on" pieces of a dash pattern.
+    if closed and points[0] != points[-1]:
+        points = points + [points[0]]
+    if not dash or sum(dash) <= 0:
+        return [points]
+    index = 0
+    left = dash[0]
+    phase %= sum(dash)
+    while phase > 0:
+        step = min(phase, left)
+        phase -= step
+        left -= step
+        if left <= 0:
+            index = (index + 1) % len(dash)
+            left = dash[index]
+    pieces = []
+    current = [points[0]] if index % 2 == 0 else None
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = hypot(x1 - x0, y1 - y0)
+        at = 0.0
+        while length - at > left:
+            at += left
+            t = at / length
+            point = (x0 + (x1 - x0) * t, y0 + (y1 - y0) * t)
+            if current is not None:
+                current.append(point)
+                pieces.append(current)
+                current = None
+            else:
+                current = [point]
+            index = (index + 1) % len(dash)
+            left = dash[index]
+        left -= length - at
+        if current is not None:
+            current.append((x1, y1))
+    if current is not None and len(current) > 1:
+        pieces.append(current)
+    return pieces
+
+class TrackMap:
+    def __init__(self, res=2.0, path=PDF_PATH):
+        self.res = res
+        content = page_content(path)
+        self.width_pt, self.height_pt = 5184.0, 2592.0
+        self.cols = int(ceil(self.width_pt / res))
+        self.rows = int(ceil(self.height_pt / res))
+        self.pixels = bytearray(b'\xff') * (self.cols * self.rows)
+        self.width = self.width_pt * METERS_PER_PT
+        self.height = self.height_pt * METERS_PER_PT
+        self._dots = []
+        self._labels = []
+        self.obstacles = []
+        self._run(content)
+        self.checkpoints = self._checkpoints()
+
+    # Painting (page coordinates in pt)
+
+    def _paint_segment(self, x0, y0, x1, y1, half, value):
+        res = self.res
+        cols = self.cols
+        pixels = self.pixels
+        dx = x1 - x0
+        dy = y1 - y0
+        length2 = dx * dx + dy * dy
+        c0 = max(0, int(floor((min(x0, x1) - half) / res)))
+        c1 = min(cols - 1, int(ceil((max(x0, x1) + half) / res)))
+        r0 = max(0, int(floor((min(y0, y1) - half) / res)))
+        r1 = min(self.rows - 1, int(ceil((max(y0, y1) + half) / res)))
+        limit = max(half, res / 2) ** 2
+        for row in range(r0, r1 + 1):
+            py = (row + 0.5) * res
+            base = row * cols
+            for col in range(c0, c1 + 1):
+                px = (col + 0.5) * res
+                if length2:
+                    t = ((px - x0) * dx + (py - y0) * dy) / length2
+                    t = 0.0 if t < 0 else 1.0 if t > 1 else t
+                    ex = x0 + dx * t - px
+                    ey = y0 + dy * t - py
+                else:
+                    ex = x0 - px
+                    ey = y0 - py
+                if ex * ex + ey * ey <= limit:
+                    pixels[base + col] = value
+
+    def _stroke(self, subpaths, width, dash, phase, value):
+        half = width / 2
+        for points, closed in subpaths:
+            if len(points) < 2:
+                continue
+            for piece in dashed(points, closed, dash, phase):
+                for (x0, y0), (x1, y1) in zip(piece, piece[1:]):
+                    self._paint_segment(x0, y0, x1, y1, half, value)
+
+    def _fill(self, subpaths, even_odd, value):
+        edges = []
+        for points, _ in subpaths:
+            ring = points if points[0] == points[-1] else points + [points[0]]
+            for (x0, y0), (x1, y1) in zip(ring, ring[1:]):
+                if y0 != y1:
+                    edges.append((x0, y0, x1, y1))
+        if not edges:
+            return
+        res = self.res
+        cols = self.cols
+        low = min(min(e[1], e[3]) for e in edges)
+        high = max(max(e[1], e[3]) for e in edges)
+        for row in range(max(0, int(floor(low / res))), min(self.rows - 1, int(ceil(high / res))) + 1):
+            py = (row + 0.5) * res
+            crossings = []
+            for x0, y0, x1, y1 in edges:
+                if (y0 <= py < y1) or (y1 <= py < y0):
+                    crossings.append((x0 + (py - y0) * (x1 - x0) / (y1 - y0), 1 if y1 > y0 else -1))
+            crossings.sort()
+            winding = 0
+            base = row * cols
+            for k, (x, direction) in enumerate(crossings[:-1]):
+                winding = winding + 1 if even_odd else winding + direction
+                inside = winding % 2 if even_odd else winding != 0
+                if inside:
+                    c0 = max(0, int(ceil(x / res - 0.5)))
+                    c1 = min(cols - 1, int(floor(crossings[k + 1][0] / res - 0.5)))
+                    for col in range(c0, c1 + 1):
+                        self.pixels[base + col] = value
+
+    # Content stream interpreter
+
+    def _run(self, content):
+        ctm = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+        gs = dict(ctm=ctm, width=1.0, dash=[], phase=0.0, fill=0.0, stroke=0.0)
+        stack = []
+        subpaths = []
+        current = None
+        rects = []
+        text = dict(tm=ctm, tlm=ctm)
+
+        def point(x, y):
+            a, b, c, d, e, f = gs['ctm']
+            return (a * x + c * y + e, b * x + d * y + f)
+
+        def scale():
+            a, b, c, d, _, _ = gs['ctm']
+            return sqrt(abs(a * d - b * c))
+
+        for operands, op in tokens(content):
+            if op == 'q':
+                stack.append(dict(gs))
+            elif op == 'Q':
+                gs = stack.pop()
+            elif op == 'cm':
+                gs['ctm'] = multiply(tuple(operands), gs['ctm'])
+            elif op == 'w':
+                gs['width'] = operands[0]
+            elif op == 'd':
+                gs['dash'], gs['phase'] = list(operands[0]), operands[1]
+            elif op in ('sc', 'scn', 'g', 'rg', 'k'):
+                gs['fill'] = luminance([v for v in operands if isinstance(v, float)])
+            elif op in ('SC', 'SCN', 'G', 'RG', 'K'):
+                gs['stroke'] = luminance([v for v in operands if isinstance(v, float)])
+            elif op == 'm':
+                current = [point(*operands)]
+                subpaths.append([current, False])
+            elif op == 'l':
+                current.append(point(*operands))
+            elif op in ('c', 'v', 'y'):
+                if op == 'c':
+                    p1, p2, p3 = point(*operands[0:2]), point(*operands[2:4]), point(*operands[4:6])
+                elif op == 'v':
+                    p1, p2, p3 = current[-1], point(*operands[0:2]), point(*operands[2:4])
+                else:
+                    p1, p2, p3 = point(*operands[0:2]), point(*operands[2:4]), point(*operands[2:4])
+                current.extend(bezier(current[-1], p1, p2, p3))
+                subpaths[-1].append('curve')
+            elif op == 'h':
+                if subpaths:
+                    subpaths[-1][1] = True
+            elif op == 're':
+                x, y, w, h = operands
+                current = [point(x, y), point(x + w, y), point(x + w, y + h), point(x, y + h)]
+                subpaths.append([current, True])
+                rects.append(current)
+            elif op in ('S', 's', 'f', 'F', 'f*', 'B', 'B*', 'b', 'b*', 'n'):
+                paths = [(points, closed or op in ('s', 'b', 'b*')) for points, closed, *_ in subpaths]
+                if op in ('f', 'F', 'f*', 'B', 'B*', 'b', 'b*'):
+                    value = int(round(255 * gs['fill']))
+                    self._fill(paths, op.endswith('*'), value)
+                    self._note_fill(subpaths, rects, gs['fill'])
+                if op in ('S', 's', 'B', 'B*', 'b', 'b*'):
+                    self._stroke(paths, gs['width'] * scale(), gs['dash'], gs['phase'],
+                                 int(round(255 * gs['stroke'])))
+                subpaths = []
+                rects = []
+                current = None
+            elif op == 'BT':
+                text['tm'] = text['tlm'] = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+            elif op == 'Tm':
+                text['tm'] = text['tlm'] = tuple(operands)
+            elif op in ('Td', 'TD'):
+                text['tm'] = text['tlm'] = multiply((1.0, 0.0, 0.0, 1.0, operands[0], operands[1]), text['tlm'])
+            elif op in ('Tj', 'TJ', "'"):
+                pieces = operands[0] if op == 'TJ' else operands[-1:]
+                string = b''.join(p for p in pieces if isinstance(p, bytes)).decode('latin-1')
+                x, y = multiply(text['tm'], gs['ctm'])[4:6]
+                self._labels.append((string, x, y))
+
+    def _note_fill(self, subpaths, rects, gray):
+        # Keeps the ink rectangles (obstacles) and the filled dots (checkpoints).
+        if gray > 0.3:
+            return
+        for points in rects:
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            if max(xs) - min(xs) < self.width_pt / 2:
+                self.obstacles.append((min(xs) * METERS_PER_PT, min(ys) * METERS_PER_PT,
+                                       max(xs) * METERS_PER_PT, max(ys) * METERS_PER_PT))
+        for points, _, *curve in subpaths:
+            if curve:
+                xs = [p[0] for p in points]
+                ys = [p[1] for p in points]
+                size = max(max(xs) - min(xs), max(ys) - min(ys))
+                if size > 36:
+                    self._dots.append(((max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2))
+
+    def _checkpoints(self):
+        # Pairs each CP#k label with the nearest filled dot.
+        found = []
+        for string, x, y in self._labels:
+            if string.startswith('CP#') and self._dots:
+                dot = min(self._dots, key=lambda d: hypot(d[0] - x, d[1] - y))
+                found.append((string, dot[0] * METERS_PER_PT, dot[1] * METERS_PER_PT))
+        return sorted(found)
+
+    # Queries (metres)
+
+    def reflectance(self, x, y):
+        # Reflectance 0..1 at (x, y); 0 off the mat.
+        col = int(x / METERS_PER_PT / self.res)
+        row = int(y / METERS_PER_PT / self.res)
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.pixels[row * self.cols + col] / 255
+        return 0.0
+
+    def on_mat(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def write_pgm(self, path, step=1):
+        # Saves the map (every step-th cell) as a PGM image, top row first.
+        cols = range(0, self.cols, step)
+        with open(path, 'wb') as f:
+            f.write(b'P5 %d %d 255\n' % (len(cols), len(range(0, self.rows, step))))
+            for row in reversed(range(0, self.rows, step)):
+                base = row * self.cols
+                f.write(bytes(self.pixels[base + col] for col in cols))
+
+if __name__ == "__main__":
+    import sys
+    from time import perf_counter
+    start = perf_counter()
+    track = TrackMap()
+    print("rasterized %d x %d cells in %.1f s" % (track.cols, track.rows, perf_counter() - start))
+    for name, x, y in track.checkpoints:
+        print("%-5s %6.3f %6.3f m" % (name, x, y))
+    print("%d obstacles" % len(track.obstacles))
+    if len(sys.argv) > 1:
+        track.write_pgm(sys.argv[1], step=2)
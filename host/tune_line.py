@@ -0,0 +1,141 @@
+"""
+tune_line.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Offline line-following tuner. Sweeps Kp, Ki, Kd, base_speed and the line
+sensor window_size over a grid, at several battery voltages, by running
+each configuration through the track simulator (sim_track.py): the real
+line sensor driver, PID_value, speed loops and motors against the motor
+plants and the rasterized track. The runs are independent, so they go to
+a process pool with one worker per core, and the results come back in job
+order whatever order the workers finish in.
+
+Scoring (lower is better), averaged over the noise seeds:
+    cost = time of the last checkpoint reached
+           + MISS_PENALTY_S for every checkpoint not reached
+           + CROSS_TRACK_S_PER_MM * mean cross-track error (mm)
+so reaching another checkpoint always beats being faster to fewer.
+
+Output: the best configurations at each voltage, and a gain table
+(gain_table.py) with the best row per voltage, written to out= for
+main.py to load from flash. The sweep prints its wall time against the
+summed run times, i.e. how close to linear it scaled over the workers.
+
+Every run is a fresh worker process (main.py is imported once per
+process) forked after the track is rasterized. A run depends only on its
+configuration and seed: the clock is virtual and the sensor noise comes
+from random.Random(seed), so a sweep with the same arguments gives the
+same table on any number of cores.
+
+Usage:
+    python host/tune_line.py [name=v1,v2,...] [seed=N] [seeds=N] [seconds=S] [jobs=N] [top=N] [out=PATH]
+    names: Kp Ki Kd base_speed window_size volts
+    e.g. python host/tune_line.py Kp=8,10,12 Kd=0.9 base_speed=18,22 volts=7.2 seeds=2
+"""
+
+import os
+import sys
+import itertools
+import multiprocessing
+from time import perf_counter
+
+import sim_track
+from track_map import TrackMap
+import gain_table
+
+GRID = {
+    "Kp": (8, 10, 12),
+    "Ki": (0,),
+    "Kd": (0.6, 0.9, 1.2),
+    "base_speed": (18, 22, 26),
+    "window_size": (5, 10),
+    "volts": (6.6, 7.2, 7.8),
+}
+INTS = ("base_speed", "window_size")
+MISS_PENALTY_S = 60.0         # Cost of a checkpoint not reached (s)
+CROSS_TRACK_S_PER_MM = 0.5    # Cost of mean cross-track error (s per mm)
+NOISE = 20.0                  # QTR count noise (standard deviation)
+
+TRACK = None                  # Rasterized before the pool forks
+
+def run_job(job):
+    # Worker: one simulator run. Returns (cost, checkpoints, last checkpoint s,
+    # cross-track mm, line section s, run wall s).
+    volts, kp, ki, kd, base_speed, window, seed, seconds = job
+    result = sim_track.run(seconds, seed=seed, noise=NOISE, volts=volts, track=TRACK,
+                           gains=[(volts, kp, ki, kd, base_speed, window)])
+    splits = result['splits']
+    reached = len(splits)
+    last = splits[-1][1] if splits else result['virtual_s']
+    cross_track = result['cross_track'] * 1000
+    missed = len(TRACK.checkpoints) - reached
+    cost = last + MISS_PENALTY_S * missed + CROSS_TRACK_S_PER_MM * cross_track
+    return cost, reached, last, cross_track, result['line_s'], result['wall_s']
+
+def parse(argv):
+    grid = dict(GRID)
+    options = dict(seed=1, seeds=1, seconds=75.0, jobs=os.cpu_count() or 1, top=5, out='gains.txt')
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name in grid:
+            kind = int if name in INTS else float
+            grid[name] = tuple(kind(v) for v in value.split(','))
+        elif name in options:
+            options[name] = type(options[name])(value)
+        else:
+            raise SystemExit("unknown argument %r" % arg)
+    return grid, options
+
+def main():
+    global TRACK
+    grid, options = parse(sys.argv[1:])
+    TRACK = TrackMap()
+    configs = list(itertools.product(grid["volts"], grid["Kp"], grid["Ki"], grid["Kd"],
+                                     grid["base_speed"], grid["window_size"]))
+    seeds = range(options['seed'], options['seed'] + options['seeds'])
+    jobs = [config + (seed, options['seconds']) for config in configs for seed in seeds]
+    workers = max(1, min(options['jobs'], len(jobs)))
+    print("%d configurations x %d seeds = %d runs on %d workers" % (len(configs), len(seeds), len(jobs), workers))
+
+    start = perf_counter()
+    results = []
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers, maxtasksperchild=1) as pool:
+        for k, result in enumerate(pool.imap(run_job, jobs, chunksize=1), 1):
+            results.append(result)
+            print("\r%d/%d runs" % (k, len(jobs)), end='', flush=True)
+    elapsed = perf_counter() - start
+    busy = sum(r[5] for r in results)
+    print("\nsweep: %.1f s wall, %.1f s of runs, %.1fx over %d workers" % (elapsed, busy, busy / elapsed, workers))
+
+    # Average each configuration over its seeds
+    n = len(seeds)
+    scored = []
+    for k, config in enumerate(configs):
+        runs = results[k * n:(k + 1) * n]
+        mean = [sum(r[i] for r in runs) / n for i in range(4)]
+        lines = [r[4] for r in runs if r[4] is not None]
+        scored.append((mean[0], config, mean[1], mean[2], mean[3], sum(lines) / len(lines) if lines else None))
+
+    rows = []
+    for volts in grid["volts"]:
+        ranked = sorted(s for s in scored if s[1][0] == volts)
+        print("\n%.2f V %6s %5s %5s %5s %5s %6s %7s %7s %7s %7s" % (
+            volts, "cost", "Kp", "Ki", "Kd", "speed", "window", "CPs", "last s", "xte mm", "line s"))
+        for cost, config, reached, last, cross_track, line_s in ranked[:options['top']]:
+            _, kp, ki, kd, base_speed, window = config
+            print("       %6.1f %5g %5g %5g %5d %6d %7.1f %7.2f %7.1f %7s" % (
+                cost, kp, ki, kd, base_speed, window, reached, last, cross_track,
+                "-" if line_s is None else "%.2f" % line_s))
+        rows.append(ranked[0][1])
+
+    comment = "host/tune_line.py, seeds %d-%d, %g s runs" % (seeds[0], seeds[-1], options['seconds'])
+    if gain_table.save(options['out'], rows, comment):
+        print("\ngain table written to %s" % options['out'])
+
+if __name__ == "__main__":
+    main()
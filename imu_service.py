@@ -0,0 +1,138 @@
+"""
+imu_service.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Makes one cooperative task the only reader of the BNO055 while the
+scheduler runs. The task polls the sensor at its task period and caches
+heading, yaw rate and calibration status with a timestamp and sequence
+number. Other tasks read the cache instead of the I2C bus, so bus latency
+can never stall them.
+
+Functionality:
+- IMUService.task() is registered with cotask; its period sets the IMU rate.
+- Each run reads gyro and Euler data in one I2C transaction; CAL_STAT is
+  read every calib_every runs.
+- Values are cached as integers (1/16 degree, 1/16 degree per second).
+- With boot set to a BNO055.bring_up() generator, the task first runs the
+  sensor bring-up, yielding while the sensor is busy, and only then starts
+  sampling. The cache keeps its initial values until then.
+- With an estimator (heading_estimator.HeadingEstimator), every sample is
+  also passed to it: the gyro rate is integrated at the task rate and
+  corrected by the fused heading. Run the task faster (5 ms) for it.
+- CacheReader is a per-consumer handle that records the sample age and
+  repeated samples that consumer sees. Given the estimator, its heading()
+  and yaw_rate() come from the estimate instead of the raw cache.
+"""
+
+from time import ticks_us, ticks_diff
+
+class IMUService:
+    def __init__(self, imu, calib_every=10, yaw_sign=-1, boot=None, estimator=None):
+        # imu: BNO055, initialized unless boot is given
+        # boot: bring-up generator to run in the task before sampling
+        # estimator: HeadingEstimator fed with every sample, or None
+        # yaw_sign: BNO055 heading grows clockwise while gyro z is positive
+        #           counter-clockwise; -1 makes yaw rate the rate of heading
+
+        self.imu = imu
+        self.boot = boot
+        self.calib_every = calib_every
+        self.yaw_sign = yaw_sign
+        self.estimator = estimator
+
+        # Cache
+        self.heading_raw = 0     # Heading, 1/16 degree
+        self.yaw_rate_raw = 0    # Heading rate, 1/16 degree per second
+        self.calib_stat = 0      # Raw CAL_STAT byte
+        self.stamp = ticks_us()  # ticks_us() of the latest sample
+        self.seq = 0             # Samples taken, 30-bit wrap
+
+        self._runs = 0
+
+    def refresh(self):
+        # Reads the sensor once and updates the cache.
+        data = self.imu.read_gyro_euler()
+        self.heading_raw = data[3]
+        self.yaw_rate_raw = self.yaw_sign * data[2]
+        if self._runs == 0:
+            self.calib_stat = self.imu.read_calib_stat()
+        self._runs += 1
+        if self._runs >= self.calib_every:
+            self._runs = 0
+        self.stamp = ticks_us()
+        self.seq = (self.seq + 1) & 0x3FFFFFFF
+        if self.estimator is not None:
+            self.estimator.update(self.yaw_rate_raw / 16, self.heading_raw / 16, self.stamp)
+
+    def task(self):
+        # Cooperative task: one sensor read per run.
+        if self.boot is not None:
+            yield from self.boot
+            self.boot = None
+        while True:
+            self.refresh()
+            yield 0
+
+    def heading(self):
+        # Cached heading in degrees (0 to 360).
+        return self.heading_raw / 16
+
+    def yaw_rate(self):
+        # Cached heading rate in degrees per second.
+        return self.yaw_rate_raw / 16
+
+    def calibrated(self):
+        # True when the fusion (sys) calibration status is fully calibrated.
+        return (self.calib_stat >> 6) == 3
+
+    def age_us(self):
+        # Time since the cached sample was taken.
+        return ticks_diff(ticks_us(), self.stamp)
+
+class CacheReader:
+    def __init__(self, service, estimator=None):
+        # Per-consumer handle on an IMUService cache.
+        # estimator: HeadingEstimator to read heading and yaw rate from, or None
+        self.service = service
+        self.estimator = estimator
+        self.reads = 0
+        self.repeats = 0       # Reads that returned an already seen sample
+        self.last_age_us = 0
+        self.max_age_us = 0
+        self.last_seq = -1
+
+    def _note(self):
+        # Records the age and freshness of the sample being read.
+        service = self.service
+        age = ticks_diff(ticks_us(), service.stamp)
+        self.last_age_us = age
+        if age > self.max_age_us:
+            self.max_age_us = age
+        self.reads += 1
+        if service.seq == self.last_seq:
+            self.repeats += 1
+        self.last_seq = service.seq
+
+    def heading(self):
+        self._note()
+        if self.estimator is not None:
+            return self.estimator.heading()
+        return self.service.heading()
+
+    def heading_raw(self):
+        self._note()
+        return self.service.heading_raw
+
+    def yaw_rate(self):
+        self._note()
+        if self.estimator is not None:
+            return self.estimator.yaw_rate()
+        return self.service.yaw_rate()
+
+    def stats(self):
+        # Returns (reads, repeated samples, last age us, max age us).
+        return self.reads, self.repeats, self.last_age_us, self.max_age_us
@@ -8,15 +8,26 @@ Authors: Sam Sakaguchi, Timothy Chu
 Summary:
 This module provides an interface for the BNO055 IMU sensor using I2C.
 It supports reading sensor data, calibration, and mode configuration.
+
+The data reads used in control loops (heading, Euler angles, gyro, accel,
+magnetometer and the combined burst read) go straight into preallocated
+int16 buffers, so they do not allocate. The accel, mag, gyro and Euler
+registers are contiguous, so read_burst() fetches all of them in one I2C
+transaction. Buffers returned by the raw reads are overwritten by the
+next read.
+
+Bring-up does not sleep for fixed times. After the reset pulse the driver
+polls CHIP_ID until the sensor answers, and every mode change is confirmed
+by reading OPR_MODE back. bring_up() is the same sequence as a generator
+that yields while the sensor is busy, so it can run as a cotask task or be
+stepped between other setup work; construct with wait=False for that.
 """
 
-import init
 import struct
+from array import array
 from pyb import I2C, Pin, delay
+from time import ticks_ms, ticks_diff
 from struct import unpack_from, calcsize
-from left_motor import left_motor
-from right_motor import right_motor
-import PID_controller
 
 class BNO055:
     DEV_ADDR = const(0x28)
@@ -35,44 +46,119 @@ class BNO055:
         ACC_OFFSET   = (const(0x55), b"<hhhh")
         MAG_OFFSET   = (const(0x5B), b"<hhhh")
         GYR_OFFSET   = (const(0x61), b"<hhhh")
+        CALIB_DATA   = (const(0x55), b"<11h")    # All offsets and radii, 0x55-0x6A
+
+    CHIP_ID_VALUE = const(0xA0)
 
     CONFIG_MODE = const(0x00)
     NDOF_MODE   = const(0x0C)
     IMU_MODE    = const(0x08)
 
-    def __init__(self, SDA, SCL, RST, bus=1):
+    # Datasheet timings (ms); the sensor NACKs while it boots
+    BOOT_TIMEOUT   = const(1000)  # Reset to CONFIG mode is typically 650 ms
+    TO_CONFIG_MS   = const(19)    # Any operating mode to CONFIG mode
+    FROM_CONFIG_MS = const(7)     # CONFIG mode to any operating mode
+    MODE_TIMEOUT   = const(100)
+
+    def __init__(self, SDA, SCL, RST, bus=1, wait=True):
         # Initializes the BNO055 sensor and resets it.
+        # wait: block until the sensor answers; with wait=False the sensor boots
+        #       while other setup runs, and bring_up() or initialize() finishes it.
 
         self.SDA = Pin('PB9', mode=Pin.AF_OD)
         self.SCL = Pin('PB8', mode=Pin.AF_OD)
         self.RST = Pin('PA15', mode=Pin.OUT_PP)
 
+        # Reset pulse as in the original driver: 10 ms low, far above the
+        # datasheet minimum, and only paid once at boot
         self.RST.low()
         delay(10)
         self.RST.high()
-        delay(1000)
+        self.reset_time = ticks_ms()
+        self.mode = None    # Confirmed operating mode, None until the sensor answers
+        self.ready = False  # Set when bring_up() completes
 
         # Initialize I2C communication
         self.i2c = I2C(bus, I2C.MASTER, baudrate=400000)
         self._buf = const(22)  
 
+        # Data registers 0x08-0x1F (ACC, MAG, GYR, EUL; x, y, z or h, r, p)
+        # read as little-endian int16 straight into one array, with a
+        # memoryview slice per register
+        self._data = array('h', [0] * 12)
+        data = memoryview(self._data)
+        self._acc = data[0:3]
+        self._mag = data[3:6]
+        self._gyr = data[6:9]
+        self._eul = data[9:12]
+        self._head = data[9:10]
+        self._gyr_eul = data[6:12]
+
+        self._byte = bytearray(1)
+        self._stat = bytearray(1)
+        self._reg_bufs = {}
+
+        if wait:
+            self.run(self._until(self.reg.CHIP_ID, self.CHIP_ID_VALUE, 0, self.BOOT_TIMEOUT,
+                                 self.reset_time))
+            self.mode = self.CONFIG_MODE
+
+    @staticmethod
+    def run(steps):
+        # Runs a bring-up generator to completion, polling every millisecond.
+        for _ in steps:
+            delay(1)
+
     def _write_reg(self, reg, value):
         # Writes a single byte to a register.
-        self.i2c.mem_write(bytearray([value]), self.DEV_ADDR, reg[0])
+        self._byte[0] = value
+        self.i2c.mem_write(self._byte, self.DEV_ADDR, reg[0])
 
     def _read_reg(self, reg):
         # Reads a register and unpacks the data based on its format.
-        length = calcsize(reg[1])
-        buf = bytearray(length)
+        # The read buffer for each register is allocated on first use.
+        buf = self._reg_bufs.get(reg[0])
+        if buf is None:
+            buf = self._reg_bufs[reg[0]] = bytearray(calcsize(reg[1]))
         self.i2c.mem_read(buf, self.DEV_ADDR, reg[0])
         return unpack_from(reg[1], buf)
 
+    def _poll(self, reg, value):
+        # True if a one-byte register reads value; False while the sensor NACKs.
+        try:
+            self.i2c.mem_read(self._byte, self.DEV_ADDR, reg[0])
+        except OSError:
+            return False
+        return self._byte[0] == value
+
+    def _until(self, reg, value, min_ms, timeout_ms, start=None):
+        # Generator: yields until at least min_ms have passed since start and
+        # the register reads value. Raises OSError after timeout_ms.
+        if start is None:
+            start = ticks_ms()
+        while True:
+            elapsed = ticks_diff(ticks_ms(), start)
+            if elapsed >= min_ms and self._poll(reg, value):
+                return
+            if elapsed > timeout_ms:
+                raise OSError("BNO055: register 0x%02X not 0x%02X after %d ms" % (reg[0], value, elapsed))
+            yield 0
+
+    def mode_steps(self, mode):
+        # Generator version of change_mode(). The datasheet switching time is
+        # a minimum; OPR_MODE reading back the new mode confirms the switch.
+        if self.mode != self.CONFIG_MODE:
+            self._write_reg(self.reg.OPR_MODE, self.CONFIG_MODE)
+            yield from self._until(self.reg.OPR_MODE, self.CONFIG_MODE, self.TO_CONFIG_MS, self.MODE_TIMEOUT)
+            self.mode = self.CONFIG_MODE
+        if mode != self.CONFIG_MODE:
+            self._write_reg(self.reg.OPR_MODE, mode)
+            yield from self._until(self.reg.OPR_MODE, mode, self.FROM_CONFIG_MS, self.MODE_TIMEOUT)
+            self.mode = mode
+
     def change_mode(self, mode):
         # Changes the operation mode of the sensor.
-        self._write_reg(self.reg.OPR_MODE, self.CONFIG_MODE)
-        delay(10)
-        self._write_reg(self.reg.OPR_MODE, mode)
-        delay(20)
+        self.run(self.mode_steps(mode))
 
     def get_calibrate_status(self):
         # Returns the current calibration status.
@@ -84,6 +170,11 @@ class BNO055:
             "mag":   calib_stat & 0x03,
         }
 
+    def read_calib_stat(self):
+        # Reads the raw CAL_STAT byte (sys, gyro, accel, mag; 2 bits each).
+        self.i2c.mem_read(self._stat, self.DEV_ADDR, self.reg.CAL_STAT[0])
+        return self._stat[0]
+
     def get_calibrate_coeff(self):
         # Reads the calibration coefficients from the sensor.
         acc_offset = self._read_reg(self.reg.ACC_OFFSET)
@@ -94,44 +185,89 @@ class BNO055:
     def write_calibrate_coeff(self, acc_offset, mag_offset, gyr_offset):
         # Writes calibration coefficients to the sensor.
         self.change_mode(self.CONFIG_MODE)
-        delay(10)
-        self.i2c.mem_write(bytes(acc_offset), self.DEV_ADDR, self.reg.ACC_OFFSET[0])
-        self.i2c.mem_write(bytes(mag_offset), self.DEV_ADDR, self.reg.MAG_OFFSET[0])
-        self.i2c.mem_write(bytes(gyr_offset), self.DEV_ADDR, self.reg.GYR_OFFSET[0])
+        self.i2c.mem_write(struct.pack(self.reg.ACC_OFFSET[1], *acc_offset), self.DEV_ADDR, self.reg.ACC_OFFSET[0])
+        self.i2c.mem_write(struct.pack(self.reg.MAG_OFFSET[1], *mag_offset), self.DEV_ADDR, self.reg.MAG_OFFSET[0])
+        self.i2c.mem_write(struct.pack(self.reg.GYR_OFFSET[1], *gyr_offset), self.DEV_ADDR, self.reg.GYR_OFFSET[0])
+        self.change_mode(self.NDOF_MODE)
+
+    def read_calib_data(self):
+        # Reads the 22 raw calibration bytes (offsets and radii, 0x55-0x6A).
+        # The registers are only valid in CONFIG mode; NDOF mode is restored.
+        data = bytearray(calcsize(self.reg.CALIB_DATA[1]))
+        self.change_mode(self.CONFIG_MODE)
+        self.i2c.mem_read(data, self.DEV_ADDR, self.reg.CALIB_DATA[0])
+        self.change_mode(self.NDOF_MODE)
+        return data
+
+    def write_calib_data(self, data):
+        # Writes 22 raw calibration bytes from read_calib_data() and returns to NDOF mode.
+        self.change_mode(self.CONFIG_MODE)
+        self.i2c.mem_write(data, self.DEV_ADDR, self.reg.CALIB_DATA[0])
         self.change_mode(self.NDOF_MODE)
-        delay(20)
 
     def read_euler(self):
         # Reads Euler angles (heading, roll, pitch) from the sensor.
-        data_euler = bytearray(6)
-        self.i2c.mem_read(data_euler, self.DEV_ADDR, self.reg.EUL_DATA_ALL[0])
-        head, roll, pitch = struct.unpack("<hhh", data_euler)
-        return head / 16, roll / 16, pitch / 16
+        eul = self.read_euler_raw()
+        return eul[0] / 16, eul[1] / 16, eul[2] / 16
+
+    def read_euler_raw(self):
+        # Reads Euler angles in 1/16 degree units (heading, roll, pitch).
+        self.i2c.mem_read(self._eul, self.DEV_ADDR, self.reg.EUL_DATA_ALL[0])
+        return self._eul
 
     def read_heading(self):
         # Reads only the heading (yaw) angle.
-        heading_struct = bytearray(2)
-        self.i2c.mem_read(heading_struct, self.DEV_ADDR, self.reg.EUL_DATA_ALL[0])
-        heading = struct.unpack("<h", heading_struct)[0]
-        return heading / 16
+        return self.read_heading_raw() / 16
+
+    def read_heading_raw(self):
+        # Reads the heading in 1/16 degree units.
+        self.i2c.mem_read(self._head, self.DEV_ADDR, self.reg.EUL_DATA_ALL[0])
+        return self._head[0]
 
     def read_angular_velocity(self):
-        # Reads gyroscope data (angular velocity).
-        return self._read_reg(self.reg.GYR_DATA)
+        # Reads gyroscope data (angular velocity, 1/16 dps).
+        self.i2c.mem_read(self._gyr, self.DEV_ADDR, self.reg.GYR_DATA[0])
+        return self._gyr
 
     def read_acceleration(self):
-        # Reads accelerometer data.
-        return self._read_reg(self.reg.ACC_DATA)
+        # Reads accelerometer data (1/100 m/s^2).
+        self.i2c.mem_read(self._acc, self.DEV_ADDR, self.reg.ACC_DATA[0])
+        return self._acc
 
     def read_magnetic_field(self):
-        # Reads magnetometer data.
-        return self._read_reg(self.reg.MAG_DATA)
+        # Reads magnetometer data (1/16 uT).
+        self.i2c.mem_read(self._mag, self.DEV_ADDR, self.reg.MAG_DATA[0])
+        return self._mag
 
-    def initialize(self):
-        # Initializes sensor settings and sets it to NDOF mode.
-        self.change_mode(self.CONFIG_MODE)
-        delay(50)
+    def read_gyro_euler(self):
+        # Reads gyro and Euler data (0x14-0x1F) in one I2C transaction.
+        # Returns gyr x,y,z (1/16 dps) then eul h,r,p (1/16 degree).
+        self.i2c.mem_read(self._gyr_eul, self.DEV_ADDR, self.reg.GYR_DATA[0])
+        return self._gyr_eul
+
+    def read_burst(self):
+        # Reads accel, mag, gyro and Euler data in one I2C transaction.
+        # Returns the int16 array: acc x,y,z, mag x,y,z, gyr x,y,z, eul h,r,p.
+        self.i2c.mem_read(self._data, self.DEV_ADDR, self.reg.ACC_DATA[0])
+        return self._data
+
+    def bring_up(self, calib_data=None):
+        # Generator: waits for the sensor to boot, applies the settings of
+        # initialize() and optional raw calibration data (see read_calib_data()),
+        # then switches to NDOF mode and sets ready. Yields while the sensor is busy.
+        self.ready = False
+        if self.mode is None:
+            yield from self._until(self.reg.CHIP_ID, self.CHIP_ID_VALUE, 0, self.BOOT_TIMEOUT,
+                                   self.reset_time)
+            self.mode = self.CONFIG_MODE
+        yield from self.mode_steps(self.CONFIG_MODE)
         self._write_reg(self.reg.PWR_MODE, 0x00)
         self._write_reg(self.reg.UNIT_SEL, 0x00)
-        self.change_mode(self.NDOF_MODE)
-        delay(50)
+        if calib_data is not None:
+            self.i2c.mem_write(calib_data, self.DEV_ADDR, self.reg.CALIB_DATA[0])
+        yield from self.mode_steps(self.NDOF_MODE)
+        self.ready = True
+
+    def initialize(self, calib_data=None):
+        # Initializes sensor settings and sets it to NDOF mode.
+        self.run(self.bring_up(calib_data))
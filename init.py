@@ -9,28 +9,34 @@ Summary:
 Defines shared variables and queues for inter-task communication.
 These include encoder data, motor efforts, state control, and 
 sensor readings used in the robot's operation.
+
+Values the control loop touches every tick live in the state block 
+(state.py); the names below for them are Share-compatible Field views, 
+and the hot loops index state.ints / state.floats directly.
 """
 
 import task_share
 from task_share import Share, Queue
+from mailbox import Mailbox
+import state
+from state import Field
 import cqueue
-from pyb import Pin, Timer
 
-# Shared variable for current encoder value
-current_encoder_left = Share('f', thread_protect=True, name="Current Encoder Left")
-current_encoder_left.put(0)
+# Latest encoder positions (counts), put by the encoder task
+left_position = Mailbox('l', name="Left Position")
+right_position = Mailbox('l', name="Right Position")
 
-# Queue for bump events
-bump_flag = Queue('b', 1, thread_protect=True, name="Bump Flag")
+# Bump event, set by the bump sensor ISR
+bump_flag = Field(state.ints, state.BUMP, name="Bump Flag")
 
 # Shared variables for robot control
-distance_share = Share('f', thread_protect=True, name="Distance Share")
-left_effort = Share('h', thread_protect=True, name="Left Motor Effort")
-right_effort = Share('h', thread_protect=True, name="Right Motor Effort")
-state_input = Share('h', thread_protect=True, name="State Input")
+distance_share = Field(state.floats, state.DISTANCE, name="Distance Share")  # Odometry arc length (m)
+left_effort = Mailbox('h', name="Left Motor Effort")
+right_effort = Mailbox('h', name="Right Motor Effort")
+state_input = Field(state.ints, state.STATE_INPUT, name="State Input")
 
-# Queues for data collection
-collection_data_queue = Queue('f', 100, thread_protect=True, name="Collection Queue")
+# Latest line error, stamped with the ticks_us() of the line sensor frame behind it
+line_error = Mailbox('f', name="Line Error")
 init_heading = Share('f', thread_protect=True, name="Init Heading")
 
 # Data collection flag (active/inactive)
@@ -41,34 +47,49 @@ data_collection_active.put(0)
 robot_mode = Share('h', thread_protect=True, name="Robot Mode")
 robot_mode.put(0)
 
+# Odometry pose (m, m, rad counter-clockwise from the start) and velocities (m/s, rad/s)
+pose_x = Field(state.floats, state.POSE_X, name="Pose X")
+pose_y = Field(state.floats, state.POSE_Y, name="Pose Y")
+pose_theta = Field(state.floats, state.POSE_THETA, name="Pose Theta")
+linear_velocity = Field(state.floats, state.LINEAR_VELOCITY, name="Linear Velocity")
+angular_velocity = Field(state.floats, state.ANGULAR_VELOCITY, name="Angular Velocity")
+
+# Wheel speed setpoints (rad/s) tracked by the wheel speed loops (wheel_speed.py)
+left_speed = Field(state.floats, state.LEFT_SPEED, name="Left Speed")
+right_speed = Field(state.floats, state.RIGHT_SPEED, name="Right Speed")
+
 # Cumulative encoder distance
 cumulative_distance = Share('f', thread_protect=True, name="Cumulative Distance")
 cumulative_distance.put(0.0)
 
-# Queues for encoder data storage
-queue_size = 600
-encoder_left_data_queue = Queue('f', queue_size, thread_protect=True, name="Encoder Left Data Queue")
-encoder_right_data_queue = Queue('f', queue_size, thread_protect=True, name="Encoder Right Data Queue")
+# Encoder data storage moved to the flight recorder (flight_recorder.py)
 
 # Flag to control line sensing (PID control)
 line_sensing_enabled = Share('b', thread_protect=True, name="Line Sensing Enabled")
 line_sensing_enabled.put(1)  # 1 = enabled, 0 = disabled
 
+# Motion executor flag: 1 while motion segments own the motor efforts
+motion_active = Field(state.ints, state.MOTION_ACTIVE, name="Motion Active")
+
 # Override mode flag: 0 = normal (PID active), 1 = override active
-override_mode = Share('b', thread_protect=True, name="Override Mode")
-override_mode.put(0)
+override_mode = Field(state.ints, state.OVERRIDE_MODE, name="Override Mode")
 
 # Battery-related shared variables
 battery_voltage = Share('f', thread_protect=False, name="battery_voltage")
 constant_multiplier = Share('f', thread_protect=False, name="constant_multiplier")
+battery_voltage.put(0.0)
+constant_multiplier.put(1.0)
+
+# Low-voltage event: 1 while the filtered pack voltage is low (battery_monitor.py)
+battery_low = Share('b', thread_protect=False, name="battery_low")
+battery_low.put(0)
 
 # PID control proportional gain value
-kp_value = Share('f', thread_protect=True, name="kp_value")
+kp_value = Field(state.floats, state.KP, name="kp_value")
 kp_value.put(0.5)
 
 # Final sequence control flag
-final_flag = Share('b', thread_protect=True, name="Final Flag")
-final_flag.put(0)
+final_flag = Field(state.ints, state.FINAL_FLAG, name="Final Flag")
 
 # Queue for final target values
 final_target_queue = Queue('f', 1, thread_protect=True, name="Final Target Queue")
@@ -0,0 +1,413 @@
+"""
+input_capture.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Captures the raw inputs of the sensing and line-following path so a run
+can be replayed on a PC through the same driver code, value for value
+(host/replay_capture.py). The flight recorder keeps what the controller
+computed; a capture keeps what it was given: every line sensor ADC count,
+encoder counter, BNO055 register read and ticks_us() value the drivers
+consumed, and the bump edges, in the order they happened.
+
+Functionality:
+- attach() puts thin proxies between the drivers and the hardware: the
+  line sensor ADCs, the encoder timers and the BNO055 I2C bus, plus the
+  ticks_us() of the driver modules (HOOKED). Each value read is logged
+  and passed on unchanged.
+- Logging only happens inside the captured calls: a run of the Line Sensor
+  or PID Controller task (wrap()), Encoder.update(), IMUService.refresh(),
+  a LineSampler.read() and the sampler interrupt. Each starts with an event
+  naming it, so the replay knows which code to run and reads happen in
+  the same order. Reads by other tasks are not logged.
+- Events are a source byte and a fixed payload (SIZES; an I2C read carries
+  its register, item count and item width). They go into one of two
+  preallocated buffers with interrupts disabled, so the sampler interrupt
+  can log without allocating or tearing an event. flush() swaps the
+  buffers and writes the full one to a stream (a file on flash or an SD
+  card); flush_task() does it from the lowest priority task. If the
+  buffer fills before it is flushed, capturing stops (overflowed) so the
+  file is always a consistent prefix of the run.
+- write_header() writes the setup the replay needs: line sensor options
+  and calibration, PID gains, and the state of the encoders, line sensor
+  driver, IMU service and sampler at the moment capturing began.
+
+Stream layout (little-endian):
+    '4sBBBB'  magic b'RMIC', version, line channels n, options, window_size
+    '5dbB'    Kp, Ki, Kd, Tf, base_speed, IMU yaw_sign, IMU calib_every
+    'nd'      black calibration
+    'nd'      white calibration
+    '10i'     driver last_time; left and right encoder prev_count,
+              position, last_time; IMU service stamp, seq and runs
+    sampler   with OPT_SAMPLER: '(2n+2)H2lBBBi' frames, stamps, front, lo, hi, seq
+    events    source byte, then SIZES[source] bytes
+
+At about 1600 ADC reads a second with the 200 Hz sampler, a capture
+streams around 15 kB/s, so give flush_task() a file on a card, or keep
+runs short on the internal flash.
+"""
+
+import sys
+from struct import pack, pack_into, calcsize
+from time import ticks_us
+from pyb import disable_irq, enable_irq
+import state
+
+MAGIC = b'RMIC'
+VERSION = 1
+HEADER_FMT = '<4sBBBB'
+GAINS_FMT = '<5dbB'
+STATE_FMT = '<10i'
+
+# Options
+OPT_FIXED_POINT = const(1)
+OPT_TRACKING = const(2)
+OPT_SAMPLER = const(4)
+OPT_BRIGHTNESS = const(8)
+
+# Event sources
+EV_TIME = const(0)      # 'I' a ticks_us() value read by a hooked module
+EV_CALL = const(1)      # 'BB' call id, control flags
+EV_SAMPLE = const(2)    # the sampler interrupt fired
+EV_FRAME = const(3)     # a LineSampler.read()
+EV_BUMP = const(4)      # 'B' bump sensor ExtInt line
+EV_ADC = const(5)       # 'BH' line channel (n = brightness), counts
+EV_COUNTER = const(6)   # 'BH' encoder (0 left, 1 right), timer counter
+EV_I2C = const(7)       # 'BBB' register, items, item width, then the items
+SIZES = (4, 2, 0, 0, 1, 3, 3, 3)
+EVENT_NAMES = ("time", "call", "sample", "frame", "bump", "adc", "counter", "i2c")
+
+# Captured calls
+CALL_LINE = const(0)
+CALL_PID = const(1)
+CALL_IMU = const(2)
+CALL_LEFT_ENC = const(3)
+CALL_RIGHT_ENC = const(4)
+CALL_NAMES = ("line", "pid", "imu", "left encoder", "right encoder")
+
+# Control flags carried by call events
+FLAG_STATE_INPUT = const(1)
+FLAG_MOTION_ACTIVE = const(2)
+FLAG_OVERRIDE_MODE = const(4)
+
+# Board modules whose ticks_us() is hooked. PID_value reads no clock of its
+# own: it times steps with init.line_error.stamp, set by linesensor or mailbox
+HOOKED = ('linesensor', 'line_sampler', 'encoder', 'imu_service', 'mailbox')
+
+MAX_EVENT = const(40)   # Largest event (a 12 item int16 I2C read is 31 bytes)
+
+def control_flags():
+    # The state block flags PID_value reads, as one byte.
+    ints = state.ints
+    return ((FLAG_STATE_INPUT if ints[state.STATE_INPUT] else 0)
+            | (FLAG_MOTION_ACTIVE if ints[state.MOTION_ACTIVE] else 0)
+            | (FLAG_OVERRIDE_MODE if ints[state.OVERRIDE_MODE] else 0))
+
+class CaptureADC:
+    # Logs every reading of a pyb.ADC.
+    def __init__(self, adc, capture, index):
+        self.adc = adc
+        self.capture = capture
+        self.index = index
+
+    def read(self):
+        value = self.adc.read()
+        self.capture.log_value(EV_ADC, self.index, value)
+        return value
+
+class CaptureTimer:
+    # Logs every counter() read of an encoder timer; setting it passes through.
+    def __init__(self, timer, capture, index):
+        self.timer = timer
+        self.capture = capture
+        self.index = index
+
+    def counter(self, value=None):
+        if value is not None:
+            return self.timer.counter(value)
+        value = self.timer.counter()
+        self.capture.log_value(EV_COUNTER, self.index, value)
+        return value
+
+class CaptureI2C:
+    # Logs every mem_read of the BNO055 bus; writes pass through.
+    def __init__(self, i2c, capture):
+        self.i2c = i2c
+        self.capture = capture
+
+    def mem_read(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        result = self.i2c.mem_read(data, addr, memaddr, timeout=timeout, addr_size=addr_size)
+        self.capture.log_read(memaddr, data)
+        return result
+
+    def mem_write(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        return self.i2c.mem_write(data, addr, memaddr, timeout=timeout, addr_size=addr_size)
+
+class InputCapture:
+    def __init__(self, buffer_size=4096):
+        # buffer_size: bytes per buffer; two are allocated
+        self.buffers = (bytearray(buffer_size), bytearray(buffer_size))
+        self.limit = buffer_size - MAX_EVENT
+        self.active_buffer = 0
+        self.used = 0
+        self.active = 0          # Nonzero inside a captured call
+        self.enabled = False
+        self.overflowed = False
+        self.events = 0
+        self.written = 0         # Bytes written by flush()
+        self.max_pending = 0     # Most bytes waiting for a flush
+
+        self.driver = None
+        self.sampler = None
+        self.encoders = ()
+        self.imu_service = None
+
+        # Bound methods created once, so the interrupt paths do not allocate
+        self._ticks = self.ticks_us
+        self._sampler_isr = None
+
+    # ------------------------------------------------------------------
+    # Logging
+    # ------------------------------------------------------------------
+    def _start(self, source):
+        # Reserves an event; returns its payload offset, or -1. Call with interrupts off.
+        if not self.enabled:
+            return -1
+        used = self.used
+        if used > self.limit:
+            self.enabled = False
+            self.overflowed = True
+            return -1
+        buf = self.buffers[self.active_buffer]
+        buf[used] = source
+        self.used = used + 1 + SIZES[source]
+        self.events += 1
+        if self.used > self.max_pending:
+            self.max_pending = self.used
+        return used + 1
+
+    def log_event(self, source):
+        irq = disable_irq()
+        self._start(source)
+        enable_irq(irq)
+
+    def log_call(self, call):
+        irq = disable_irq()
+        off = self._start(EV_CALL)
+        if off >= 0:
+            buf = self.buffers[self.active_buffer]
+            buf[off] = call
+            buf[off + 1] = control_flags()
+        enable_irq(irq)
+
+    def log_value(self, source, index, value):
+        # EV_ADC and EV_COUNTER events inside captured calls; EV_BUMP (index only) any time.
+        if source != EV_BUMP and not self.active:
+            return
+        irq = disable_irq()
+        off = self._start(source)
+        if off >= 0:
+            buf = self.buffers[self.active_buffer]
+            buf[off] = index
+            if source != EV_BUMP:
+                pack_into('<H', buf, off + 1, value)
+        enable_irq(irq)
+
+    def log_read(self, memaddr, data):
+        # EV_I2C: a bytearray is logged as bytes, an int16 view as int16 items.
+        if not self.active:
+            return
+        n = len(data)
+        width = 1 if isinstance(data, bytearray) else 2
+        irq = disable_irq()
+        off = self._start(EV_I2C)
+        if off >= 0:
+            buf = self.buffers[self.active_buffer]
+            buf[off] = memaddr
+            buf[off + 1] = n
+            buf[off + 2] = width
+            off += 3
+            if width == 1:
+                for k in range(n):
+                    buf[off + k] = data[k]
+            else:
+                for k in range(n):
+                    pack_into('<h', buf, off + 2 * k, data[k])
+            self.used = off + n * width
+        enable_irq(irq)
+
+    def ticks_us(self):
+        # Replaces ticks_us() in the hooked modules.
+        t = ticks_us()
+        if self.active:
+            irq = disable_irq()
+            off = self._start(EV_TIME)
+            if off >= 0:
+                pack_into('<I', self.buffers[self.active_buffer], off, t)
+            enable_irq(irq)
+        return t
+
+    def bump(self, line):
+        # Called from the bump sensor interrupt.
+        self.log_value(EV_BUMP, line, 0)
+
+    # ------------------------------------------------------------------
+    # Attaching
+    # ------------------------------------------------------------------
+    def attach(self, driver, sampler=None, left_enc=None, right_enc=None, imu_service=None):
+        # Inserts the proxies and hooks. Attach before the Line Sensor task
+        # first runs, then write_header() and start().
+        self.driver = driver
+        self.sampler = sampler
+        self.encoders = (left_enc, right_enc)
+        self.imu_service = imu_service
+
+        adcs = driver.adc_line
+        for i in range(len(adcs)):
+            adcs[i] = CaptureADC(adcs[i], self, i)
+        if driver.adc_brightness:
+            driver.adc_brightness = CaptureADC(driver.adc_brightness, self, len(adcs))
+            if sampler is not None:
+                sampler.backend.brightness_adc = driver.adc_brightness
+
+        for index, enc in enumerate(self.encoders):
+            if enc is not None:
+                enc.enc_timer = CaptureTimer(enc.enc_timer, self, index)
+                enc.update = self._captured(enc.update, CALL_LEFT_ENC + index)
+        if imu_service is not None:
+            imu_service.imu.i2c = CaptureI2C(imu_service.imu.i2c, self)
+            imu_service.refresh = self._captured(imu_service.refresh, CALL_IMU)
+        if sampler is not None:
+            sampler.read = self._frame(sampler.read)
+            self._sampler_isr = self._isr(sampler._sample)
+            sampler._callback = self._sampler_isr
+            if sampler.timer:
+                sampler.timer.callback(self._sampler_isr)
+
+        for name in HOOKED:
+            module = sys.modules.get(name)
+            if module is not None:
+                module.ticks_us = self._ticks
+
+        import bump_sensor
+        bump_sensor.capture = self
+
+    def _captured(self, method, call):
+        # Wraps a driver method as a captured call.
+        def captured():
+            self.log_call(call)
+            outer = self.active
+            self.active = 1
+            method()
+            self.active = outer
+        return captured
+
+    def _frame(self, read):
+        # Wraps LineSampler.read: the frame event and the copy happen with
+        # interrupts off, so the log shows which sampler interrupt it saw.
+        def frame(values):
+            irq = disable_irq()
+            if self.active:
+                self._start(EV_FRAME)
+            seq = read(values)
+            enable_irq(irq)
+            return seq
+        return frame
+
+    def _isr(self, sample):
+        # Wraps the sampler interrupt.
+        def isr(timer):
+            self.log_event(EV_SAMPLE)
+            outer = self.active
+            self.active = 1
+            sample(timer)
+            self.active = outer
+        return isr
+
+    def wrap(self, task_fun, call):
+        # Returns a task function whose every run is a captured call.
+        def task():
+            gen = task_fun()
+            while True:
+                self.log_call(call)
+                outer = self.active
+                self.active = 1
+                result = next(gen)
+                self.active = outer
+                yield result
+        return task
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+    def write_header(self, stream):
+        # Writes the setup and starting state; call before start().
+        import PID_controller
+        driver = self.driver
+        n = driver.num_line_sensors
+        options = ((OPT_FIXED_POINT if driver.fixed_point else 0)
+                   | (OPT_TRACKING if driver.tracking else 0)
+                   | (OPT_SAMPLER if self.sampler is not None else 0)
+                   | (OPT_BRIGHTNESS if driver.adc_brightness else 0))
+        stream.write(pack(HEADER_FMT, MAGIC, VERSION, n, options, driver.window_size))
+        service = self.imu_service
+        stream.write(pack(GAINS_FMT, PID_controller.Kp, PID_controller.Ki, PID_controller.Kd,
+                          PID_controller.Tf, PID_controller.base_speed,
+                          service.yaw_sign if service else -1, service.calib_every if service else 10))
+        stream.write(pack('<%dd' % n, *driver.black_calib))
+        stream.write(pack('<%dd' % n, *driver.white_calib))
+        values = [driver.last_time]
+        for enc in self.encoders:
+            values += [enc.prev_count, enc.position, enc.last_time] if enc else [0, 0, 0]
+        values += [service.stamp, service.seq, service._runs] if service else [0, 0, 0]
+        stream.write(pack(STATE_FMT, *values))
+        sampler = self.sampler
+        if sampler is not None:
+            irq = disable_irq()
+            values = list(sampler.frames[0]) + list(sampler.frames[1]) + [
+                sampler.stamps[0], sampler.stamps[1], sampler.front, sampler.lo, sampler.hi, sampler.seq]
+            enable_irq(irq)
+            stream.write(pack(sampler_layout(n), *values))
+
+    def start(self):
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def flush(self, stream):
+        # Writes the events logged since the last flush; returns the bytes written.
+        irq = disable_irq()
+        full = self.active_buffer
+        n = self.used
+        self.active_buffer = 1 - full
+        self.used = 0
+        enable_irq(irq)
+        if n:
+            stream.write(memoryview(self.buffers[full])[:n])
+            self.written += n
+        return n
+
+    def flush_task(self, stream, min_bytes=1024):
+        # Cooperative task: flushes once min_bytes are waiting. Run it at the
+        # lowest priority; flash writes can stall.
+        while True:
+            if self.used >= min_bytes:
+                self.flush(stream)
+            yield 0
+
+    def stats(self):
+        return self.events, self.written, self.max_pending, self.overflowed
+
+def sampler_layout(n):
+    # Struct layout of the sampler snapshot for n line channels.
+    return '<%dH2lBBBi' % (2 * (n + 1))
+
+def header_size(n, options):
+    size = calcsize(HEADER_FMT) + calcsize(GAINS_FMT) + calcsize('<%dd' % (2 * n)) + calcsize(STATE_FMT)
+    if options & OPT_SAMPLER:
+        size += calcsize(sampler_layout(n))
+    return size
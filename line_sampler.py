@@ -0,0 +1,110 @@
+"""
+line_sampler.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Samples the line sensor array from a hardware timer interrupt into a
+preallocated double buffer, so samples are evenly spaced no matter how
+busy the cooperative scheduler is. The Line Sensor task only copies out
+the latest complete frame and its timestamp.
+
+Functionality:
+- ADCBackend reads the pyb.ADC channels (plus the optional brightness
+  channel) into a frame; any object with the same read_into() method and
+  num_channels attribute can stand in for it, e.g. synthetic frames on a PC.
+- The timer callback fills the back buffer, stamps it with ticks_us() and
+  then swaps it to the front. It allocates nothing, as required in an ISR.
+- read() copies the front frame out with interrupts briefly disabled.
+- set_window() limits sampling to a range of channels.
+
+ADC.read_timed_multi() is not used because it blocks the caller until every
+sample is taken; a timer callback gives the same fixed-rate sampling in
+the background.
+"""
+
+from array import array
+from pyb import Timer, disable_irq, enable_irq
+from time import ticks_us
+
+class ADCBackend:
+    # Reads the line sensor ADCs, in channel order, into a frame.
+
+    def __init__(self, adcs, brightness_adc=None):
+        self.adcs = adcs
+        self.num_channels = len(adcs)
+        self.brightness_adc = brightness_adc
+
+    def read_into(self, frame, lo, hi):
+        # Fills frame[lo:hi] and the brightness slot frame[num_channels].
+        adcs = self.adcs
+        for i in range(lo, hi):
+            frame[i] = adcs[i].read()
+        if self.brightness_adc:
+            frame[self.num_channels] = self.brightness_adc.read()
+
+class LineSampler:
+    def __init__(self, backend, timer_num=6, freq=200):
+        # Preallocates both frames; sampling starts with start().
+        # Each frame holds num_channels readings followed by brightness.
+
+        self.backend = backend
+        self.num_channels = backend.num_channels
+        self.timer_num = timer_num
+        self.freq = freq
+        self.timer = None
+
+        size = self.num_channels + 1
+        self.frames = (array('H', [0] * size), array('H', [0] * size))
+        self.stamps = array('l', [0, 0])
+        self.front = 0
+        self.seq = 0          # Completed frames, 30-bit wrap
+        self.read_stamp = 0   # Timestamp of the frame returned by read()
+
+        # Channel window sampled by the interrupt
+        self.lo = 0
+        self.hi = self.num_channels
+
+        # Bound method created once so the ISR registration does not allocate
+        self._callback = self._sample
+
+    def start(self):
+        # Starts the sampling timer.
+        self.timer = Timer(self.timer_num, freq=self.freq)
+        self.timer.callback(self._callback)
+
+    def stop(self):
+        # Stops the sampling timer.
+        if self.timer:
+            self.timer.callback(None)
+            self.timer.deinit()
+            self.timer = None
+
+    def set_window(self, lo, hi):
+        # Samples only channels lo..hi-1; the other slots keep old values.
+        self.lo = lo
+        self.hi = hi
+
+    def _sample(self, timer):
+        # Timer interrupt: fill the back buffer, then publish it.
+        back = 1 - self.front
+        self.backend.read_into(self.frames[back], self.lo, self.hi)
+        self.stamps[back] = ticks_us()
+        self.front = back
+        self.seq = (self.seq + 1) & 0x3FFFFFFF
+
+    def read(self, values):
+        # Copies the newest complete frame into values (num_channels + 1 long).
+        # Returns the frame's sequence number; its timestamp is in read_stamp.
+
+        irq_state = disable_irq()
+        front = self.front
+        frame = self.frames[front]
+        for i in range(len(values)):
+            values[i] = frame[i]
+        self.read_stamp = self.stamps[front]
+        seq = self.seq
+        enable_irq(irq_state)
+        return seq
@@ -9,6 +9,24 @@ Summary:
 Implements a line sensor driver using ADC inputs. 
 Provides methods for reading raw sensor values, performing calibration, 
 computing a weighted centroid for line tracking, and adjusting sensor brightness.
+
+line_reading() computes the error in floating point. line_reading_fixed()
+computes the same error with integer math only, using per-channel tables
+built by build_tables() once calibration data is available. Its scaled
+error is returned in units of 1/ERROR_ONE and stays within FIXED_TOLERANCE
+of the floating point result.
+
+In tracking mode only the channels around the line are read each tick;
+unread channels are assumed to see white. The line position is refined
+between sensors with a parabolic fit, and the error is derived from that
+position. When the fit is not trustworthy (gaps, the diamond, perpendicular
+crossings, the line at the edge of the window, a line that widens or a dark
+reading on the window's edge in the newest frame) the rest of the channels
+are read at once and the centroid is used; the next tick is a full sweep, as
+is every refresh_every-th. A full sweep narrows the window again only when
+the channels left out look white, so tracking waits until a crossing or a
+diamond branch has left the moving average. When a skipped channel is read
+again, its white slots in the moving average take its last real reading.
 """
 
 import init
@@ -16,10 +34,26 @@ import pyb
 from pyb import Pin, ADC
 from time import ticks_us, ticks_diff
 from array import array
-from imu import BNO055
+
+# Fixed-point formats used by line_reading_fixed()
+NORM_BITS = const(12)                # normalized readings: 0..NORM_ONE
+NORM_ONE = const(1 << NORM_BITS)
+ERROR_BITS = const(12)               # scaled error: value / ERROR_ONE
+ERROR_ONE = const(1 << ERROR_BITS)
+SPAN_BITS = const(13)                # spans are scaled to just below 2**SPAN_BITS
+RECIP_BITS = const(29)               # reciprocal scale table precision
+NORM_ROUND = const(1 << (RECIP_BITS - NORM_BITS - 1))
+ERROR_GAIN = const(14)               # error multiplier applied by both paths
+FIXED_TOLERANCE = 0.01               # max |fixed - float| scaled error
+
+# What _track() found in the tick's reading
+TRACK_CENTROID = const(0)            # full sweep: use the centroid
+TRACK_FIT = const(1)                 # tracked: use the interpolated position
+TRACK_SWEEP = const(2)               # tracked but not trusted: sweep the rest
 
 class LineSensorDriver:
-    def __init__(self, line_pins, brightness_pin=None, led_pin=None, window_size=10, error_range=(-5, 5)):
+    def __init__(self, line_pins, brightness_pin=None, led_pin=None, window_size=10, error_range=(-5, 5), fixed_point=False,
+                 tracking=False, track_radius=1):
         # Initializes line sensors, brightness control, and LED control.
 
         self.adc_line = [ADC(Pin(pin)) for pin in line_pins]
@@ -39,11 +73,25 @@ class LineSensorDriver:
         self.last_time = ticks_us()
         self.dt = 0
 
-        # Moving average buffers
+        # Optional background sampler (see line_sampler.py)
+        self.sampler = None
+        self.frame = array('H', [0] * (self.num_line_sensors + 1))
+        self.frame_seq = 0
+
+        # Moving average ring buffers: window_size slots per channel in one flat
+        # array, with a running sum per channel so each update is O(1)
         self.window_size = window_size
-        self.buffers = [[] for _ in range(self.num_line_sensors)]
+        self.ring = array('H', [0] * (self.num_line_sensors * window_size))
+        self.ring_sums = array('l', [0] * self.num_line_sensors)
+        self.ring_index = 0
+        self.ring_count = 0
+        self.skipped = array('B', [0] * self.num_line_sensors)  # Newest slots filled with white, per channel
+        self.held = array('H', [0] * self.num_line_sensors)     # Last real inverted reading, per channel
         self.positions = [i + 1 for i in range(self.num_line_sensors)]
 
+        # Normalized readings, reused by every call to line_reading()
+        self.normalized = array('f', [0.0] * self.num_line_sensors)
+
         # Calibration data
         self.black_calib = [0] * self.num_line_sensors
         self.white_calib = [0] * self.num_line_sensors
@@ -51,18 +99,73 @@ class LineSensorDriver:
         # Error range for scaled error output
         self.error_range = error_range
 
+        # Fixed-point mode: offset and reciprocal scale tables per channel
+        self.fixed_point = fixed_point
+        self.calib_sign = array('b', [0] * self.num_line_sensors)
+        self.calib_shift = array('b', [0] * self.num_line_sensors)
+        self.calib_offset = array('l', [0] * self.num_line_sensors)
+        self.calib_span = array('l', [0] * self.num_line_sensors)
+        self.calib_recip = array('l', [0] * self.num_line_sensors)
+        self.white_raw = array('H', [0] * self.num_line_sensors)
+        self.mid_raw = array('H', [0] * self.num_line_sensors)
+        self.normalized_q = array('H', [0] * self.num_line_sensors)
+        self.error_min_q = 0
+        self.error_max_q = 0
+        self.build_tables()
+
+        # Tracking mode: read window, line position and fallback statistics
+        self.tracking = tracking
+        self.track_radius = track_radius      # Channels read on each side of the line
+        self.min_contrast = NORM_ONE * 3 // 10 # Darkest channel must be this far below white
+        self.max_line_width = 3               # More dark channels: crossing or diamond
+        self.max_outside = NORM_ONE // 4      # Darkest channel left out of the window on a full sweep
+        self.refresh_every = 10               # Forced full sweep interval (ticks)
+        self.read_lo = 0
+        self.read_hi = self.num_line_sensors
+        self.since_full = 0
+        self.line_width = 0                   # Dark channels on the last tick
+        self.line_position_q = 0              # Line position (1..n) in 1/ERROR_ONE units
+        self.track_error_q = 0                # Scaled error from line_position_q (1/ERROR_ONE)
+        self.full_sweeps = 0
+        self.tracked_reads = 0
+        self.fallbacks = 0
+
+    def attach_sampler(self, sampler):
+        # Takes readings from a running LineSampler instead of reading the ADCs.
+        self.sampler = sampler
+
     def update(self):
         # Updates sensor readings and calculates the time difference since the last update.
+        # With a sampler attached, dt and last_time come from the frame timestamps.
+
+        if self.sampler:
+            self.frame_seq = self.sampler.read(self.frame)
+            now = self.sampler.read_stamp
+            self.dt = ticks_diff(now, self.last_time)
+            self.last_time = now
+            for i in range(self.read_lo, self.read_hi):
+                self.line_values[i] = self.frame[i]
+            self.brightness_value = self.frame[self.num_line_sensors]
+            self._fill_unread()
+            return
 
         now = ticks_us()
         self.dt = ticks_diff(now, self.last_time)
         self.last_time = now
 
-        for i, adc in enumerate(self.adc_line):
-            self.line_values[i] = adc.read()
+        for i in range(self.read_lo, self.read_hi):
+            self.line_values[i] = self.adc_line[i].read()
 
         if self.adc_brightness:
             self.brightness_value = self.adc_brightness.read()
+        self._fill_unread()
+
+    def _fill_unread(self):
+        # Channels outside the tracking window report the white calibration.
+        for i in range(self.read_lo):
+            self.line_values[i] = self.white_raw[i]
+        for i in range(self.read_hi, self.num_line_sensors):
+            self.line_values[i] = self.white_raw[i]
 
     def get_values(self):
         # Returns the current sensor readings.
@@ -111,6 +214,7 @@ class LineSensorDriver:
         input()
         self.white_calib = self.sample_inverted()
         print("White calibration complete:", self.white_calib)
+        self.build_tables()
 
         print("Place at start to read heading, then press Enter.")
         input()
@@ -122,41 +226,395 @@ class LineSensorDriver:
 
         print(f"Initial Heading Stored: {calib_heading:.2f} degrees")
 
-    def line_reading(self):
-        # Computes the error for line tracking based on sensor readings.
+    def load_calibration(self, black, white):
+        # Uses stored black/white calibration instead of running calibrate().
+        self.black_calib = list(black)
+        self.white_calib = list(white)
+        self.build_tables()
+
+    def reset_filter(self):
+        # Clears the moving average history; in tracking mode the next read
+        # is a full sweep, so every channel has a real reading again.
+        for i in range(len(self.ring)):
+            self.ring[i] = 0
+        for i in range(self.num_line_sensors):
+            self.ring_sums[i] = 0
+        self.ring_index = 0
+        self.ring_count = 0
+        for i in range(self.num_line_sensors):
+            self.skipped[i] = 0
+        self.read_lo = 0
+        self.read_hi = self.num_line_sensors
+        self.since_full = 0
+        if self.sampler:
+            self.sampler.set_window(0, self.num_line_sensors)
+
+    def build_tables(self):
+        # Precomputes the per-channel tables used by line_reading_fixed().
+        # Offsets and spans are in moving-sum units (reading * window_size),
+        # shifted left so small spans keep SPAN_BITS of resolution.
+
+        window = self.window_size
+        for i in range(self.num_line_sensors):
+            black = self.black_calib[i]
+            diff = self.white_calib[i] - black
+            sign = 1 if diff > 0 else -1 if diff < 0 else 0
+            shift = 0
+            while (sign != 0 and abs(diff) * window * (2 << shift) <= (1 << SPAN_BITS)
+                   and (4096 * window) << (shift + 1) < (1 << 29)):
+                shift += 1
+            span = round(sign * diff * window * (1 << shift))
+            self.calib_sign[i] = sign
+            self.calib_shift[i] = shift
+            self.calib_offset[i] = round(sign * black * window * (1 << shift))
+            self.calib_span[i] = span
+            self.calib_recip[i] = ((1 << RECIP_BITS) + span // 2) // span if span > 0 else 0
+            self.white_raw[i] = min(4095, max(0, round(4096 - self.white_calib[i])))
+            self.mid_raw[i] = min(4095, max(0, round(4096 - (black + self.white_calib[i]) / 2)))
+
+        self.error_min_q = round(self.error_range[0] * ERROR_ONE)
+        self.error_max_q = round(self.error_range[1] * ERROR_ONE)
+
+    def _push_frame(self):
+        # Reads the sensors and pushes the inverted readings into the ring,
+        # replacing the oldest slot. Returns the number of valid slots.
+        # Channels outside the tracking window are pushed as filled (white)
+        # and counted as skipped; the next real reading of a skipped channel
+        # also replaces those white slots, so the average does not stay white.
 
         self.update()
 
-        raw_values = self.get_values()
-        inverted = [4096 - x for x in raw_values]
+        n = self.num_line_sensors
+        window = self.window_size
+        ring = self.ring
+        sums = self.ring_sums
+        values = self.line_values
+        skipped = self.skipped
+        held = self.held
+        lo = self.read_lo
+        hi = self.read_hi
+
+        if self.ring_count < window:
+            self.ring_count += 1
+        slot = self.ring_index
+        for i in range(n):
+            inverted = 4096 - values[i]
+            sums[i] += inverted - ring[slot]
+            ring[slot] = inverted
+            slot += window
+            if i < lo or i >= hi:
+                if skipped[i] < window:
+                    skipped[i] += 1
+            else:
+                if skipped[i]:
+                    self._refill(i, self.ring_index)
+                held[i] = inverted
+        self.ring_index += 1
+        if self.ring_index == window:
+            self.ring_index = 0
+        return self.ring_count
+
+    def _refill(self, i, slot):
+        # Replaces channel i's skipped slots, the ones just before slot, with
+        # its last real reading: what the channel saw before a crossing or a
+        # branch reached it, not the reading that shows one.
+        window = self.window_size
+        ring = self.ring
+        base = i * window
+        value = self.held[i]
+        for _ in range(self.skipped[i]):
+            slot = (slot if slot else window) - 1
+            self.ring_sums[i] += value - ring[base + slot]
+            ring[base + slot] = value
+        self.skipped[i] = 0
 
-        moving_avg = []
-        for i in range(self.num_line_sensors):
-            self.buffers[i].append(inverted[i])
-            if len(self.buffers[i]) > self.window_size:
-                self.buffers[i].pop(0)
-            avg_val = sum(self.buffers[i]) / len(self.buffers[i])
-            moving_avg.append(avg_val)
-
-        # Normalize sensor readings
-        normalized = []
-        for i in range(self.num_line_sensors):
-            diff = self.white_calib[i] - self.black_calib[i]
-            norm = (moving_avg[i] - self.black_calib[i]) / diff if diff != 0 else 0
-            norm = max(0, min(norm, 1))
-            normalized.append(norm)
+    def line_reading(self):
+        # Computes the error for line tracking based on sensor readings.
+        # The returned normalized array is reused on the next call.
+
+        count = self._push_frame()
+        scaled_error = self._centroid(count)
+        if self.tracking:
+            lo = self.read_lo
+            hi = self.read_hi
+            verdict = self._track()
+            if verdict == TRACK_FIT:
+                scaled_error = self.track_error_q / ERROR_ONE
+            elif verdict == TRACK_SWEEP and self._sweep_unread(lo, hi):
+                scaled_error = self._centroid(count)
+
+        return scaled_error, self.normalized
+
+    def _centroid(self, count):
+        # Floating point error from the weighted centroid of the ring averages.
+
+        n = self.num_line_sensors
+        sums = self.ring_sums
+
+        # Normalize sensor readings and accumulate the weighted centroid; the
+        # readings are also kept in NORM_ONE units for tracking and the recorder
+        normalized = self.normalized
+        normalized_q = self.normalized_q
+        total_weight = 0
+        weighted_sum = 0
+        for i in range(n):
+            black = self.black_calib[i]
+            diff = self.white_calib[i] - black
+            norm = (sums[i] / count - black) / diff if diff != 0 else 0
+            if norm < 0:
+                norm = 0
+            elif norm > 1:
+                norm = 1
+            normalized[i] = norm
+            normalized_q[i] = int(norm * NORM_ONE)
+            total_weight += norm
+            weighted_sum += norm * self.positions[i]
 
         # Compute weighted centroid for line position
-        total_weight = sum(normalized)
+        center = (n + 1) / 2
         if total_weight > 0:
-            centroid = sum(n * pos for n, pos in zip(normalized, self.positions)) / total_weight
+            centroid = weighted_sum / total_weight
         else:
-            centroid = (self.num_line_sensors + 1) / 2
+            centroid = center
 
-        center = (self.num_line_sensors + 1) / 2
         error = centroid - center
 
         # Scale error to the desired range
-        scaled_error = max(self.error_range[0], min(error * 14, self.error_range[1]))
+        return max(self.error_range[0], min(error * ERROR_GAIN, self.error_range[1]))
+
+    def line_reading_fixed(self):
+        # Integer-only version of line_reading(). Returns the scaled error in
+        # units of 1/ERROR_ONE and the normalized readings in units of
+        # 1/NORM_ONE (the array is reused on the next call).
+
+        count = self._push_frame()
+        error = self._centroid_fixed(count)
+        if self.tracking:
+            lo = self.read_lo
+            hi = self.read_hi
+            verdict = self._track()
+            if verdict == TRACK_FIT:
+                error = self.track_error_q
+            elif verdict == TRACK_SWEEP and self._sweep_unread(lo, hi):
+                error = self._centroid_fixed(count)
+
+        return error, self.normalized_q
+
+    def _centroid_fixed(self, count):
+        # Integer error (1/ERROR_ONE units) from the weighted centroid of the ring averages.
+
+        n = self.num_line_sensors
+        window = self.window_size
+        sums = self.ring_sums
+        sign = self.calib_sign
+        shift = self.calib_shift
+        offset = self.calib_offset
+        span = self.calib_span
+        recip = self.calib_recip
+
+        # Normalize against the precomputed tables; clamping before the
+        # multiply keeps every product below 2**30 (a small int)
+        normalized = self.normalized_q
+        total = 0
+        weighted = 0
+        for i in range(n):
+            s = sign[i] * sums[i]
+            sh = shift[i]
+            if count != window:
+                # Rescale a partly filled window to window_size samples
+                s *= window
+                q = s // count
+                if sh >= 0:
+                    s = (q << sh) + (((s - q * count) << sh) // count)
+                else:
+                    s = q >> -sh
+            elif sh >= 0:
+                s <<= sh
+            else:
+                s >>= -sh
+            d = s - offset[i]
+            if d <= 0 or span[i] == 0:
+                norm = 0
+            elif d >= span[i]:
+                norm = NORM_ONE
+            else:
+                norm = (d * recip[i] + NORM_ROUND) >> (RECIP_BITS - NORM_BITS)
+            normalized[i] = norm
+            total += norm
+            weighted += norm * self.positions[i]
+
+        # Centroid offset from the center: (2 * weighted - (n + 1) * total) / (2 * total),
+        # divided in two steps so the shifted remainder stays a small int
+        if total > 0:
+            num = 2 * weighted - (n + 1) * total
+            quot = num // total
+            error = (quot << (ERROR_BITS - 1)) + (((num - quot * total) << (ERROR_BITS - 1)) + (total >> 1)) // total
+        else:
+            error = 0
 
-        return scaled_error, normalized
+        # Scale error to the desired range
+        error *= ERROR_GAIN
+        if error < self.error_min_q:
+            error = self.error_min_q
+        elif error > self.error_max_q:
+            error = self.error_max_q
+
+        return error
+
+    def _track(self):
+        # Finds the line (the darkest channel, since normalized readings are 1
+        # over white), interpolates its position with a parabola through the
+        # neighbouring channels and picks the channels to read next tick.
+        # Returns TRACK_FIT when a tracked read found the line where the fit
+        # can be trusted (track_error_q holds the error), TRACK_SWEEP when a
+        # tracked read cannot be trusted and TRACK_CENTROID after a full sweep.
+
+        n = self.num_line_sensors
+        norm = self.normalized_q
+        lo = self.read_lo
+        hi = self.read_hi
+        full = hi - lo == n
+        if full:
+            self.full_sweeps += 1
+        else:
+            self.tracked_reads += 1
+
+        peak = lo
+        width = 0
+        darkness = 0
+        for i in range(lo, hi):
+            if norm[i] < norm[peak]:
+                peak = i
+            if norm[i] < NORM_ONE // 2:
+                width += 1
+            darkness += NORM_ONE - norm[i]
+        dark = NORM_ONE - norm[peak]
+
+        # Dark channels must form one run around the peak (a single line)
+        run = 1 if norm[peak] < NORM_ONE // 2 else 0
+        i = peak - 1
+        while i >= lo and norm[i] < NORM_ONE // 2:
+            run += 1
+            i -= 1
+        i = peak + 1
+        while i < hi and norm[i] < NORM_ONE // 2:
+            run += 1
+            i += 1
+
+        # Vertex of the parabola through the peak and its neighbours
+        offset = 0
+        if 0 < peak < n - 1:
+            left = NORM_ONE - norm[peak - 1]
+            right = NORM_ONE - norm[peak + 1]
+            denom = 2 * (left - 2 * dark + right)
+            if denom < 0:
+                offset = ((left - right) << ERROR_BITS) // denom
+                if offset > ERROR_ONE // 2:
+                    offset = ERROR_ONE // 2
+                elif offset < -(ERROR_ONE // 2):
+                    offset = -(ERROR_ONE // 2)
+        position = ((peak + 1) << ERROR_BITS) + offset
+        self.line_position_q = position
+
+        # Trust the fit only for a single narrow line that is not at the edge
+        # of the read window; a window that is dark all across is a crossing
+        confident = (dark >= self.min_contrast and width == run and width <= self.max_line_width
+                     and (full or width < hi - lo))
+        at_edge = (peak == lo and lo > 0) or (peak == hi - 1 and hi < n)
+
+        trusted = confident and not at_edge
+
+        # A line that widens while tracked is a crossing or a diamond coming;
+        # the newest frame shows one, or a branch leaving the window, before
+        # the moving average does: a dark reading at the window's edge
+        widened = width > self.line_width
+        self.line_width = width
+        if widened and not full:
+            trusted = False
+        if trusted and not full:
+            values = self.line_values
+            sign = self.calib_sign
+            mid = self.mid_raw
+            if ((lo > 0 and sign[lo] * (values[lo] - mid[lo]) > 0)
+                    or (hi < n and sign[hi - 1] * (values[hi - 1] - mid[hi - 1]) > 0)):
+                trusted = False
+
+        next_lo = peak - self.track_radius if peak > self.track_radius else 0
+        next_hi = peak + self.track_radius + 1
+        if next_hi > n:
+            next_hi = n
+
+        # Narrow the window only when a full sweep shows white outside it, as
+        # the tracked reads assume: not while a crossing or the other branch
+        # of a diamond is still in the moving average
+        narrow = trusted
+        if narrow and full:
+            limit = NORM_ONE - self.max_outside
+            values = self.line_values
+            sign = self.calib_sign
+            mid = self.mid_raw
+            for i in range(n):
+                if (i < next_lo or i >= next_hi) and (norm[i] < limit or sign[i] * (values[i] - mid[i]) > 0):
+                    narrow = False
+                    break
+
+        if narrow and self.since_full < self.refresh_every:
+            self.since_full += 1
+            self.read_lo = next_lo
+            self.read_hi = next_hi
+        else:
+            if not full and not trusted:
+                self.fallbacks += 1
+            self.since_full = 0
+            self.read_lo = 0
+            self.read_hi = n
+
+        if self.sampler:
+            self.sampler.set_window(self.read_lo, self.read_hi)
+
+        if full:
+            return TRACK_CENTROID
+        if not trusted:
+            return TRACK_SWEEP
+
+        # The centroid of a full sweep with white outside the window, taking
+        # the fitted position for the centroid of the dark channels:
+        # darkness * (center - position) / (n * NORM_ONE - darkness)
+        error = darkness * (((n + 1) << (ERROR_BITS - 1)) - position) // (n * NORM_ONE - darkness)
+        error *= ERROR_GAIN
+        if error < self.error_min_q:
+            error = self.error_min_q
+        elif error > self.error_max_q:
+            error = self.error_max_q
+        self.track_error_q = error
+        return TRACK_FIT
+
+    def _sweep_unread(self, lo, hi):
+        # Reads the channels outside the window lo..hi into their skipped
+        # slots, the newest included. Returns False with a sampler attached:
+        # its frame holds only the window, so the sweep waits for the next frame.
+
+        if self.sampler:
+            return False
+        window = self.window_size
+        ring = self.ring
+        sums = self.ring_sums
+        values = self.line_values
+        newest = (self.ring_index if self.ring_index else window) - 1
+        for i in range(self.num_line_sensors):
+            if lo <= i < hi:
+                continue
+            values[i] = self.adc_line[i].read()
+            slot = newest + i * window
+            inverted = 4096 - values[i]
+            sums[i] += inverted - ring[slot]
+            ring[slot] = inverted
+            self.skipped[i] -= 1
+            if self.skipped[i]:
+                self._refill(i, newest)
+            self.held[i] = inverted
+        return True
+
+    def tracking_stats(self):
+        # Returns (full sweeps, tracked reads, fallbacks to a full sweep).
+        return self.full_sweeps, self.tracked_reads, self.fallbacks
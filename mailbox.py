@@ -0,0 +1,85 @@
+"""
+mailbox.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Latest-value mailbox for single-producer, single-consumer handoff between
+cooperative tasks. A mailbox holds only the newest value, with a sequence
+number and the ticks_us() timestamp of the put, so a consumer always acts
+on the freshest sample and can tell when nothing new has arrived.
+
+Functionality:
+- put(value, stamp=None) overwrites the value, advances the sequence
+  number and stamps it (ticks_us() unless a stamp is given, e.g. the time
+  the sample was taken). A put over a value nobody read counts as
+  overwritten.
+- get() returns the latest value and marks it read; any() is True while
+  there is an unread value. get() after no new put returns the same value
+  again: like a Share, never a made-up one.
+- API-compatible with task_share: put/get as Share (the in_ISR argument is
+  accepted and ignored), empty/any/full/num_in/clear as a one-deep Queue
+  that never fills, so a put never blocks or drops the new value.
+- There is no locking. Cooperative tasks cannot interrupt each other
+  between the value and sequence updates; do not put from an ISR.
+"""
+
+from array import array
+from time import ticks_us, ticks_diff
+import task_share
+
+SEQ_MASK = const(0x3FFFFFFF)  # Sequence numbers stay small ints
+
+class Mailbox:
+    def __init__(self, type_code='f', name=None):
+        self._buffer = array(type_code, [0])
+        self._name = str(name)
+        self.seq = 0          # Sequence number of the latest put, 0 before the first
+        self.stamp = 0        # ticks_us() of the latest put
+        self.read_seq = 0     # Sequence number of the latest get
+        self.overwritten = 0  # Puts that replaced an unread value
+        task_share.share_list.append(self)
+
+    def put(self, data, stamp=None, in_ISR=False):
+        # Stores data as the latest value.
+        if self.seq != self.read_seq:
+            self.overwritten += 1
+        self._buffer[0] = data
+        self.stamp = ticks_us() if stamp is None else stamp
+        self.seq = (self.seq + 1) & SEQ_MASK
+
+    def get(self, in_ISR=False):
+        # Returns the latest value and marks it read.
+        self.read_seq = self.seq
+        return self._buffer[0]
+
+    def peek(self):
+        # Returns the latest value without marking it read.
+        return self._buffer[0]
+
+    def any(self):
+        # True while the latest value is unread.
+        return self.seq != self.read_seq
+
+    def empty(self):
+        return self.seq == self.read_seq
+
+    def full(self):
+        return False
+
+    def num_in(self):
+        return 0 if self.seq == self.read_seq else 1
+
+    def clear(self):
+        # Marks the latest value read.
+        self.read_seq = self.seq
+
+    def age_us(self):
+        # Microseconds since the latest put.
+        return ticks_diff(ticks_us(), self.stamp)
+
+    def __repr__(self):
+        return '{:<12s} Mailbox<{:s}> seq {:d}, overwritten {:d}'.format(
+            self._name, self._buffer.typecode, self.seq, self.overwritten)
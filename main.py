@@ -12,9 +12,23 @@ and processes data to make motor decisions. The main script includes:
 1. **Battery Regulation:** 
    - Reads battery voltage from a voltage divider and adjusts motor effort 
      to maintain expected performance despite battery depletion.
+   - The Battery task keeps reading it through the run, updating the 
+     compensation smoothly and flagging a low battery.
+   - When gains.txt is on flash (gain_table.py), the line-following gains 
+     and moving average window are taken from its row for the starting 
+     voltage instead of the defaults in PID_controller.py.
 
 2. **Line Sensor Initialization & Calibration:** 
-   - Initializes the line sensors and performs calibration.
+   - Initializes the line sensors and performs calibration, or loads the 
+     calibration profile saved on flash by the previous calibration. 
+     Delete calib.bin to force a fresh calibration.
+   - The BNO055 is reset first and boots while the rest of setup runs. 
+     A profile is only used when the start heading is within 
+     profile_heading_tolerance of the saved one; with the check off, the 
+     bring-up finishes inside the IMU Service task.
+   - With use_heading_estimator, turns and heading holds use a heading 
+     integrated from the gyro at 200 Hz and corrected by the fused heading 
+     (heading_estimator.py) instead of the fused heading alone.
    - Records the initial heading of the Romi at the start of the track.
    - This heading is used for realignment in the final task.
 
@@ -25,170 +39,347 @@ and processes data to make motor decisions. The main script includes:
 4. **Encoder Update Task:** 
    - Initializes the left and right encoders.
    - Continuously updates and pushes position data into a queue.
-   - This data is used to track distance traveled and determine 
-     when the final task should begin.
+   - Updates the odometry, which integrates both encoders into a pose 
+     (x, y, heading) fused with the IMU heading, and publishes the arc 
+     length travelled that determines when the final task should begin.
 
-5. **Final Task:** 
-   - Triggers when the desired distance (113) is reached, marking 
-     the end of the line track and the beginning of the grid.
+5. **Mission Task:** 
+   - Steps through the mission plan (mission.py), a table of course phases 
+     with their end conditions. The default plan, mission.COURSE, is the 
+     former final task and bump handler:
+   - Follows the line until the arc length reaches LINE_SECTION_LENGTH 
+     (3.95 m, the distance of the former 113 radian left wheel trigger), 
+     marking the end of the line track and the beginning of the grid.
    - The Romi stops, swivels to a 180-degree offset of the initial 
-     heading for perfect alignment.
-   - Executes a sequence of movements:
-     1. Moves forward a set distance.
-     2. Turns 90 degrees toward the obstacle wall.
-     3. Moves forward before reaching the wall.
-     4. Turns -90 degrees to avoid collision.
-     5. Moves forward to hit the second cup for a time deduction.
-     6. Turns -90 degrees and moves forward.
-     7. Turns -90 degrees again before reaching the final checkpoint.
+     heading for perfect alignment, and drives holding it to the wall, 
+     then runs the timed wall maneuver when the bump sensors hit.
+   - Motion phases are queued on the motion executor, which runs them a 
+     tick at a time beside the other tasks.
+   - The wall maneuver (bump_sensor.WALL_MANEUVER) is a run of timed arc 
+     phases: reverse, turn right, forward, turn left, forward.
+   - The bump sensors only raise the bump flag from their interrupt 
+     (bump_sensor.py); the mission's "to wall" phase ends on that flag, so 
+     no task of its own polls for bumps.
 
 6. **Task Scheduler:** 
-   - Manages critical tasks: Line Sensor, PID Controller, Left Motor, 
-     Right Motor, and Encoder Update.
+   - Manages critical tasks: Line Sensor, PID Controller, the Left and 
+     Right Speed loops (or one open-loop Motors task updating both wheels), 
+     Encoder Update, Motion, Battery, and the IMU Service, which is the only 
+     task that reads the BNO055 and caches heading for the others.
    - Optimized for efficiency by avoiding prints during execution.
-   - Tasks that only run once (e.g., Final Task) are only executed 
-     when conditions are met (encoder distance ≥ 113 and white line detected).
+   - The flight recorder keeps the latest control ticks (line error, PID 
+     terms, efforts, encoders, heading, line channels) and saves them to 
+     flight.bin on exit; decode with host/decode_flight.py.
+   - Every task can be profiled (run time, start latency, missed deadlines 
+     and overruns); send 'p' over the REPL UART for a dump. With 
+     track_alloc it also shows the heap bytes each task allocates per run.
+   - Garbage collection is scheduled (gc_scheduler.py): a priority 0 task 
+     collects once the heap has grown gc_threshold bytes, so collections 
+     fall between control runs instead of inside them.
+   - With capture_path set, the raw inputs of the line sensor, encoder, 
+     IMU and PID path are streamed to that file (input_capture.py) for 
+     replay on a PC with host/replay_capture.py.
+   - Course phases only start when the previous phase's end condition is 
+     met (e.g., arc length ≥ LINE_SECTION_LENGTH).
+   - Modules only some settings use (gain table, calibration profile, 
+     sampler, speed loops, input capture) are imported where the setting 
+     is read. host/build_mpy.py precompiles the modules to .mpy so the 
+     board skips compiling them at boot; the boot timeline printed before 
+     scheduling shows the time and heap each setup step took.
 
 7. **Keyboard Interrupt Handling:** 
    - Stops and disables motors safely when the REPL is restarted.
 """
 
+import boot_timeline
+boot_timeline.mark("main.py")
+
 import cotask
 from cotask import Task, task_list
 from pyb import Pin, ADC
 import init
-import gc
+import state
 from time import ticks_ms
-from task_share import Share
 
 # Ensure shared variables are initialized
-init.final_flag = Share('b', thread_protect=True, name="Final Flag")
 init.final_flag.put(0)
 
-init.current_encoder_left = Share('f', thread_protect=True, name="Current Encoder Left")
-init.current_encoder_left.put(0)
-
-# Import drivers and tasks
-from linesensor import LineSensorDriver
+# Import drivers and tasks; modules only some configurations use are imported
+# where their setting is read below, so a run loads only what it needs
+from linesensor import LineSensorDriver, ERROR_ONE
 from PID_controller import PID_value
-from left_motor import task_left_motor, left_motor
-from right_motor import task_right_motor, right_motor
+from left_motor import left_motor
+from right_motor import right_motor
+from motor import MotorPair
 from imu import BNO055
-from bump_sensor import init_bump_sensors, task_bump_handling
+from imu_service import IMUService, CacheReader
+from bump_sensor import init_bump_sensors
 from encoder import Encoder
+from odometry import Odometry
+from motion import executor
+from mission import Mission, COURSE
+from battery_monitor import BatteryMonitor
+from task_profiler import TaskProfiler
+from gc_scheduler import GCScheduler
+from flight_recorder import FlightRecorder
+import PID_controller
+boot_timeline.mark("imports")
+
+# IMU reset: the BNO055 boots (about 650 ms) while the setup below runs
+imu = BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1, wait=False)
+
+# Heading estimator: gyro rate integrated every IMU read, corrected by the fused
+# heading, for the turn and heading hold controllers. False uses the fused heading.
+use_heading_estimator = False
+heading_estimator = None
+if use_heading_estimator:
+    from heading_estimator import HeadingEstimator
+    heading_estimator = HeadingEstimator()
+imu_period = 5 if use_heading_estimator else 20  # IMU service task period (ms)
 
 # Battery Voltage Measurement Setup
 battery_pin = Pin('PC4')
 battery_adc = ADC(battery_pin)
+battery_period = 100  # Battery task period (ms)
+battery = BatteryMonitor(battery_adc)
+motors = MotorPair(left_motor, right_motor)
+battery.attach(left_motor, right_motor)  # Motors cache the multiplier the monitor publishes
 
-def read_battery_voltage():
-    raw_val = battery_adc.read()
-    v_adc = (raw_val / 4095.0) * 3.3
-    return v_adc * (69.0 / 22.0)
-
-init_voltage = read_battery_voltage()
-V_nominal = 7.2
-computed_multiplier = 1.0 if init_voltage < 0.1 else V_nominal / init_voltage
-print("Initial battery voltage: %.2f V, constant multiplier: %.2f" % (init_voltage, computed_multiplier))
-init.constant_multiplier.put(computed_multiplier)
+init_voltage = battery.start()
+print("Initial battery voltage: %.2f V, constant multiplier: %.2f" % (init_voltage, battery.multiplier))
+boot_timeline.mark("battery")
 
 # Line Sensor Configuration
 line_sensor_pins = ['PA0', 'PA1', 'PA4', 'PB0', 'PC1', 'PC0', 'PC3']
 brightness_pin = 'PC2'
 window_size = 10
+use_fixed_point = True  # Integer-only line error computation
+use_tracking = False    # Read only the channels around the line
+line_sample_hz = 200    # Background sampling rate, 0 to read in the task
+line_sample_timer = 6
+
+# Gain table: line-following gains for the starting battery voltage (host/tune_line.py writes it)
+use_gain_table = True
+gain_table_path = 'gains.txt'
+gains = None
+if use_gain_table:
+    import gain_table
+    gains = gain_table.load(gain_table_path)
+if gains is not None:
+    (volts, PID_controller.Kp, PID_controller.Ki, PID_controller.Kd, PID_controller.base_speed,
+     window_size) = gain_table.select(gains, init_voltage)
+    init.kp_value.put(PID_controller.Kp)
+    print("Gains for %.2f V: Kp %g, Ki %g, Kd %g, base speed %d, window %d" % (
+        volts, PID_controller.Kp, PID_controller.Ki, PID_controller.Kd, PID_controller.base_speed, window_size))
+
+# Calibration profile: a valid profile on flash skips the interactive calibration
+use_profile = True
+profile_path = 'calib.bin'
+# Degrees the start heading may differ from the profile's before the profile counts
+# as stale and the robot recalibrates. Hand placement at the start is within a few
+# degrees; None skips the check and lets the BNO055 finish booting in the IMU
+# Service task instead of before the run.
+profile_heading_tolerance = 10
+if use_profile:
+    import calib_profile
+
+sensor_driver = LineSensorDriver(line_pins=line_sensor_pins, brightness_pin=brightness_pin, window_size=window_size, fixed_point=use_fixed_point,
+                                 tracking=use_tracking)
+boot_timeline.mark("line sensor")
+
+profile = calib_profile.load(profile_path, len(line_sensor_pins)) if use_profile else None
+if profile is not None and profile_heading_tolerance is not None:
+    imu.initialize(profile.imu_data)  # The heading check needs the sensor now, with the saved offsets
+warm_start = profile is not None and calib_profile.check_live(
+    sensor_driver, profile, imu, heading_tolerance=profile_heading_tolerance)
+boot_timeline.mark("profile")
+imu_boot = None
+if warm_start:
+    sensor_driver.load_calibration(profile.black, profile.white)
+    if not imu.ready:
+        imu_boot = imu.bring_up(profile.imu_data)  # Finished by the IMU Service task
+    init.init_heading.put(int(profile.heading))
+    print("Calibration profile loaded, start heading %.2f degrees" % profile.heading)
+else:
+    imu.initialize()
+    boot_timeline.mark("imu ready")
+    sensor_driver.calibrate(imu)
+    if use_profile:
+        calib_profile.save(profile_path, sensor_driver.black_calib, sensor_driver.white_calib,
+                           imu.read_calib_data(), init.init_heading.get())
+state.take(state.BUMP)  # Drop bumps from handling the robot during calibration
+boot_timeline.mark("calibration" if warm_start else "calibration (interactive)")
+
+# Background sampling starts after calibration, which reads the ADCs directly
+line_sampler = None
+if line_sample_hz:
+    from line_sampler import LineSampler, ADCBackend
+    line_sampler = LineSampler(ADCBackend(sensor_driver.adc_line, sensor_driver.adc_brightness),
+                               timer_num=line_sample_timer, freq=line_sample_hz)
+    sensor_driver.attach_sampler(line_sampler)
+    line_sampler.start()
+
+if not warm_start:
+    input("Calibration complete. Press Enter to start the robot (motors will now move).")
+    boot_timeline.mark("start prompt (interactive)")
+
+# IMU Service: the only task that talks to the BNO055 once scheduling starts
+imu_service = IMUService(imu, boot=imu_boot, estimator=heading_estimator)
+if imu.ready:
+    imu_service.refresh()
+final_heading = CacheReader(imu_service, estimator=heading_estimator)
+
+# Odometry: pose and arc length from both encoders, fused with the IMU heading
+left_enc = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
+right_enc = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
+odometry = Odometry(left_enc, right_enc, imu_service)
+executor.attach(odometry, final_heading)
+
+# Mission plan: the course phases the Mission task steps through (validated here)
+mission_plan = COURSE
+mission = Mission(mission_plan, executor, final_heading)
 
-imu = BNO055(SDA='PB9', SCL='PB8', RST='PA15', bus=1)
-imu.initialize()
+# Wheel speed loops: efforts become wheel speed setpoints (% of wheel_speed.FULL_SPEED)
+# tracked with encoder feedback. False drives the motors open loop with the battery multiplier.
+use_speed_loop = True
+speed_period = 5  # Wheel speed loop period (ms)
+if use_speed_loop:
+    from wheel_speed import WheelSpeedLoop
+    left_speed_loop = WheelSpeedLoop(left_motor, left_enc, init.left_effort, init.left_speed)
+    right_speed_loop = WheelSpeedLoop(right_motor, right_enc, init.right_effort, init.right_speed)
 
-sensor_driver = LineSensorDriver(line_pins=line_sensor_pins, brightness_pin=brightness_pin, window_size=window_size)
-sensor_driver.calibrate(imu)
-init.bump_flag = False
+# Flight recorder: one record per control tick in a fixed RAM ring, saved on exit.
+# record_stream_path also streams the whole run to flash (writes can stall the lowest priority task).
+record_capacity = 600
+record_path = 'flight.bin'
+record_stream_path = None
+recorder = FlightRecorder(record_capacity, len(line_sensor_pins), PID_controller.telemetry)
+recorder.attach(sensor_driver, left_enc, right_enc, imu_service)
+record_stream = None
+if record_stream_path:
+    record_stream = open(record_stream_path, 'wb')
+    recorder.write_header(record_stream)
 
-input("Calibration complete. Press Enter to start the robot (motors will now move).")
+# Input capture: raw sensor inputs streamed to a file for host/replay_capture.py
+# (about 15 kB/s; use a card or short runs). None disables it.
+capture_path = None
+capture = None
+capture_stream = None
+if capture_path:
+    from input_capture import InputCapture, CALL_LINE, CALL_PID
+    capture = InputCapture()
+    capture.attach(sensor_driver, line_sampler, left_enc, right_enc, imu_service)
+    capture_stream = open(capture_path, 'wb')
+    capture.write_header(capture_stream)
+    capture.start()
 
 # Line Sensor Task
 def task_linesensor_wrapper():
     while True:
-        scaled_error, _ = sensor_driver.line_reading()
-        if not init.collection_data_queue.full():
-            init.collection_data_queue.put(scaled_error)
+        if sensor_driver.fixed_point:
+            error_q, _ = sensor_driver.line_reading_fixed()
+            scaled_error = error_q / ERROR_ONE
+        else:
+            scaled_error, _ = sensor_driver.line_reading()
+        init.line_error.put(scaled_error, sensor_driver.last_time if line_sampler else None)
         yield 0
 
 # Encoder Update Task
 def task_encoder_update_real():
-    left_enc = Encoder(tim=1, chA_pin='PA9', chB_pin='PA8')
-    right_enc = Encoder(tim=8, chA_pin='PC7', chB_pin='PC6')
     while True:
         left_enc.update()
         right_enc.update()
-        if not init.encoder_left_data_queue.full():
-            init.encoder_left_data_queue.put(left_enc.get_position())
-        if not init.encoder_right_data_queue.full():
-            init.encoder_right_data_queue.put(right_enc.get_position())
-        init.current_encoder_left.put(left_enc.get_position())
-        yield 0
-
-# Final Task: Monitors encoder and adjusts heading if needed
-def task_final():
-    while True:
-        left_val = init.current_encoder_left.get()
-        if left_val >= 113:
-            init.final_flag.put(1)
-
-        if init.final_flag.get() == 1:
-            break
-        yield 0
-
-    while True:
-        current_heading = imu.read_heading()
-        target_heading = (init.init_heading.get() - 180) % 360
-        heading_error = target_heading - current_heading
-        heading_error = (heading_error + 180) % 360 - 180
-
-        if abs(heading_error) > 2:
-            correction = init.kp_value.get() * heading_error / 100
-            init.left_effort.put(int(correction))
-            init.right_effort.put(int(-correction))
-        else:
-            init.left_effort.put(25)
-            init.right_effort.put(25)
+        odometry.update()
+        odometry.publish()
+        init.left_position.put(left_enc.position)
+        init.right_position.put(right_enc.position)
         yield 0
 
 # Initialize Bump Sensors
 init_bump_sensors()
 
+# Task profiler: per-task run time and latency histograms; 'p' on the REPL
+# UART dumps them while running. False builds plain tasks with no overhead.
+use_profiler = True
+track_alloc = False  # Heap bytes per task run (gc.mem_alloc() around every run)
+profiler = TaskProfiler(enabled=use_profiler, track_alloc=track_alloc)
+if use_profiler:
+    print("Task profiler overhead: %.1f us per run" % profiler.overhead_us)
+
 # Enable Motors
-left_motor.enable()
-right_motor.enable()
-
-# Create Tasks
-task_list.append(Task(task_bump_handling, name="Bump Handler", priority=3, period=20))
-task_list.append(Task(task_linesensor_wrapper, name="Line Sensor", priority=2, period=11))
-task_list.append(Task(PID_value, name="PID Controller", priority=1, period=11))
-task_list.append(Task(task_left_motor, name="Left Motor", priority=0, period=11))
-task_list.append(Task(task_right_motor, name="Right Motor", priority=0, period=11))
-task_list.append(Task(task_encoder_update_real, name="Encoder Update", priority=0, period=25))
-task_list.append(Task(task_final, name="Final Task", priority=0, period=50))
-gc.collect()
+motors.enable()
+
+# Create Tasks (profiled unless use_profiler is False)
+task_list.append(profiler.task(mission.task, name="Mission", priority=3, period=10))
+task_list.append(profiler.task(executor.task, name="Motion", priority=2, period=10))
+task_list.append(profiler.task(capture.wrap(task_linesensor_wrapper, CALL_LINE) if capture else task_linesensor_wrapper,
+                               name="Line Sensor", priority=2, period=11))
+task_list.append(profiler.task(imu_service.task, name="IMU Service", priority=1, period=imu_period))
+task_list.append(profiler.task(capture.wrap(PID_value, CALL_PID) if capture else PID_value,
+                               name="PID Controller", priority=1, period=11))
+if use_speed_loop:
+    task_list.append(profiler.task(left_speed_loop.task, name="Left Speed", priority=3, period=speed_period))
+    task_list.append(profiler.task(right_speed_loop.task, name="Right Speed", priority=3, period=speed_period))
+else:
+    task_list.append(profiler.task(lambda: motors.task(init.left_effort, init.right_effort), name="Motors",
+                                   priority=0, period=11))
+task_list.append(profiler.task(task_encoder_update_real, name="Encoder Update", priority=0, period=25))
+task_list.append(profiler.task(battery.task, name="Battery", priority=0, period=battery_period))
+task_list.append(profiler.task(recorder.task, name="Recorder", priority=0, period=11))
+if record_stream:
+    task_list.append(profiler.task(lambda: recorder.flush_task(record_stream), name="Record Flush",
+                                   priority=0, period=100))
+if capture:
+    task_list.append(profiler.task(lambda: capture.flush_task(capture_stream), name="Capture Flush",
+                                   priority=0, period=50))
+if use_profiler:
+    task_list.append(Task(profiler.command_task, name="Profiler", priority=0, period=200))
+
+# Scheduled garbage collection: collect in an idle slot once the heap has grown
+# gc_threshold bytes; the automatic collector is only a backstop
+gc_threshold = 8192
+gc_scheduler = GCScheduler(threshold=gc_threshold)
+task_list.append(profiler.task(gc_scheduler.task, name="GC", priority=0, period=20))
+gc_scheduler.start()
+boot_timeline.mark("tasks")
 
 # Main Loop
 if __name__ == "__main__":
+    boot_timeline.mark("pri_sched")
+    boot_timeline.report()
     print("Starting all tasks. Press any bump sensor to stop motors.")
     while True:
         try:
             task_list.pri_sched()
         except KeyboardInterrupt:
             print("KeyboardInterrupt detected: stopping motors.")
-            left_motor.update(0)
-            right_motor.update(0)
-            left_motor.disable()
-            right_motor.disable()
+            if use_tracking:
+                print("Line tracking (full, tracked, fallbacks):", sensor_driver.tracking_stats())
+            print("Mission IMU samples (reads, repeats, last age us, max age us):", final_heading.stats())
+            profiler.dump()
+            print("GC (scheduled, automatic, worst us, mean us, heap after):", gc_scheduler.stats())
+            print("Battery (low events, V at last event, V now):", battery.stats())
+            if record_stream:
+                recorder.flush(record_stream)
+                record_stream.close()
+                print("Flight recorder: %d records streamed, %d lost" % (recorder.flushed, recorder.lost))
+            else:
+                recorder.save(record_path)
+            if capture:
+                capture.stop()
+                capture.flush(capture_stream)
+                capture_stream.close()
+                print("Input capture (events, bytes, most pending, overflowed):", capture.stats())
+            if line_sampler:
+                line_sampler.stop()
+            motors.brake()
+            motors.disable()
             break
         except Exception as e:
             print("Unhandled exception:", e)
-            left_motor.update(0)
-            right_motor.update(0)
-            left_motor.disable()
-            right_motor.disable()
+            if line_sampler:
+                line_sampler.stop()
+            motors.brake()
+            motors.disable()
             raise
     print('\n' + str(cotask.task_list))
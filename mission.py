@@ -0,0 +1,231 @@
+"""
+mission.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Mission plans: the course as a compact table of phases, stepped through by
+an interpreter task. Course segments can be retuned by editing the table
+instead of task code, and a plan can be validated and simulated on the
+host (host/check_mission.py) before a trial.
+
+Functionality:
+- A plan is a tuple of phases (name, action, args, until, limit):
+    LINE   ()                    follow the line (PID_value)
+    ALIGN  (heading, tolerance)  spin to a heading
+    DRIVE  (effort, hold)        drive straight, holding a heading (or None)
+    TURN   (effort, heading)     spin at effort, the short way, to a heading
+    ARC    (left, right)         independent wheel efforts
+    WAIT   ()                    leave whatever runs alone, e.g. wait for a bump
+    STOP   ()                    stop the wheels
+  Headings are degrees from the start heading (init.init_heading),
+  clockwise as the BNO055 reports them.
+- A phase ends on its until condition:
+    UNTIL_DONE      the motion executor finished the phase's segment
+    UNTIL_DISTANCE  limit metres of odometry arc length since the phase began
+    UNTIL_TIME      limit ms since the phase began
+    UNTIL_BUMP      a bump sensor hit (a bump from before the phase is dropped)
+  Time and distance ends of motion phases become the executor segment's
+  own ends, so the segment stops on the executor's tick. While such a
+  phase runs, the next one is queued behind it if it is an ALIGN, DRIVE
+  or ARC phase that also ends with its segment, so the executor goes from
+  one to the next without stopping the wheels (a TURN is queued when it
+  starts, since its direction depends on the heading then). A phase that ends on a bump, or
+  a line or wait phase that ends on distance or time, clears the executor
+  before the next phase starts.
+- Line following runs only in LINE phases (init.state_input is 0); the end
+  of the first LINE phase sets init.final_flag as the final task did.
+- validate(plan) returns a list of problems (unknown actions or ends,
+  wrong argument counts, efforts out of range, phases that can never end).
+  Mission raises ValueError for a plan with any.
+- Mission.task() does a fixed amount of work per run: it checks the
+  running phase's end condition and, when it is met, starts the next phase
+  (queueing at most two segments). The wheels stop after the last phase.
+  splits holds the ticks_ms() each phase started, for lap timing.
+- COURSE is what the final task and the bump handler did before: follow
+  the line for LINE_SECTION_LENGTH, align to the reverse of the start
+  heading, drive holding it until the bump sensors hit the wall, then the
+  timed wall maneuver (bump_sensor.WALL_MANEUVER).
+"""
+
+from array import array
+from time import ticks_ms, ticks_diff
+import init
+import state
+from motion import wrap_degrees
+from odometry import WHEEL_RADIUS
+from bump_sensor import WALL_MANEUVER
+
+# Actions
+LINE = const(0)
+ALIGN = const(1)
+DRIVE = const(2)
+TURN = const(3)
+ARC = const(4)
+WAIT = const(5)
+STOP = const(6)
+
+# End conditions
+UNTIL_DONE = const(0)
+UNTIL_DISTANCE = const(1)
+UNTIL_TIME = const(2)
+UNTIL_BUMP = const(3)
+
+ACTION_NAMES = ("LINE", "ALIGN", "DRIVE", "TURN", "ARC", "WAIT", "STOP")
+UNTIL_NAMES = ("DONE", "DISTANCE", "TIME", "BUMP")
+ARG_COUNTS = (0, 2, 2, 2, 2, 0, 0)
+
+LINE_SECTION_LENGTH = 113 * WHEEL_RADIUS  # Arc length (m) of the line section; was 113 rad of the left wheel
+
+COURSE = (
+    ("line",     LINE,  (),          UNTIL_DISTANCE, LINE_SECTION_LENGTH),
+    ("align",    ALIGN, (-180, 2),   UNTIL_DONE,     0),
+    ("to wall",  DRIVE, (25, -180),  UNTIL_BUMP,     0),
+) + tuple(("wall %d" % (k + 1), ARC, (left, right), UNTIL_TIME, ms)
+          for k, (left, right, ms) in enumerate(WALL_MANEUVER))
+
+def validate(plan):
+    # Returns a list of problems with plan; empty when it can run.
+    problems = []
+    if not plan:
+        problems.append("plan has no phases")
+    for k, phase in enumerate(plan):
+        if len(phase) != 5:
+            problems.append("phase %d: expected (name, action, args, until, limit)" % k)
+            continue
+        name, action, args, until, limit = phase
+        where = "phase %d (%s)" % (k, name)
+        if not LINE <= action <= STOP:
+            problems.append("%s: unknown action %r" % (where, action))
+            continue
+        if not UNTIL_DONE <= until <= UNTIL_BUMP:
+            problems.append("%s: unknown end condition %r" % (where, until))
+            continue
+        if len(args) != ARG_COUNTS[action]:
+            problems.append("%s: %s takes %d arguments, got %d" % (
+                where, ACTION_NAMES[action], ARG_COUNTS[action], len(args)))
+            continue
+        if action in (DRIVE, TURN, ARC):
+            efforts = args if action == ARC else args[:1]
+            if any(not -100 <= effort <= 100 for effort in efforts):
+                problems.append("%s: effort out of -100..100" % where)
+        if action == ALIGN and args[1] <= 0:
+            problems.append("%s: alignment tolerance must be positive" % where)
+        if until in (UNTIL_DISTANCE, UNTIL_TIME) and not limit > 0:
+            problems.append("%s: %s needs a positive limit" % (where, UNTIL_NAMES[until]))
+        elif until == UNTIL_DONE and action in (LINE, DRIVE, ARC, WAIT):
+            problems.append("%s: %s never finishes on its own; end it on distance, time or a bump" % (
+                where, ACTION_NAMES[action]))
+        elif until == UNTIL_DISTANCE and action in (ALIGN, TURN, STOP):
+            problems.append("%s: %s cannot end on distance" % (where, ACTION_NAMES[action]))
+    return problems
+
+class Mission:
+    def __init__(self, plan, executor, heading=None):
+        # plan: tuple of phases, executor: motion.MotionExecutor
+        # heading: object with heading() in degrees, for TURN phases
+        problems = validate(plan)
+        if problems:
+            raise ValueError("invalid mission plan: " + "; ".join(problems))
+        self.plan = plan
+        self.executor = executor
+        self.heading = heading
+        self.index = -1        # Running phase, -1 before the start
+        self.done = False
+        self.splits = array('l', [0] * len(plan))  # ticks_ms() each phase started
+        self._start_heading = 0
+        self._start_ms = 0
+        self._start_distance = 0.0
+        self._queued = -1      # Latest phase queued on the executor
+        self._complete_at = 0  # executor.completed when the running phase's segment is done
+        self._next_complete_at = 0
+
+    def _owned(self, index):
+        # True if phase index is a motion phase that ends with its executor segment.
+        _, action, _, until, _ = self.plan[index]
+        return ALIGN <= action <= ARC and until != UNTIL_BUMP
+
+    def _target(self, offset):
+        return (self._start_heading + offset) % 360
+
+    def _queue(self, index):
+        # Queues phase index's segment; returns executor.completed once it is done.
+        _, action, args, until, limit = self.plan[index]
+        executor = self.executor
+        ms = limit if until == UNTIL_TIME else None
+        distance = limit if until == UNTIL_DISTANCE else None
+        self._queued = index
+        if action == ALIGN:
+            executor.align(self._target(args[0]), tolerance=args[1], timeout_ms=ms)
+        elif action == DRIVE:
+            hold = None if args[1] is None else self._target(args[1])
+            executor.drive(args[0], ms=ms, distance=distance, hold=hold)
+        elif action == TURN:
+            error = wrap_degrees(self._target(args[1]) - self.heading.heading())
+            executor.turn(args[0] if error >= 0 else -args[0], ms=ms, degrees=abs(error))
+        elif action == ARC:
+            executor.arc(args[0], args[1], ms=ms, distance=distance)
+        return executor.completed + executor.pending()
+
+    def _begin(self, index):
+        # Starts phase index.
+        _, action, _, until, _ = self.plan[index]
+        self.index = index
+        self._start_ms = ticks_ms()
+        self._start_distance = state.floats[state.DISTANCE]
+        self.splits[index] = self._start_ms
+        state.ints[state.STATE_INPUT] = 0 if action == LINE else 1
+        if until == UNTIL_BUMP:
+            state.take(state.BUMP)
+        if action == STOP:
+            self.executor.clear()
+        elif ALIGN <= action <= ARC:
+            if self._queued == index:
+                self._complete_at = self._next_complete_at
+            else:
+                self._complete_at = self._queue(index)
+            ahead = index + 1
+            if (self._owned(index) and ahead < len(self.plan) and self._owned(ahead)
+                    and self.plan[ahead][1] != TURN):
+                self._next_complete_at = self._queue(ahead)
+
+    def _ended(self):
+        # True when the running phase's end condition is met.
+        _, action, _, until, limit = self.plan[self.index]
+        if until == UNTIL_BUMP:
+            return state.ints[state.BUMP] != 0
+        if ALIGN <= action <= ARC:
+            return self.executor.completed >= self._complete_at
+        if until == UNTIL_DONE:
+            return True
+        if until == UNTIL_TIME:
+            return ticks_diff(ticks_ms(), self._start_ms) >= limit
+        return state.floats[state.DISTANCE] - self._start_distance >= limit
+
+    def _end(self):
+        # Leaves the running phase.
+        _, action, _, until, _ = self.plan[self.index]
+        if action == LINE:
+            state.ints[state.FINAL_FLAG] = 1
+        if until == UNTIL_BUMP:
+            state.take(state.BUMP)
+        if not self._owned(self.index) and self.executor.busy():
+            self.executor.clear()
+
+    def task(self):
+        # Cooperative task: checks the running phase once per run.
+        self._start_heading = init.init_heading.get()
+        self._begin(0)
+        last = len(self.plan) - 1
+        while True:
+            if not self.done and self._ended():
+                self._end()
+                if self.index < last:
+                    self._begin(self.index + 1)
+                else:
+                    self.done = True
+                    state.ints[state.STATE_INPUT] = 1
+                    self.executor.clear()
+            yield 0
@@ -0,0 +1,189 @@
+"""
+motion.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Non-blocking motion primitives. Drive, turn, arc and align segments are
+queued on a MotionExecutor and run one tick at a time by its cooperative
+task, so the scheduler keeps running every other task during a maneuver.
+
+Functionality:
+- drive(effort): both wheels at effort, optionally holding an IMU heading.
+- turn(effort): spin in place; positive effort turns clockwise (right),
+  which increases the BNO055 heading.
+- arc(left, right): independent wheel efforts.
+- align(heading): spin toward an absolute IMU heading (degrees) until it
+  is within tolerance.
+- A segment ends after ms milliseconds, after distance metres of odometry
+  arc length, after the IMU heading has changed by degrees, or (align)
+  on reaching its heading; whichever comes first. timeout_ms ends any
+  segment as a safety. A segment without an end condition runs until
+  clear(), e.g. driving until the bump sensors hit a wall.
+- While segments run, init.motion_active is 1 and the executor owns
+  init.left_effort and init.right_effort; PID_value leaves them alone.
+  Both efforts go to zero when the queue runs empty.
+- Heading hold runs a PID_controller.PID on the heading error, spinning in
+  place while the error is above tolerance. By default it is the original
+  final task's proportional correction, kp_value * heading error / 100,
+  with the gain read from init.kp_value every tick; pass hold_pid for
+  other gains. The correction is at least min_effort, since below that
+  the wheels stall short of the tolerance.
+"""
+
+import init
+import state
+from time import ticks_ms, ticks_diff
+from PID_controller import PID
+
+def wrap_degrees(angle):
+    # Wraps an angle in degrees to -180..180.
+    return (angle + 180) % 360 - 180
+
+class MotionExecutor:
+    def __init__(self, odometry=None, heading=None, min_effort=8, hold_pid=None):
+        # odometry: Odometry for distance ends, heading: object with heading()
+        # in degrees (IMUService or CacheReader) for degree, align and hold
+        # min_effort: smallest heading correction effort
+        # hold_pid: PID for heading hold, None for kp_value / 100 proportional
+        self.odometry = odometry
+        self.heading = heading
+        self.min_effort = min_effort
+        self.hold_gain_share = hold_pid is None
+        self.hold_pid = hold_pid if hold_pid is not None else PID(0.0)
+
+        self._segments = []   # Queued (left, right, ms, distance, degrees, target, tolerance, timeout_ms)
+        self._next = 0        # Index of the next queued segment
+        self.current = None   # Running segment
+        self.completed = 0    # Segments finished since start
+
+        # Running segment state
+        self._start_ms = 0
+        self._start_distance = 0.0
+        self._last_heading = 0.0
+        self._turned = 0.0
+        self._last_ms = 0
+
+    def attach(self, odometry=None, heading=None):
+        # Sets the odometry and heading sources after construction.
+        if odometry is not None:
+            self.odometry = odometry
+        if heading is not None:
+            self.heading = heading
+
+    def _queue(self, left, right, ms, distance, degrees, target, tolerance, timeout_ms):
+        if distance is not None and self.odometry is None:
+            raise ValueError("distance end needs odometry")
+        if (degrees is not None or target is not None) and self.heading is None:
+            raise ValueError("heading end or hold needs an IMU heading")
+        self._segments.append((left, right, ms, distance, degrees, target, tolerance, timeout_ms))
+
+    def drive(self, effort, ms=None, distance=None, degrees=None, hold=None, tolerance=2, timeout_ms=None):
+        # Drives straight at effort; hold is an IMU heading (degrees) to keep.
+        self._queue(effort, effort, ms, distance, degrees, hold, tolerance, timeout_ms)
+
+    def turn(self, effort, ms=None, degrees=None, timeout_ms=None):
+        # Spins in place, clockwise for positive effort.
+        self._queue(effort, -effort, ms, None, degrees, None, 0, timeout_ms)
+
+    def arc(self, left, right, ms=None, distance=None, degrees=None, timeout_ms=None):
+        # Runs each wheel at its own effort.
+        self._queue(left, right, ms, distance, degrees, None, 0, timeout_ms)
+
+    def align(self, heading, tolerance=2, timeout_ms=None):
+        # Spins to an absolute IMU heading (degrees) and ends within tolerance.
+        self._queue(0, 0, None, None, None, heading, tolerance, timeout_ms)
+
+    def clear(self):
+        # Drops the running and queued segments and stops the wheels.
+        self._segments = []
+        self._next = 0
+        self.current = None
+        self._stop()
+
+    def busy(self):
+        # True while a segment runs or is queued.
+        return self.current is not None or self._next < len(self._segments)
+
+    def pending(self):
+        # Number of segments running or queued.
+        return (self.current is not None) + len(self._segments) - self._next
+
+    def _stop(self):
+        init.left_effort.put(0)
+        init.right_effort.put(0)
+        state.ints[state.MOTION_ACTIVE] = 0
+
+    def _start(self, segment):
+        self.current = segment
+        self._start_ms = ticks_ms()
+        if self.odometry is not None:
+            self._start_distance = self.odometry.distance
+        if self.heading is not None:
+            self._last_heading = self.heading.heading()
+        self._turned = 0.0
+        self._last_ms = self._start_ms
+        self.hold_pid.reset()
+        state.ints[state.MOTION_ACTIVE] = 1
+
+    def _step(self, segment):
+        # Puts this tick's efforts; returns True when the segment has ended.
+        left, right, ms, distance, degrees, target, tolerance, timeout_ms = segment
+        now = ticks_ms()
+        elapsed = ticks_diff(now, self._start_ms)
+        if timeout_ms is not None and elapsed >= timeout_ms:
+            return True
+        if ms is not None and elapsed >= ms:
+            return True
+        if distance is not None and abs(self.odometry.distance - self._start_distance) >= abs(distance):
+            return True
+        if self.heading is not None and (degrees is not None or target is not None):
+            heading = self.heading.heading()
+            self._turned += wrap_degrees(heading - self._last_heading)
+            self._last_heading = heading
+            if degrees is not None and abs(self._turned) >= abs(degrees):
+                return True
+            if target is not None:
+                error = wrap_degrees(target - heading)
+                if abs(error) > tolerance:
+                    pid = self.hold_pid
+                    if self.hold_gain_share:
+                        pid.kp = state.floats[state.KP] / 100
+                    correction = pid.step(error, ticks_diff(now, self._last_ms) / 1000)
+                    if abs(correction) < self.min_effort:
+                        correction = self.min_effort if error > 0 else -self.min_effort
+                    left = correction
+                    right = -correction
+                elif left == 0 and right == 0:
+                    return True  # Aligned
+        self._last_ms = now
+        init.left_effort.put(int(left))
+        init.right_effort.put(int(right))
+        return False
+
+    def task(self):
+        # Cooperative task: advances the running segment once per run.
+        while True:
+            segment = self.current
+            while True:
+                if segment is None:
+                    if self._next < len(self._segments):
+                        segment = self._segments[self._next]
+                        self._next += 1
+                        self._start(segment)
+                    else:
+                        if state.ints[state.MOTION_ACTIVE]:
+                            self._segments = []
+                            self._next = 0
+                            self._stop()
+                        break
+                if not self._step(segment):
+                    break
+                self.completed += 1
+                self.current = segment = None
+            yield 0
+
+# Shared executor; main.py attaches the odometry and IMU heading
+executor = MotionExecutor()
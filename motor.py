@@ -0,0 +1,158 @@
+"""
+motor.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Motor driver for the Romi's DRV8838 drivers (PWM, DIR and nSLP pins), one
+class for both wheels. left_motor.py and right_motor.py build the two
+instances with their pins.
+
+Functionality:
+- update(duty) applies the battery compensation multiplier and clamps to
+  -100..100; set_duty(duty) writes a duty with no compensation (wheel
+  speed loops). Positive duty drives forward (DIR low).
+- The multiplier is cached, folded into one integer gain: timer compare
+  counts per % of duty, fixed point with 16 fraction bits. set_multiplier()
+  refreshes it; the battery monitor calls it whenever it publishes, so
+  update() never reads the init.constant_multiplier Share.
+- The compare value is duty * gain >> 16, clamped to the timer period and
+  written with pulse_width(), with no percent conversion in the driver.
+  DIR and compare writes are skipped when unchanged.
+- brake() shorts the motor (PWM low with the driver awake, the same as duty
+  0); coast() puts the driver to sleep so the wheel spins freely until the
+  next nonzero duty wakes it.
+- MotorPair updates both wheels in one call: both compare values are
+  computed first and then written back to back.
+"""
+
+import init
+from pyb import Pin, Timer
+
+GAIN_SHIFT = const(16)  # Fraction bits of the compare gains
+
+class Motor:
+    def __init__(self, PWM, DIR, nSLP, timer_num, channel, freq=20000):
+        # Initializes the motor with PWM, direction, and sleep control.
+        self.DIR_pin = Pin(DIR, mode=Pin.OUT_PP, value=0)
+        self.nSLP_pin = Pin(nSLP, mode=Pin.OUT_PP, value=0)
+        self.timer = Timer(timer_num, freq=freq)
+        self.PWM = self.timer.channel(channel, Timer.PWM, pin=Pin(PWM))
+
+        # Compare counts for 100 % and per % of duty (16 fraction bits)
+        self.full = self.timer.period() + 1
+        self.unit = (self.full << GAIN_SHIFT) // 100
+        self.enabled = False
+        self.coasting = False
+        self.direction = 0   # Last DIR pin value
+        self.compare = 0     # Last compare value written
+        self.writes = 0      # DIR and compare writes made
+        self.set_multiplier()
+
+    def enable(self):
+        # Enables the motor driver.
+        self.enabled = True
+        self.coasting = False
+        self.nSLP_pin.value(1)
+
+    def disable(self):
+        # Disables the motor driver.
+        self.enabled = False
+        self.nSLP_pin.value(0)
+
+    def set_multiplier(self, multiplier=None):
+        # Caches the battery compensation multiplier; None reads init.constant_multiplier.
+        if multiplier is None:
+            multiplier = init.constant_multiplier.get()
+        self.multiplier = multiplier
+        self.gain = int(multiplier * self.unit)
+
+    def update(self, duty_cycle):
+        # Updates the motor speed with the cached battery compensation.
+        scaled = int(duty_cycle * self.gain)
+        self._write(self._compare_of(scaled), scaled < 0, scaled != 0)
+
+    def set_duty(self, duty_cycle):
+        # Sets the direction and duty cycle (-100 to 100) with no compensation.
+        scaled = int(duty_cycle * self.unit)
+        self._write(self._compare_of(scaled), scaled < 0, scaled != 0)
+
+    def brake(self):
+        # Shorts the motor windings: the wheel stops quickly.
+        if self.coasting and self.enabled:
+            self.enable()
+        self._write(0, self.direction, False)
+
+    def coast(self):
+        # Lets the wheel spin freely by putting the driver to sleep.
+        self._write(0, self.direction, False)
+        if self.enabled and not self.coasting:
+            self.coasting = True
+            self.nSLP_pin.value(0)
+
+    def _compare_of(self, scaled):
+        # Timer compare value of a duty times a gain, clamped to 100 %.
+        if scaled < 0:
+            scaled = -scaled
+        compare = scaled >> GAIN_SHIFT
+        return compare if compare < self.full else self.full
+
+    def _write(self, compare, reverse, drive):
+        # Writes DIR and the compare value, skipping what has not changed.
+        if drive and self.coasting:
+            self.coasting = False
+            if self.enabled:
+                self.nSLP_pin.value(1)
+        direction = 1 if reverse else 0
+        if direction != self.direction:
+            self.DIR_pin.value(direction)
+            self.direction = direction
+            self.writes += 1
+        if compare != self.compare:
+            self.PWM.pulse_width(compare)
+            self.compare = compare
+            self.writes += 1
+
+class MotorPair:
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def enable(self):
+        self.left.enable()
+        self.right.enable()
+
+    def disable(self):
+        self.left.disable()
+        self.right.disable()
+
+    def set_multiplier(self, multiplier=None):
+        self.left.set_multiplier(multiplier)
+        self.right.set_multiplier(multiplier)
+
+    def update(self, left_duty, right_duty):
+        # Compensates and writes both wheels; the two writes follow each other directly.
+        left = self.left
+        right = self.right
+        left_scaled = int(left_duty * left.gain)
+        right_scaled = int(right_duty * right.gain)
+        left_compare = left._compare_of(left_scaled)
+        right_compare = right._compare_of(right_scaled)
+        left._write(left_compare, left_scaled < 0, left_scaled != 0)
+        right._write(right_compare, right_scaled < 0, right_scaled != 0)
+
+    def brake(self):
+        self.left.brake()
+        self.right.brake()
+
+    def coast(self):
+        self.left.coast()
+        self.right.coast()
+
+    def task(self, left_share, right_share):
+        # Cooperative task: both efforts from their shares in one update per run.
+        while True:
+            self.update(left_share.get(), right_share.get())
+            yield 0
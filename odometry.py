@@ -0,0 +1,135 @@
+"""
+odometry.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Differential-drive odometry for Romi. Integrates the left and right encoder
+counts into a pose (x, y, theta) with the forward kinematics from the
+README, optionally fused with the BNO055 heading through a complementary
+filter.
+
+Functionality:
+- update() reads the accumulated counts of both Encoder objects, so it does
+  not disturb other users of the encoders and every call costs the same.
+- The pose is in metres and radians in the start frame: x forward, y to
+  the left, theta counter-clockwise from the starting direction.
+- distance is the signed arc length travelled by the robot's centre, the
+  mean of both wheels; it runs backwards while reversing.
+- v and omega are the linear (m/s) and angular (rad/s) velocity over the
+  last update.
+- With an IMUService, each new IMU sample pulls theta toward the IMU heading
+  by imu_gain. The encoders supply the fast heading changes and the IMU
+  removes the slow drift from wheel slip and track width error.
+- publish() puts distance, pose and velocities into the state block for other tasks.
+"""
+
+import state
+from math import sin, cos, pi
+from time import ticks_us, ticks_diff
+
+WHEEL_RADIUS = 0.035   # Romi wheel radius (m)
+TRACK_WIDTH = 0.141    # Distance between the wheel contact points (m)
+COUNTS_PER_REV = 1440  # Encoder counts per wheel revolution
+TWO_PI = 2 * pi
+HEADING_SIGN = -1      # BNO055 heading grows clockwise, theta counter-clockwise
+RAD_PER_LSB = pi / 180 / 16
+
+def wrap_angle(angle):
+    # Wraps an angle in radians to -pi..pi.
+    return (angle + pi) % TWO_PI - pi
+
+class Odometry:
+    def __init__(self, left_enc, right_enc, imu_service=None, imu_gain=0.05,
+                 wheel_radius=WHEEL_RADIUS, track_width=TRACK_WIDTH, counts_per_rev=COUNTS_PER_REV):
+        # left_enc, right_enc: Encoder objects, updated elsewhere
+        # imu_service: IMUService whose cached heading is fused, None for encoders only
+        # imu_gain: fraction of the IMU/encoder heading difference removed per IMU sample
+
+        self.left_enc = left_enc
+        self.right_enc = right_enc
+        self.imu_service = imu_service
+        self.imu_gain = imu_gain
+        self.m_per_count = TWO_PI * wheel_radius / counts_per_rev
+        self.track_width = track_width
+        self.reset()
+
+    def reset(self, x=0.0, y=0.0, theta=0.0):
+        # Sets the pose and zeroes distance and velocities.
+        self.x = x
+        self.y = y
+        self.theta = theta
+        self.distance = 0.0
+        self.v = 0.0
+        self.omega = 0.0
+
+        self.prev_left = self.left_enc.position
+        self.prev_right = self.right_enc.position
+        self.prev_time = ticks_us()
+
+        # IMU heading that corresponds to theta = 0, taken from the first IMU sample
+        self.imu_offset = None
+        self.imu_seq = 0
+
+    def update(self):
+        # Integrates the encoder counts since the last call into the pose.
+        left = self.left_enc.position
+        right = self.right_enc.position
+        d_left = (left - self.prev_left) * self.m_per_count
+        d_right = (right - self.prev_right) * self.m_per_count
+        self.prev_left = left
+        self.prev_right = right
+
+        now = ticks_us()
+        dt = ticks_diff(now, self.prev_time) / 1_000_000
+        self.prev_time = now
+
+        # Forward kinematics, integrated at the midpoint heading
+        ds = (d_left + d_right) / 2
+        dtheta = (d_right - d_left) / self.track_width
+        mid = self.theta + dtheta / 2
+        self.x += ds * cos(mid)
+        self.y += ds * sin(mid)
+        self.theta += dtheta
+        self.distance += ds
+        if dt > 0:
+            self.v = ds / dt
+            self.omega = dtheta / dt
+
+        # Complementary filter: one correction per new IMU sample
+        service = self.imu_service
+        if service is not None and service.seq != self.imu_seq:
+            self.imu_seq = service.seq
+            heading = HEADING_SIGN * service.heading_raw * RAD_PER_LSB
+            if self.imu_offset is None:
+                self.imu_offset = self.theta - heading
+            else:
+                self.theta += self.imu_gain * wrap_angle(self.imu_offset + heading - self.theta)
+
+        self.theta = wrap_angle(self.theta)
+
+    def pose(self):
+        # Returns (x, y, theta) in metres and radians.
+        return self.x, self.y, self.theta
+
+    def publish(self):
+        # Puts distance, pose and velocities into the state block.
+        floats = state.floats
+        floats[state.DISTANCE] = self.distance
+        floats[state.POSE_X] = self.x
+        floats[state.POSE_Y] = self.y
+        floats[state.POSE_THETA] = self.theta
+        floats[state.LINEAR_VELOCITY] = self.v
+        floats[state.ANGULAR_VELOCITY] = self.omega
+
+    def task(self):
+        # Cooperative task for when no other task owns the encoders;
+        # the encoders must be updated before the odometry each run.
+        while True:
+            self.left_enc.update()
+            self.right_enc.update()
+            self.update()
+            self.publish()
+            yield 0
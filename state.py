@@ -0,0 +1,75 @@
+"""
+state.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Array-backed state block for the values the control loop touches every
+tick. Each value is one slot of a preallocated array ('i' for flags and
+modes, 'f' for gains and odometry) at a named constant index, so a task
+reads it with one subscript: no Share method call, no interrupt
+disable/enable and no allocation for integer fields.
+
+Functionality:
+- ints[...] and floats[...] are read and written directly by the tasks.
+  Cooperative tasks never interrupt each other, so no locking is needed.
+- Only BUMP is written from an interrupt (the bump sensor ISR, with a
+  single array store). Tasks read it directly, but clear it with take(),
+  which reads and clears with interrupts off so a bump that lands in
+  between is not lost.
+- Field(block, index) gives a slot the Share get()/put() interface, for
+  code off the hot path; init.py exposes the fields under their old Share
+  names.
+"""
+
+from array import array
+import pyb
+
+# Integer fields (ints)
+STATE_INPUT = const(0)     # 1 in grid mode: line following off
+MOTION_ACTIVE = const(1)   # 1 while motion segments own the efforts
+OVERRIDE_MODE = const(2)   # 1 forces straight driving
+FINAL_FLAG = const(3)      # 1 once the line section has ended
+BUMP = const(4)            # Set by the bump sensor ISR
+NUM_INTS = const(5)
+
+# Float fields (floats)
+KP = const(0)              # Heading hold gain (%/degree * 100)
+DISTANCE = const(1)        # Odometry arc length (m)
+POSE_X = const(2)          # Odometry pose (m, m, rad counter-clockwise)
+POSE_Y = const(3)
+POSE_THETA = const(4)
+LINEAR_VELOCITY = const(5)   # m/s
+ANGULAR_VELOCITY = const(6)  # rad/s
+LEFT_SPEED = const(7)      # Wheel speed setpoints (rad/s)
+RIGHT_SPEED = const(8)
+NUM_FLOATS = const(9)
+
+ints = array('i', [0] * NUM_INTS)
+floats = array('f', [0.0] * NUM_FLOATS)
+
+def take(index):
+    # Reads and clears an ISR-written int field with interrupts off.
+    irq_state = pyb.disable_irq()
+    value = ints[index]
+    ints[index] = 0
+    pyb.enable_irq(irq_state)
+    return value
+
+class Field:
+    # One state block slot with the Share interface.
+    def __init__(self, block, index, name=None):
+        self.block = block
+        self.index = index
+        self._name = str(name)
+
+    def put(self, data, in_ISR=False):
+        self.block[self.index] = data
+
+    def get(self, in_ISR=False):
+        return self.block[self.index]
+
+    def __repr__(self):
+        return '{:<12s} Field<{:s}>[{:d}]'.format(self._name, self.block.typecode, self.index)
@@ -0,0 +1,254 @@
+"""
+task_profiler.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Per-task execution profiler for the cotask scheduler. Each profiled task
+generator is wrapped so every run is timed. Per task it keeps the run time
+distribution, the start latency against the nominal period, missed
+deadlines, budget overruns and the worst-case run. Histograms are
+fixed-size arrays with power-of-two microsecond bins, so recording does
+not allocate. Optionally it also tracks the heap: bytes allocated per run
+and the runs a garbage collection fell in.
+
+Functionality:
+- TaskProfiler(enabled).task(run_fun, name, priority, period) builds the
+  cotask Task. With enabled=False it builds the plain Task, so the
+  profiler can be removed at startup with no run-time cost.
+- Latency is measured against a grid of nominal starts that advances by
+  one period per run, the way cotask schedules; it starts one period after
+  the task is built, or at the first run after reset(). A run that starts a
+  whole period late has missed its deadline. A run longer than the task's
+  budget (the period unless given) is an overrun.
+- With track_alloc=True every run also reads gc.mem_alloc() before and
+  after. A run whose heap grew adds the growth to the task's allocated
+  bytes; a run whose heap shrank had a collection in it and counts as a
+  GC event (what it allocated is then unknown). A task that allocates
+  nothing in steady state shows 0 bytes per run in the dump.
+- measure_overhead() times an empty task with and without the wrapper;
+  the result is stored when the profiler is built and shown in the dump.
+- dump() prints one compact line per task plus both histograms. It runs
+  at the REPL (the Bluetooth UART from boot.py) after Ctrl-C, or while
+  the scheduler runs through command_task(): send 'p' to dump and 'r' to
+  reset the statistics.
+
+Histogram bin i counts values below BIN_BASE_US << i (bin 0 is below
+BIN_BASE_US, the last bin is everything above the second to last edge).
+"""
+
+import gc
+from array import array
+from time import ticks_us, ticks_diff, ticks_add
+from cotask import Task
+
+BIN_BASE_US = 64  # Upper edge of the first bin
+NUM_BINS = 12     # 64 us .. 65 ms, last bin open-ended
+
+def _bin(us):
+    # Histogram bin of a duration in microseconds.
+    b = 0
+    edge = BIN_BASE_US
+    while us >= edge and b < NUM_BINS - 1:
+        edge <<= 1
+        b += 1
+    return b
+
+def bin_edges():
+    # Upper edge (us) of every bin but the last.
+    return [BIN_BASE_US << b for b in range(NUM_BINS - 1)]
+
+def percentile_us(hist, fraction):
+    # Upper bin edge below which fraction of the samples fall, -1 if in the open bin.
+    total = sum(hist)
+    if total == 0:
+        return 0
+    count = 0
+    for b in range(NUM_BINS):
+        count += hist[b]
+        if count >= fraction * total:
+            return BIN_BASE_US << b if b < NUM_BINS - 1 else -1
+    return -1
+
+class TaskProfile:
+    def __init__(self, name, period_ms=None, budget_us=None):
+        # period_ms: nominal task period, None for unscheduled tasks
+        # budget_us: run time above which a run counts as an overrun
+        self.name = name
+        self.period_us = 0 if period_ms is None else int(period_ms * 1000)
+        self.budget_us = budget_us if budget_us is not None else self.period_us
+        self.run_hist = array('L', [0] * NUM_BINS)
+        self.late_hist = array('L', [0] * NUM_BINS)
+        self.reset()
+
+    def reset(self):
+        # Clears all statistics; the latency grid restarts at the next run.
+        for b in range(NUM_BINS):
+            self.run_hist[b] = 0
+            self.late_hist[b] = 0
+        self.runs = 0
+        self.run_total_us = 0
+        self.worst_us = 0
+        self.worst_run = 0    # Run number of the worst-case run
+        self.late_total_us = 0
+        self.max_late_us = 0
+        self.missed = 0
+        self.overruns = 0
+        self._due = None
+        self.alloc_total = 0  # Bytes allocated by runs without a collection
+        self.alloc_max = 0    # Most bytes allocated by one run
+        self.alloc_runs = 0   # Runs that allocated
+        self.gc_events = 0    # Runs a collection fell in
+
+    def record(self, start, run_us):
+        # Adds one run that started at ticks_us() start and took run_us.
+        self.runs += 1
+        self.run_total_us += run_us
+        if run_us > self.worst_us:
+            self.worst_us = run_us
+            self.worst_run = self.runs
+        self.run_hist[_bin(run_us)] += 1
+        if self.budget_us and run_us > self.budget_us:
+            self.overruns += 1
+
+        if self.period_us:
+            if self._due is None:
+                self._due = start
+            late = ticks_diff(start, self._due)
+            if late < 0:
+                late = 0
+            self._due = ticks_add(self._due, self.period_us)
+            self.late_total_us += late
+            if late > self.max_late_us:
+                self.max_late_us = late
+            self.late_hist[_bin(late)] += 1
+            if late >= self.period_us:
+                self.missed += 1
+
+    def record_alloc(self, grown):
+        # Adds the heap change (bytes) over one run.
+        if grown < 0:
+            self.gc_events += 1
+        elif grown:
+            self.alloc_runs += 1
+            self.alloc_total += grown
+            if grown > self.alloc_max:
+                self.alloc_max = grown
+
+    def wrap(self, run_fun, shares=(), track_alloc=False):
+        # Returns a generator function that runs run_fun and times every run,
+        # measuring its heap growth too with track_alloc.
+        def run():
+            steps = run_fun(shares) if shares else run_fun()
+            while True:
+                start = ticks_us()
+                state = next(steps)
+                self.record(start, ticks_diff(ticks_us(), start))
+                yield state
+
+        def run_alloc():
+            mem_alloc = gc.mem_alloc
+            steps = run_fun(shares) if shares else run_fun()
+            while True:
+                used = mem_alloc()
+                start = ticks_us()
+                state = next(steps)
+                end = ticks_us()
+                self.record_alloc(mem_alloc() - used)
+                self.record(start, ticks_diff(end, start))
+                yield state
+        return run_alloc if track_alloc else run
+
+    def summary(self):
+        # One line: runs, mean/p99/worst run, mean/max lateness, missed, overruns.
+        runs = self.runs if self.runs else 1
+        return "%-16s %7d %6d %6d %6d %6d %6d %5d %5d" % (
+            self.name, self.runs, self.run_total_us // runs, percentile_us(self.run_hist, 0.99),
+            self.worst_us, self.late_total_us // runs, self.max_late_us, self.missed, self.overruns)
+
+    def alloc_summary(self):
+        # One line: mean bytes per run, most in one run, runs that allocated, GC events.
+        runs = self.runs - self.gc_events
+        return "%-16s %7d %6d %7d %5d" % (
+            self.name, self.alloc_total // runs if runs > 0 else 0, self.alloc_max, self.alloc_runs, self.gc_events)
+
+def measure_overhead(runs=500, track_alloc=False):
+    # Wrapper cost per run (us): an empty task timed with and without it.
+    def idle():
+        while True:
+            yield 0
+
+    bare = idle()
+    start = ticks_us()
+    for _ in range(runs):
+        next(bare)
+    bare_us = ticks_diff(ticks_us(), start)
+
+    wrapped = TaskProfile("overhead").wrap(idle, track_alloc=track_alloc)()
+    start = ticks_us()
+    for _ in range(runs):
+        next(wrapped)
+    wrapped_us = ticks_diff(ticks_us(), start)
+    return max(0, wrapped_us - bare_us) / runs
+
+class TaskProfiler:
+    def __init__(self, enabled=True, track_alloc=False):
+        self.enabled = enabled
+        self.track_alloc = track_alloc
+        self.profiles = []
+        self.overhead_us = measure_overhead(track_alloc=track_alloc) if enabled else 0
+        self.start = ticks_us()
+
+    def task(self, run_fun, name="NoName", priority=0, period=None, budget_us=None, **kwargs):
+        # Builds a cotask Task, profiled when the profiler is enabled.
+        if not self.enabled:
+            return Task(run_fun, name=name, priority=priority, period=period, **kwargs)
+        profile = TaskProfile(name, period, budget_us)
+        if profile.period_us:
+            profile._due = ticks_add(ticks_us(), profile.period_us)  # cotask's first due time
+        self.profiles.append(profile)
+        shares = kwargs.pop('shares', ())
+        return Task(profile.wrap(run_fun, shares, self.track_alloc), name=name, priority=priority, period=period, **kwargs)
+
+    def reset(self):
+        for profile in self.profiles:
+            profile.reset()
+        self.start = ticks_us()
+
+    def dump(self):
+        # Prints the compact profile of every task.
+        if not self.enabled:
+            print("Profiler disabled")
+            return
+        elapsed = ticks_diff(ticks_us(), self.start)
+        busy = sum(profile.run_total_us for profile in self.profiles)
+        print("PROFILE %d ms, busy %d%%, overhead %.1f us/run" % (
+            elapsed // 1000, 100 * busy // elapsed if elapsed > 0 else 0, self.overhead_us))
+        print("task                runs   mean    p99  worst  lmean   lmax  miss  over")
+        for profile in self.profiles:
+            print(profile.summary())
+        if self.track_alloc:
+            print("heap                B/run   Bmax  allocs    gc")
+            for profile in self.profiles:
+                print(profile.alloc_summary())
+        print("bins (us <)", " ".join(str(edge) for edge in bin_edges()), "inf")
+        for profile in self.profiles:
+            print("%-16s run " % profile.name, " ".join(str(n) for n in profile.run_hist))
+            print("%-16s late" % profile.name, " ".join(str(n) for n in profile.late_hist))
+
+    def command_task(self):
+        # Cooperative task: 'p' on the REPL UART dumps, 'r' resets.
+        import sys
+        import select
+        poller = select.poll()
+        poller.register(sys.stdin, select.POLLIN)
+        while True:
+            if poller.poll(0):
+                command = sys.stdin.read(1)
+                if command == 'p':
+                    self.dump()
+                elif command == 'r':
+                    self.reset()
+            yield 0
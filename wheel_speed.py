@@ -0,0 +1,101 @@
+"""
+wheel_speed.py
+
+Project: ME405 ROMI Final Project
+Date: Mar 16, 2025
+Authors: Sam Sakaguchi, Timothy Chu
+
+Summary:
+Closed-loop wheel speed control. One WheelSpeedLoop per wheel runs faster
+than the line follower and motion tasks, measures the wheel speed from its
+encoder and drives the motor so the wheel turns at the commanded rate, so
+the robot holds its speed as the battery sags and both wheels match
+without per-battery multipliers.
+
+Functionality:
+- The outer loops (PID_value, the motion executor) keep commanding
+  init.left_effort and init.right_effort in %. With the speed loops
+  running, an effort is a wheel speed setpoint in % of FULL_SPEED, so
+  effort 100 is FULL_SPEED rad/s whatever the battery voltage. The
+  setpoint in rad/s is published in init.left_speed and init.right_speed.
+- The loop updates its encoder every run and takes the speed from the
+  position change, low-pass filtered with time constant filter_tau.
+  Other tasks may update the same encoder; positions stay consistent.
+- Motor duty = feedforward (ff_gain * setpoint plus ff_static against
+  friction) + a PI correction (PID_controller.PID). The PI output limits
+  follow the feedforward, so the integrator stops winding once the duty
+  reaches +-100. A zero setpoint stops the motor and clears the integrator.
+- The feedforward is scaled by the motor's cached battery multiplier and written
+  with Motor.set_duty, which applies no other compensation; the integrator
+  takes up whatever the multiplier gets wrong as the pack sags.
+"""
+
+from time import ticks_us, ticks_diff
+from PID_controller import PID
+
+FULL_SPEED = 20.0      # Wheel speed (rad/s) commanded by effort 100
+RAD_PER_COUNT = 2 * 3.141592653589793 / 1440
+FF_GAIN = 4.0          # Feedforward duty (%) per rad/s, at the nominal 7.2 V
+FF_STATIC = 3.0        # Feedforward duty (%) to overcome friction
+SPEED_KP = 4.0         # Duty (%) per rad/s of speed error
+SPEED_KI = 30.0        # Duty (%) per rad of accumulated speed error
+
+class WheelSpeedLoop:
+    def __init__(self, motor, encoder, command, setpoint=None, pid=None,
+                 ff_gain=FF_GAIN, ff_static=FF_STATIC, filter_tau=0.01):
+        # motor: motor.Motor, encoder: Encoder of the same wheel
+        # command: effort mailbox in % of FULL_SPEED (init.left_effort)
+        # setpoint: share that receives the setpoint in rad/s (init.left_speed)
+        # pid: speed error (rad/s) to duty (%) controller, None for the default PI
+        self.motor = motor
+        self.encoder = encoder
+        self.command = command
+        self.setpoint = setpoint
+        self.pid = pid if pid is not None else PID(SPEED_KP, SPEED_KI)
+        self.ff_gain = ff_gain
+        self.ff_static = ff_static
+        self.filter_tau = filter_tau
+
+        self.target = 0.0   # Setpoint (rad/s)
+        self.speed = 0.0    # Filtered wheel speed (rad/s)
+        self.duty = 0.0     # Last duty (%)
+        self.prev_position = encoder.position
+        self.prev_time = ticks_us()
+
+    def step(self):
+        # Measures the wheel speed and sets the motor duty once.
+        self.encoder.update()
+        now = ticks_us()
+        dt = ticks_diff(now, self.prev_time) / 1_000_000
+        self.prev_time = now
+        position = self.encoder.position
+        counts = position - self.prev_position
+        self.prev_position = position
+        if dt <= 0:
+            return
+
+        rate = counts * RAD_PER_COUNT / dt
+        self.speed += dt / (self.filter_tau + dt) * (rate - self.speed)
+
+        target = self.command.get() * FULL_SPEED / 100
+        self.target = target
+        if self.setpoint is not None:
+            self.setpoint.put(target)
+        if target == 0:
+            self.pid.reset()
+            duty = 0
+        else:
+            ff = self.ff_gain * target + (self.ff_static if target > 0 else -self.ff_static)
+            ff *= self.motor.multiplier
+            pid = self.pid
+            pid.out_max = 100 - ff
+            pid.out_min = -100 - ff
+            duty = ff + pid.step(target - self.speed, dt)
+        self.duty = duty
+        self.motor.set_duty(duty)
+
+    def task(self):
+        # Cooperative task: one speed loop step per run.
+        while True:
+            self.step()
+            yield 0